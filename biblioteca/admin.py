@@ -1,7 +1,26 @@
 from django.contrib import admin
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.db.models import Aggregate, CharField, OuterRef, Subquery
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.contrib.auth.models import User
-from .models import Autor, Categoria, Etiqueta, Libro, Prestamo, PerfilUsuario
+from django.urls import reverse
+from .models import Autor, Aviso, Categoria, Etiqueta, Libro, Prestamo, PrestamoArchivado, PerfilUsuario
+from .paginacion import PaginadorConteoEnCache
+from .prestamos import devolver_prestamos_en_lote
+from . import busqueda
+
+# ============================================================================
+# EXPRESIONES
+# ============================================================================
+
+class UnirNombres(Aggregate):
+    """Concatena los nombres del grupo separados por comas (GROUP_CONCAT / STRING_AGG)."""
+    function = 'GROUP_CONCAT'
+    template = "%(function)s(%(expressions)s, ', ')"
+    output_field = CharField()
+
+    def as_postgresql(self, compiler, connection, **extra_context):
+        return super().as_sql(compiler, connection, function='STRING_AGG', **extra_context)
 
 # ============================================================================
 # INLINES
@@ -14,6 +33,53 @@ class PerfilUsuarioInline(admin.StackedInline):
     verbose_name_plural = 'Perfil'
     fk_name = 'user'
 
+# ============================================================================
+# FILTROS
+# ============================================================================
+
+class FiltroAutocompletado(admin.SimpleListFilter):
+    """
+    Filtro lateral que busca sus opciones con AJAX en lugar de listarlas todas.
+
+    Solo carga el valor elegido, para mostrarlo marcado.
+    """
+    template = 'admin/biblioteca/filtro_autocompletado.html'
+    modelo = None
+    ruta = None
+    selector = None
+
+    @property
+    def url_busqueda(self):
+        return reverse('biblioteca:api_selector', args=[self.selector])
+
+    def lookups(self, request, model_admin):
+        valor = self.value()
+        if valor and valor.isdigit():
+            return [(str(pk), nombre) for pk, nombre in self.modelo.objects.filter(pk=valor).values_list('pk', 'nombre')]
+        return []
+
+    def queryset(self, request, queryset):
+        valor = self.value()
+        if not valor:
+            return queryset
+        if not valor.isdigit():
+            raise IncorrectLookupParameters(f'{self.parameter_name} debe ser un ID numérico.')
+        return queryset.filter(**{self.ruta: valor})
+
+class FiltroAutor(FiltroAutocompletado):
+    title = 'autor'
+    parameter_name = 'autor'
+    modelo = Autor
+    ruta = 'autores'
+    selector = 'autores'
+
+class FiltroEtiqueta(FiltroAutocompletado):
+    title = 'etiqueta'
+    parameter_name = 'etiqueta'
+    modelo = Etiqueta
+    ruta = 'etiquetas'
+    selector = 'etiquetas'
+
 # ============================================================================
 # ADMINS PERSONALIZADOS
 # ============================================================================
@@ -42,12 +108,22 @@ class EtiquetaAdmin(admin.ModelAdmin):
 
 @admin.register(Libro)
 class LibroAdmin(admin.ModelAdmin):
-    """Admin para el modelo Libro."""
+    """Admin para el modelo Libro, preparado para catálogos de cientos de miles de libros."""
     list_display = ('titulo', 'display_autores', 'categoria', 'cantidad_disponible', 'isbn')
-    list_filter = ('categoria', 'etiquetas', 'autores')
+    list_select_related = ('categoria',)
+    list_filter = ('categoria', FiltroEtiqueta, FiltroAutor)
+    # Orden total que coincide con el índice (titulo, id): sin ordenar toda la tabla
+    ordering = ('titulo', 'id')
+    # Sin el COUNT(*) de toda la tabla; el total filtrado se guarda en caché
+    show_full_result_count = False
+    paginator = PaginadorConteoEnCache
     search_fields = ('titulo', 'isbn', 'autores__nombre')
-    filter_horizontal = ('autores', 'etiquetas')
-    readonly_fields = ('fecha_agregado', 'fecha_actualizacion')
+    # Búsqueda AJAX en lugar de cargar todos los autores y etiquetas en el formulario
+    autocomplete_fields = ('autores', 'etiquetas')
+    readonly_fields = (
+        'fecha_agregado', 'fecha_actualizacion',
+        'total_ejemplares', 'prestamos_activos', 'prestamos_totales', 'ultimo_prestamo',
+    )
     
     fieldsets = (
         ('Información Principal', {
@@ -60,7 +136,7 @@ class LibroAdmin(admin.ModelAdmin):
             'fields': ('editorial', 'fecha_publicacion', 'numero_paginas', 'idioma')
         }),
         ('Inventario', {
-            'fields': ('cantidad_disponible',)
+            'fields': ('cantidad_disponible', 'total_ejemplares', 'prestamos_activos', 'prestamos_totales', 'ultimo_prestamo')
         }),
         ('Auditoría', {
             'fields': ('fecha_agregado', 'fecha_actualizacion'),
@@ -68,26 +144,67 @@ class LibroAdmin(admin.ModelAdmin):
         }),
     )
 
+    def get_queryset(self, request):
+        # Los nombres de los autores llegan en la misma consulta con una subconsulta agregada
+        nombres = (
+            Libro.autores.through.objects.filter(libro_id=OuterRef('pk'))
+            .order_by().values('libro_id')
+            .annotate(nombres=UnirNombres('autor__nombre'))
+            .values('nombres')
+        )
+        return super().get_queryset(request).select_related('categoria').annotate(nombres_autores=Subquery(nombres))
+
+    def get_search_results(self, request, queryset, search_term):
+        """Usa el índice de texto completo en lugar de icontains sobre el JOIN con autores."""
+        if not search_term:
+            return queryset, False
+        return busqueda.filtrar(queryset, search_term), False
+
     @admin.display(description='Autores')
     def display_autores(self, obj):
         """Muestra los autores en el list_display."""
-        return ", ".join([autor.nombre for autor in obj.autores.all()])
+        return obj.nombres_autores or ''
 
 @admin.register(Prestamo)
 class PrestamoAdmin(admin.ModelAdmin):
     """Admin para el modelo Prestamo."""
-    list_display = ('libro', 'usuario', 'fecha_prestamo', 'devuelto', 'fecha_devolucion')
+    list_display = ('libro', 'usuario', 'fecha_prestamo', 'fecha_vencimiento', 'devuelto', 'fecha_devolucion')
+    list_select_related = ('libro', 'usuario')
     list_filter = ('devuelto', 'fecha_prestamo')
     search_fields = ('libro__titulo', 'usuario__username')
-    readonly_fields = ('fecha_prestamo', 'fecha_devolucion')
+    readonly_fields = ('fecha_prestamo', 'fecha_devolucion', 'aviso_vencido')
     actions = ['marcar_como_devuelto']
 
     @admin.action(description='Marcar seleccionados como devueltos')
     def marcar_como_devuelto(self, request, queryset):
         """Acción para devolver múltiples préstamos."""
-        for prestamo in queryset.filter(devuelto=False):
-            prestamo.devolver()
-        self.message_user(request, f"{queryset.filter(devuelto=True).count()} préstamos marcados como devueltos.")
+        devueltos = devolver_prestamos_en_lote(queryset)
+        self.message_user(request, f"{devueltos} préstamos marcados como devueltos.")
+
+@admin.register(PrestamoArchivado)
+class PrestamoArchivadoAdmin(admin.ModelAdmin):
+    """Consulta del archivo de préstamos; se llena con el comando archivar_prestamos."""
+    list_display = ('libro', 'usuario', 'fecha_prestamo', 'fecha_devolucion', 'fecha_archivado')
+    list_select_related = ('libro', 'usuario')
+    search_fields = ('libro__titulo', 'usuario__username')
+    raw_id_fields = ('libro', 'usuario')
+    show_full_result_count = False
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+@admin.register(Aviso)
+class AvisoAdmin(admin.ModelAdmin):
+    """Admin de la bandeja de salida de avisos."""
+    list_display = ('tipo', 'usuario', 'prestamo', 'fecha_creacion', 'fecha_envio')
+    list_select_related = ('usuario', 'prestamo__libro', 'prestamo__usuario')
+    list_filter = ('tipo',)
+    search_fields = ('usuario__username',)
+    raw_id_fields = ('usuario', 'prestamo')
+    readonly_fields = ('fecha_creacion',)
 
 # ============================================================================
 # REGISTRO
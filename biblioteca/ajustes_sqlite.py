@@ -0,0 +1,95 @@
+"""
+Ajustes de concurrencia de SQLite para despliegues de un solo nodo.
+
+- Cada conexión nueva recibe los PRAGMA de BIBLIOTECA_SQLITE_PRAGMAS: diario
+  WAL (las lecturas no esperan a las escrituras), espera ante bloqueos,
+  memoria mapeada y una caché de páginas mayor.
+- transaccion_escritura() abre las transacciones que van a escribir con
+  BEGIN IMMEDIATE. Con BEGIN a secas la transacción empieza leyendo y, si otra
+  escribe entretanto, SQLite no puede esperar a que termine: falla al momento
+  con "database is locked" sin respetar busy_timeout.
+- optimizar() actualiza las estadísticas del planificador (PRAGMA optimize o
+  ANALYZE); el comando optimizar_bd la ejecuta periódicamente.
+
+En otros motores todo se reduce a transaction.atomic() y ANALYZE.
+"""
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connection as conexion_por_defecto, transaction
+
+PRAGMAS = {
+    'journal_mode': 'WAL',
+    # Con WAL solo se sincroniza en los checkpoints; no se pierde consistencia
+    'synchronous': 'NORMAL',
+    'busy_timeout': 20000,
+    'mmap_size': 256 * 1024 * 1024,
+    # Negativo: en KiB en vez de páginas (64 MiB)
+    'cache_size': -64000,
+    'temp_store': 'MEMORY',
+}
+
+
+def pragmas():
+    return getattr(settings, 'BIBLIOTECA_SQLITE_PRAGMAS', PRAGMAS)
+
+
+def aplicar_pragmas(sender, connection, **kwargs):
+    """Receptor de connection_created: configura cada conexión SQLite al abrirse."""
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for nombre, valor in pragmas().items():
+            cursor.execute(f'PRAGMA {nombre} = {valor}')
+
+
+@contextmanager
+def transaccion_escritura(using=None):
+    """
+    transaction.atomic() que en SQLite toma el bloqueo de escritura al empezar.
+
+    Dentro de otro bloque atomic() no cambia nada: la transacción ya existe.
+    """
+    conexion = transaction.get_connection(using)
+    inmediata = (
+        conexion.vendor == 'sqlite' and not conexion.in_atomic_block
+        and getattr(settings, 'BIBLIOTECA_SQLITE_IMMEDIATE', True)
+    )
+    if not inmediata:
+        with transaction.atomic(using=using):
+            yield
+        return
+
+    # Al conectar se relee transaction_mode de OPTIONS: se conecta antes de cambiarlo.
+    conexion.ensure_connection()
+    anterior = conexion.transaction_mode
+    conexion.transaction_mode = 'IMMEDIATE'
+    try:
+        with transaction.atomic(using=using):
+            conexion.transaction_mode = anterior
+            yield
+    finally:
+        conexion.transaction_mode = anterior
+
+
+def optimizar(conexion=None, analizar_todo=False):
+    """
+    Actualiza las estadísticas del planificador y devuelve las sentencias ejecutadas.
+
+    En SQLite, PRAGMA optimize solo analiza las tablas que lo necesitan;
+    `analizar_todo` fuerza un ANALYZE completo. Con WAL se añade un checkpoint
+    que vacía el diario en la base y lo trunca.
+    """
+    conexion = conexion or conexion_por_defecto
+    if conexion.vendor != 'sqlite':
+        sentencias = ['ANALYZE']
+    else:
+        sentencias = ['ANALYZE' if analizar_todo else 'PRAGMA optimize']
+        with conexion.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            if cursor.fetchone()[0].lower() == 'wal':
+                sentencias.append('PRAGMA wal_checkpoint(TRUNCATE)')
+    with conexion.cursor() as cursor:
+        for sentencia in sentencias:
+            cursor.execute(sentencia)
+    return sentencias
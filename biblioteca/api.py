@@ -0,0 +1,352 @@
+"""
+API JSON de solo lectura para la app móvil y los terminales de consulta.
+
+- Solo se leen las columnas pedidas (values()) y las relaciones muchos a
+  muchos de una página se cargan con una consulta por relación.
+- ?fields=titulo,autores limita los campos de la respuesta.
+- Los listados se paginan por cursor (?cursor=), siempre en el mismo orden:
+  los libros por título, también al buscar con ?q= (la relevancia solo
+  ordena la búsqueda de la web). El detalle de un libro
+  lleva un ETag fuerte basado en fecha_actualizacion, de modo que el cliente
+  recibe 304 Not Modified si no hubo cambios.
+"""
+import hashlib
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q, Value
+from django.http import HttpResponse, JsonResponse
+from django.shortcuts import get_object_or_404
+from django.utils.http import parse_etags, quote_etag
+from django.views.decorators.http import condition, require_GET
+
+from .forms import BusquedaLibroForm
+from .models import Autor, Categoria, Etiqueta, Libro, Prestamo, PrestamoArchivado
+from .paginacion import PaginadorCursor, PaginadorCursorCombinado, codificar_cursor, decodificar_cursor
+from . import autocompletado, busqueda
+
+POR_PAGINA = 50
+MAXIMO_POR_PAGINA = 200
+
+# Campo público -> ruta en values()
+CAMPOS_LIBRO = {
+    'id': 'id',
+    'titulo': 'titulo',
+    'isbn': 'isbn',
+    'descripcion': 'descripcion',
+    'editorial': 'editorial',
+    'idioma': 'idioma',
+    'fecha_publicacion': 'fecha_publicacion',
+    'numero_paginas': 'numero_paginas',
+    'cantidad_disponible': 'cantidad_disponible',
+    'total_ejemplares': 'total_ejemplares',
+    'prestamos_activos': 'prestamos_activos',
+    'prestamos_totales': 'prestamos_totales',
+    'ultimo_prestamo': 'ultimo_prestamo',
+    'categoria': 'categoria__nombre',
+    'fecha_actualizacion': 'fecha_actualizacion',
+}
+RELACIONES_LIBRO = ('autores', 'etiquetas')
+CAMPOS_LIBRO_LISTADO = ('id', 'titulo', 'isbn', 'categoria', 'cantidad_disponible', 'autores')
+
+CAMPOS_PRESTAMO = {
+    'id': 'id',
+    'libro': 'libro_id',
+    'libro_titulo': 'libro__titulo',
+    'fecha_prestamo': 'fecha_prestamo',
+    'fecha_vencimiento': 'fecha_vencimiento',
+    'fecha_devolucion': 'fecha_devolucion',
+    'devuelto': 'devuelto',
+}
+
+
+class CamposInvalidos(ValueError):
+    """?fields= pide campos que no existen."""
+
+
+# ============================================================================
+# UTILIDADES
+# ============================================================================
+
+def _error(mensaje, status):
+    return JsonResponse({'error': mensaje}, status=status)
+
+
+def _campos_pedidos(request, disponibles, por_defecto):
+    """Lee ?fields= y comprueba que todos los campos existen."""
+    valor = request.GET.get('fields')
+    if not valor:
+        return list(por_defecto)
+    campos = [campo.strip() for campo in valor.split(',') if campo.strip()]
+    desconocidos = [campo for campo in campos if campo not in disponibles]
+    if desconocidos:
+        raise CamposInvalidos(f'Campos desconocidos: {", ".join(desconocidos)}')
+    return campos
+
+
+def _por_pagina(request):
+    try:
+        return max(1, min(int(request.GET.get('limite', POR_PAGINA)), MAXIMO_POR_PAGINA))
+    except ValueError:
+        return POR_PAGINA
+
+
+def _url_cursor(request, cursor):
+    if cursor is None:
+        return None
+    parametros = request.GET.copy()
+    parametros['cursor'] = cursor
+    return f'{request.path}?{parametros.urlencode()}'
+
+
+def _etag(*partes):
+    return hashlib.md5(json.dumps(partes, cls=DjangoJSONEncoder).encode()).hexdigest()
+
+
+def _responder(request, datos, etag):
+    """Responde 304 si el cliente ya tiene esta versión; si no, el JSON con su ETag."""
+    etag = quote_etag(etag)
+    if etag in parse_etags(request.headers.get('If-None-Match', '')):
+        response = HttpResponse(status=304)
+    else:
+        response = JsonResponse(datos, json_dumps_params={'ensure_ascii': False})
+    response['ETag'] = etag
+    return response
+
+
+def _listado(request, pagina, resultados):
+    return {
+        'total': pagina.count,
+        'siguiente': _url_cursor(request, pagina.cursor_siguiente),
+        'anterior': _url_cursor(request, pagina.cursor_anterior),
+        'resultados': resultados,
+    }
+
+
+def _serializar_libros(filas, campos):
+    """Convierte filas de values() en diccionarios, cargando las relaciones en bloque."""
+    ids = [fila['id'] for fila in filas]
+    relaciones = {}
+    if 'autores' in campos:
+        relaciones['autores'] = {}
+        autores = Libro.autores.through.objects.filter(libro_id__in=ids).values_list(
+            'libro_id', 'autor_id', 'autor__nombre'
+        )
+        for libro_id, autor_id, nombre in autores:
+            relaciones['autores'].setdefault(libro_id, []).append({'id': autor_id, 'nombre': nombre})
+    if 'etiquetas' in campos:
+        relaciones['etiquetas'] = {}
+        etiquetas = Libro.etiquetas.through.objects.filter(libro_id__in=ids).values_list(
+            'libro_id', 'etiqueta__nombre'
+        )
+        for libro_id, nombre in etiquetas:
+            relaciones['etiquetas'].setdefault(libro_id, []).append(nombre)
+
+    resultado = []
+    for fila in filas:
+        libro = {}
+        for campo in campos:
+            if campo in RELACIONES_LIBRO:
+                libro[campo] = relaciones[campo].get(fila['id'], [])
+            else:
+                libro[campo] = fila[CAMPOS_LIBRO[campo]]
+        resultado.append(libro)
+    return resultado
+
+
+def _columnas_libro(campos):
+    """Columnas de values(): las pedidas más las que necesitan el cursor y el ETag."""
+    columnas = {'id', 'titulo', 'fecha_actualizacion'}
+    columnas.update(CAMPOS_LIBRO[campo] for campo in campos if campo in CAMPOS_LIBRO)
+    return sorted(columnas)
+
+
+# ============================================================================
+# LIBROS
+# ============================================================================
+
+@require_GET
+def libros(request):
+    """
+    Listado de libros con filtros (q, categoria, disponible) y paginación por cursor.
+
+    Se ordena por título aunque haya búsqueda: el cursor avanza sobre
+    (titulo, id), así que ?q= solo filtra y no se puntúa la relevancia.
+    """
+    try:
+        campos = _campos_pedidos(request, set(CAMPOS_LIBRO) | set(RELACIONES_LIBRO), CAMPOS_LIBRO_LISTADO)
+    except CamposInvalidos as e:
+        return _error(str(e), 400)
+
+    queryset = Libro.objects.all()
+    form = BusquedaLibroForm(request.GET)
+    if form.is_valid():
+        if form.cleaned_data.get('q'):
+            queryset = busqueda.filtrar(queryset, form.cleaned_data['q'])
+        if form.cleaned_data.get('categoria'):
+            queryset = queryset.filter(categoria=form.cleaned_data['categoria'])
+        if form.cleaned_data.get('disponible'):
+            queryset = queryset.filter(cantidad_disponible__gt=0)
+
+    pagina = PaginadorCursor(queryset.values(*_columnas_libro(campos)), _por_pagina(request)).get_page(
+        request.GET.get('cursor')
+    )
+    filas = list(pagina)
+    # El ETag se calcula antes de cargar las relaciones: si coincide no hace falta leerlas.
+    etag = _etag(campos, request.GET.get('cursor'), pagina.count, [(f['id'], f['fecha_actualizacion']) for f in filas])
+    if quote_etag(etag) in parse_etags(request.headers.get('If-None-Match', '')):
+        return _responder(request, None, etag)
+    return _responder(request, _listado(request, pagina, _serializar_libros(filas, campos)), etag)
+
+
+def _etag_libro(request, pk):
+    fecha = Libro.objects.filter(pk=pk).values_list('fecha_actualizacion', flat=True).first()
+    if fecha is None:
+        return None
+    return _etag(pk, fecha, request.GET.get('fields', ''))
+
+
+@require_GET
+@condition(etag_func=_etag_libro)
+def libro(request, pk):
+    """Detalle de un libro; responde 304 si el ETag enviado sigue siendo válido."""
+    try:
+        campos = _campos_pedidos(
+            request, set(CAMPOS_LIBRO) | set(RELACIONES_LIBRO), list(CAMPOS_LIBRO) + list(RELACIONES_LIBRO)
+        )
+    except CamposInvalidos as e:
+        return _error(str(e), 400)
+    fila = get_object_or_404(Libro.objects.values(*_columnas_libro(campos)), pk=pk)
+    return JsonResponse(_serializar_libros([fila], campos)[0], json_dumps_params={'ensure_ascii': False})
+
+
+# ============================================================================
+# AUTORES, CATEGORÍAS Y ETIQUETAS
+# ============================================================================
+
+def _listado_por_nombre(request, queryset, campos_disponibles, por_defecto):
+    try:
+        campos = _campos_pedidos(request, campos_disponibles, por_defecto)
+    except CamposInvalidos as e:
+        return _error(str(e), 400)
+    columnas = sorted({'id', 'nombre', *campos})
+    pagina = PaginadorCursor(queryset.values(*columnas), _por_pagina(request), campo='nombre').get_page(
+        request.GET.get('cursor')
+    )
+    resultados = [{campo: fila[campo] for campo in campos} for fila in pagina]
+    datos = _listado(request, pagina, resultados)
+    return _responder(request, datos, _etag(datos))
+
+
+@require_GET
+def autores(request):
+    """Listado de autores ordenado por nombre."""
+    return _listado_por_nombre(
+        request, Autor.objects.all(), {'id', 'nombre', 'biografia', 'fecha_nacimiento'}, ('id', 'nombre')
+    )
+
+
+@require_GET
+def categorias(request):
+    """Listado de categorías ordenado por nombre."""
+    return _listado_por_nombre(request, Categoria.objects.all(), {'id', 'nombre'}, ('id', 'nombre'))
+
+
+@require_GET
+def etiquetas(request):
+    """Listado de etiquetas ordenado por nombre."""
+    return _listado_por_nombre(request, Etiqueta.objects.all(), {'id', 'nombre'}, ('id', 'nombre'))
+
+
+# ============================================================================
+# PRÉSTAMOS DEL USUARIO
+# ============================================================================
+
+@require_GET
+def mis_prestamos(request):
+    """
+    Préstamos del usuario autenticado, del más reciente al más antiguo.
+
+    Incluye los archivados (ver historial.py), que siempre están devueltos.
+    """
+    if not request.user.is_authenticated:
+        return _error('Autenticación requerida.', 401)
+    try:
+        campos = _campos_pedidos(request, set(CAMPOS_PRESTAMO), list(CAMPOS_PRESTAMO))
+    except CamposInvalidos as e:
+        return _error(str(e), 400)
+    columnas = sorted({'id', 'fecha_prestamo', *(CAMPOS_PRESTAMO[campo] for campo in campos)})
+    recientes = Prestamo.objects.filter(usuario=request.user).values(*columnas)
+    archivados = (
+        PrestamoArchivado.objects.filter(usuario=request.user).annotate(devuelto=Value(True)).values(*columnas)
+    )
+    pagina = PaginadorCursorCombinado(
+        [recientes, archivados], _por_pagina(request), campo='-fecha_prestamo'
+    ).get_page(request.GET.get('cursor'))
+    resultados = [{campo: fila[CAMPOS_PRESTAMO[campo]] for campo in campos} for fila in pagina]
+    datos = _listado(request, pagina, resultados)
+    return _responder(request, datos, _etag(datos))
+
+
+# ============================================================================
+# SELECTORES DE FORMULARIO
+# ============================================================================
+
+POR_PAGINA_SELECTOR = 20
+MODELOS_SELECTOR = {'autores': Autor, 'etiquetas': Etiqueta}
+
+
+@require_GET
+def selector(request, modelo):
+    """
+    Opciones para SelectorRemoto y los filtros del admin, paginadas por cursor.
+
+    Se recorre el índice de (nombre, id) a partir del último nombre de la
+    página anterior, sin OFFSET: cada página lee solo hasta encontrar sus
+    coincidencias, sin saltar las filas de las páginas ya vistas.
+    """
+    if not request.user.is_authenticated:
+        return _error('Autenticación requerida.', 401)
+    if modelo not in MODELOS_SELECTOR:
+        return _error(f'Modelo desconocido: {modelo}.', 404)
+    queryset = MODELOS_SELECTOR[modelo].objects.order_by('nombre', 'id')
+    texto = request.GET.get('q', '').strip()
+    if texto:
+        queryset = queryset.filter(nombre__icontains=texto)
+    numero = 1
+    try:
+        nombre, pk, _, numero = decodificar_cursor(request.GET['cursor'])
+    except (KeyError, ValueError):
+        pass
+    else:
+        queryset = queryset.filter(Q(nombre__gt=nombre) | Q(nombre=nombre, id__gt=pk))
+    # Se pide una fila de más para saber si hay otra página sin hacer COUNT(*)
+    filas = list(queryset.values_list('id', 'nombre')[:POR_PAGINA_SELECTOR + 1])
+    siguiente = None
+    if len(filas) > POR_PAGINA_SELECTOR:
+        filas = filas[:POR_PAGINA_SELECTOR]
+        siguiente = codificar_cursor(filas[-1][1], filas[-1][0], 's', numero + 1)
+    return JsonResponse({
+        'resultados': [{'id': pk, 'texto': nombre} for pk, nombre in filas],
+        'mas': siguiente is not None,
+        'siguiente': siguiente,
+    }, json_dumps_params={'ensure_ascii': False})
+
+
+# ============================================================================
+# SUGERENCIAS DEL BUSCADOR
+# ============================================================================
+
+@require_GET
+def sugerencias(request):
+    """Títulos, autores e ISBN que empiezan por ?q=, desde el índice en memoria."""
+    try:
+        limite = max(1, min(int(request.GET.get('limite', autocompletado.LIMITE)), 20))
+    except ValueError:
+        limite = autocompletado.LIMITE
+    response = JsonResponse(
+        {'sugerencias': autocompletado.sugerir(request.GET.get('q', ''), limite)},
+        json_dumps_params={'ensure_ascii': False},
+    )
+    response['Cache-Control'] = 'max-age=60'
+    return response
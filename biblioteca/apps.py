@@ -1,5 +1,11 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
 
 
 class BibliotecaConfig(AppConfig):
     name = 'biblioteca'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        from .ajustes_sqlite import aplicar_pragmas
+        connection_created.connect(aplicar_pragmas, dispatch_uid='biblioteca_pragmas_sqlite')
@@ -0,0 +1,235 @@
+"""
+Sugerencias mientras se escribe en el buscador (títulos, autores e ISBN).
+
+El índice vive en la memoria del proceso: dos listas ordenadas de claves
+normalizadas (minúsculas y sin acentos) en las que un prefijo se localiza
+con bisect en O(log n). Una lista guarda el texto completo y la otra cada
+sufijo que empieza en una palabra, de modo que "soledad" encuentra "Cien años
+de soledad"; las coincidencias al principio del texto salen primero.
+
+Las señales mantienen el índice al día en este proceso. Los demás procesos
+lo reconstruyen cuando caduca (BIBLIOTECA_AUTOCOMPLETADO_TTL) y las cargas
+masivas lo invalidan con invalidar(). Al caducar se sigue sirviendo el índice
+anterior mientras un hilo construye el nuevo; solo se espera cuando aún no
+hay ninguno. Los cambios que llegan durante esa construcción se aplican al
+índice anterior y se guardan para repetirlos en el nuevo antes de publicarlo.
+"""
+import threading
+import time
+import unicodedata
+from bisect import bisect_left, insort
+from itertools import chain
+
+from django.conf import settings
+from django.db import connections
+
+from .models import Autor, Libro
+
+LIMITE = 8
+TTL = 300
+
+
+def normalizar(texto):
+    """Minúsculas, sin acentos y con los espacios colapsados."""
+    texto = unicodedata.normalize('NFKD', texto or '')
+    texto = ''.join(c for c in texto if not unicodedata.combining(c))
+    return ' '.join(texto.lower().split())
+
+
+def _normalizar_isbn(isbn):
+    return ''.join(c for c in isbn or '' if c.isalnum()).lower()
+
+
+class IndicePrefijos:
+    """Listas ordenadas de (clave, tipo, id) con altas y bajas incrementales."""
+
+    def __init__(self):
+        self.inicios = []
+        self.palabras = []
+        self.textos = {}
+        self.claves = {}
+        self.cerrojo = threading.Lock()
+        self.creado = time.monotonic()
+
+    def __len__(self):
+        return len(self.textos)
+
+    @staticmethod
+    def _claves(texto, extra):
+        clave = normalizar(texto)
+        if not clave:
+            return [], []
+        partes = clave.split(' ')
+        return [clave, *filter(None, extra)], [' '.join(partes[i:]) for i in range(1, len(partes))]
+
+    def cargar(self, entradas):
+        """Carga inicial de (tipo, id, texto, extra): añade todo y ordena una sola vez."""
+        with self.cerrojo:
+            for tipo, pk, texto, extra in entradas:
+                inicios, palabras = self._claves(texto, extra)
+                if not inicios:
+                    continue
+                self.inicios.extend((clave, tipo, pk) for clave in inicios)
+                self.palabras.extend((clave, tipo, pk) for clave in palabras)
+                self.textos[(tipo, pk)] = texto
+                self.claves[(tipo, pk)] = (inicios, palabras)
+            self.inicios.sort()
+            self.palabras.sort()
+
+    def agregar(self, tipo, pk, texto, extra=()):
+        """Añade o reemplaza una entrada. `extra` son claves adicionales (p. ej. el ISBN)."""
+        with self.cerrojo:
+            self._quitar((tipo, pk))
+            inicios, palabras = self._claves(texto, extra)
+            if not inicios:
+                return
+            for lista, nuevas in ((self.inicios, inicios), (self.palabras, palabras)):
+                for nueva in nuevas:
+                    insort(lista, (nueva, tipo, pk))
+            self.textos[(tipo, pk)] = texto
+            self.claves[(tipo, pk)] = (inicios, palabras)
+
+    def quitar(self, tipo, pk):
+        with self.cerrojo:
+            self._quitar((tipo, pk))
+
+    def _quitar(self, entrada):
+        claves = self.claves.pop(entrada, None)
+        if claves is None:
+            return
+        self.textos.pop(entrada, None)
+        for lista, viejas in zip((self.inicios, self.palabras), claves):
+            for vieja in viejas:
+                posicion = bisect_left(lista, (vieja, *entrada))
+                if posicion < len(lista) and lista[posicion] == (vieja, *entrada):
+                    del lista[posicion]
+
+    def buscar(self, texto, limite=LIMITE):
+        """Hasta `limite` sugerencias cuyo texto, o alguna palabra, empiece por `texto`."""
+        prefijo = normalizar(texto)
+        if not prefijo:
+            return []
+        if set(prefijo) <= set('0123456789- x'):
+            # Parece un ISBN: se buscan solo sus dígitos
+            prefijo = _normalizar_isbn(prefijo)
+        vistos = set()
+        resultado = []
+        with self.cerrojo:
+            for lista in (self.inicios, self.palabras):
+                posicion = bisect_left(lista, (prefijo,))
+                while posicion < len(lista) and len(resultado) < limite:
+                    clave, tipo, pk = lista[posicion]
+                    if not clave.startswith(prefijo):
+                        break
+                    if (tipo, pk) not in vistos:
+                        vistos.add((tipo, pk))
+                        resultado.append({'tipo': tipo, 'id': pk, 'texto': self.textos[(tipo, pk)]})
+                    posicion += 1
+        return resultado
+
+
+# ============================================================================
+# ÍNDICE DEL PROCESO
+# ============================================================================
+
+_indice = None
+_cerrojo_construccion = threading.Lock()
+# Publicar un índice construido en segundo plano no debe pisar un invalidar()
+_cerrojo_publicacion = threading.Lock()
+# Cambios recibidos mientras se construye el índice siguiente (None si no se construye)
+_pendientes = None
+
+
+def construir():
+    """Crea un índice nuevo con todos los libros y autores."""
+    indice = IndicePrefijos()
+    libros = Libro.objects.values_list('id', 'titulo', 'isbn').iterator(chunk_size=5000)
+    autores = Autor.objects.values_list('id', 'nombre').iterator(chunk_size=5000)
+    indice.cargar(chain(
+        (('libro', pk, titulo, [_normalizar_isbn(isbn)]) for pk, titulo, isbn in libros),
+        (('autor', pk, nombre, ()) for pk, nombre in autores),
+    ))
+    return indice
+
+
+def ttl():
+    """Segundos que se usa el índice antes de reconstruirlo."""
+    return getattr(settings, 'BIBLIOTECA_AUTOCOMPLETADO_TTL', TTL)
+
+
+def _reemplazar(anterior):
+    """Construye un índice nuevo en segundo plano y lo publica si nadie ha invalidado `anterior`."""
+    global _indice, _pendientes
+    try:
+        with _cerrojo_publicacion:
+            _pendientes = []
+        nuevo = construir()
+        with _cerrojo_publicacion:
+            if _indice is anterior:
+                # Lo que cambió mientras se leía la base (agregar y quitar reemplazan,
+                # así que repetir un cambio ya leído no altera el resultado)
+                for metodo, argumentos in _pendientes:
+                    getattr(nuevo, metodo)(*argumentos)
+                _indice = nuevo
+    finally:
+        with _cerrojo_publicacion:
+            _pendientes = None
+        # El hilo no vuelve a usar su conexión
+        connections.close_all()
+        _cerrojo_construccion.release()
+
+
+def obtener_indice():
+    """
+    Índice del proceso; se construye la primera vez y se renueva al caducar.
+
+    Solo la primera construcción bloquea. Un índice caducado se sigue
+    devolviendo mientras un único hilo construye el siguiente.
+    """
+    global _indice
+    indice = _indice
+    if indice is None:
+        with _cerrojo_construccion:
+            if _indice is None:
+                _indice = construir()
+            return _indice
+    if time.monotonic() - indice.creado > ttl() and _cerrojo_construccion.acquire(blocking=False):
+        try:
+            threading.Thread(target=_reemplazar, args=(indice,), daemon=True).start()
+        except BaseException:
+            _cerrojo_construccion.release()
+            raise
+    return indice
+
+
+def invalidar():
+    """Descarta el índice; se reconstruye en la próxima consulta."""
+    global _indice
+    with _cerrojo_publicacion:
+        _indice = None
+
+
+def sugerir(texto, limite=LIMITE):
+    return obtener_indice().buscar(texto, limite)
+
+
+def _aplicar(metodo, *argumentos):
+    """Aplica un cambio al índice actual y lo anota si se está construyendo otro."""
+    with _cerrojo_publicacion:
+        indice = _indice
+        if _pendientes is not None:
+            _pendientes.append((metodo, argumentos))
+    if indice is not None:
+        getattr(indice, metodo)(*argumentos)
+
+
+def actualizar_libro(pk, titulo, isbn):
+    _aplicar('agregar', 'libro', pk, titulo, [_normalizar_isbn(isbn)])
+
+
+def actualizar_autor(pk, nombre):
+    _aplicar('agregar', 'autor', pk, nombre)
+
+
+def quitar(tipo, pk):
+    _aplicar('quitar', tipo, pk)
@@ -0,0 +1,208 @@
+"""
+Índice de búsqueda de texto completo para el catálogo de libros.
+
+En SQLite se usa una tabla virtual FTS5 y en PostgreSQL una tabla con una
+columna tsvector indexada con GIN. En otros motores se recurre a la búsqueda
+con icontains de siempre.
+"""
+import re
+
+from django.db import connection
+from django.db.models import Q
+
+TABLA_INDICE = 'biblioteca_libro_busqueda'
+
+MOTORES_SOPORTADOS = ('sqlite', 'postgresql')
+
+# Pesos bm25 de SQLite por columna: titulo, autores, isbn, editorial, descripcion
+PESOS_SQLITE = (10.0, 5.0, 5.0, 2.0, 1.0)
+
+
+def soportado(conexion=None):
+    """Indica si el motor de la conexión tiene índice de texto completo."""
+    return (conexion or connection).vendor in MOTORES_SOPORTADOS
+
+
+# ============================================================================
+# ESQUEMA
+# ============================================================================
+
+def crear_tabla(conexion):
+    """Crea la tabla del índice según el motor de la conexión."""
+    with conexion.cursor() as cursor:
+        if conexion.vendor == 'sqlite':
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {TABLA_INDICE} USING fts5("
+                "titulo, autores, isbn, editorial, descripcion, "
+                "tokenize='unicode61 remove_diacritics 2')"
+            )
+        elif conexion.vendor == 'postgresql':
+            cursor.execute(
+                f"CREATE TABLE IF NOT EXISTS {TABLA_INDICE} ("
+                "libro_id bigint PRIMARY KEY REFERENCES biblioteca_libro(id) ON DELETE CASCADE, "
+                "documento tsvector NOT NULL)"
+            )
+            cursor.execute(
+                f"CREATE INDEX IF NOT EXISTS {TABLA_INDICE}_documento_gin "
+                f"ON {TABLA_INDICE} USING GIN (documento)"
+            )
+
+
+def eliminar_tabla(conexion):
+    """Elimina la tabla del índice si existe."""
+    if soportado(conexion):
+        with conexion.cursor() as cursor:
+            cursor.execute(f'DROP TABLE IF EXISTS {TABLA_INDICE}')
+
+
+# ============================================================================
+# MANTENIMIENTO DEL ÍNDICE
+# ============================================================================
+
+def _sql_poblar(vendor, filtro):
+    """SQL que (re)genera las filas del índice a partir de las tablas del catálogo."""
+    if vendor == 'sqlite':
+        autores = (
+            "COALESCE((SELECT group_concat(a.nombre, ' ') FROM biblioteca_libro_autores la "
+            "JOIN biblioteca_autor a ON a.id = la.autor_id WHERE la.libro_id = l.id), '')"
+        )
+        return (
+            f"INSERT INTO {TABLA_INDICE} (rowid, titulo, autores, isbn, editorial, descripcion) "
+            f"SELECT l.id, l.titulo, {autores}, l.isbn, COALESCE(l.editorial, ''), l.descripcion "
+            f"FROM biblioteca_libro l {filtro}"
+        )
+    autores = (
+        "COALESCE((SELECT string_agg(a.nombre, ' ') FROM biblioteca_libro_autores la "
+        "JOIN biblioteca_autor a ON a.id = la.autor_id WHERE la.libro_id = l.id), '')"
+    )
+    return (
+        f"INSERT INTO {TABLA_INDICE} (libro_id, documento) "
+        "SELECT l.id, "
+        "setweight(to_tsvector('simple', l.titulo), 'A') || "
+        f"setweight(to_tsvector('simple', {autores}), 'A') || "
+        "setweight(to_tsvector('simple', l.isbn || ' ' || COALESCE(l.editorial, '')), 'B') || "
+        "setweight(to_tsvector('simple', l.descripcion), 'C') "
+        f"FROM biblioteca_libro l {filtro}"
+    )
+
+
+def _columna_id(vendor):
+    return 'rowid' if vendor == 'sqlite' else 'libro_id'
+
+
+def reconstruir(conexion=None):
+    """Vacía y vuelve a poblar el índice completo con una sola sentencia."""
+    conexion = conexion or connection
+    if not soportado(conexion):
+        return 0
+    with conexion.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLA_INDICE}')
+        cursor.execute(_sql_poblar(conexion.vendor, ''))
+        return cursor.rowcount
+
+
+def actualizar_libros(ids):
+    """Regenera las entradas del índice de los libros indicados."""
+    ids = [int(pk) for pk in ids]
+    if not ids or not soportado():
+        return
+    marcadores = ', '.join(['%s'] * len(ids))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {TABLA_INDICE} WHERE {_columna_id(connection.vendor)} IN ({marcadores})', ids
+        )
+        cursor.execute(_sql_poblar(connection.vendor, f'WHERE l.id IN ({marcadores})'), ids)
+
+
+def eliminar_libros(ids):
+    """Quita del índice las entradas de los libros indicados."""
+    ids = [int(pk) for pk in ids]
+    if not ids or not soportado():
+        return
+    marcadores = ', '.join(['%s'] * len(ids))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {TABLA_INDICE} WHERE {_columna_id(connection.vendor)} IN ({marcadores})', ids
+        )
+
+
+# ============================================================================
+# CONSULTA
+# ============================================================================
+
+def _terminos(texto):
+    """Separa la búsqueda en términos, uniendo los guiones de un ISBN."""
+    texto = re.sub(r'(?<=\d)-(?=\d)', '', texto)
+    return re.findall(r'\w+', texto.lower())
+
+
+def _consulta(vendor, terminos):
+    if vendor == 'sqlite':
+        return ' '.join(f'"{termino}"*' for termino in terminos)
+    return ' & '.join(f'{termino}:*' for termino in terminos)
+
+
+def filtrar(queryset, texto):
+    """
+    Filtra por el texto buscado sin calcular la relevancia ni cambiar el orden.
+
+    Para listados con su propio orden (p. ej. el admin): evita puntuar todas las
+    coincidencias y deja que el índice del orden recorra la tabla.
+    """
+    if not soportado():
+        return queryset.filter(
+            Q(titulo__icontains=texto) | Q(autores__nombre__icontains=texto) | Q(isbn__icontains=texto)
+        ).distinct()
+
+    terminos = _terminos(texto)
+    if not terminos:
+        return queryset.none()
+
+    if connection.vendor == 'sqlite':
+        coincidencias = f'SELECT rowid FROM {TABLA_INDICE} WHERE {TABLA_INDICE} MATCH %s'
+    else:
+        coincidencias = (
+            f"SELECT libro_id FROM {TABLA_INDICE} WHERE documento @@ to_tsquery('simple', %s)"
+        )
+    return queryset.extra(
+        where=[f'biblioteca_libro.id IN ({coincidencias})'],
+        params=[_consulta(connection.vendor, terminos)],
+    )
+
+
+def buscar(queryset, texto):
+    """
+    Filtra un queryset de Libro por el texto buscado, ordenado por relevancia.
+
+    Los resultados llevan el atributo `relevancia` (menor es mejor). Cada término
+    se busca como prefijo y deben aparecer todos.
+    """
+    if not soportado():
+        return queryset.filter(
+            Q(titulo__icontains=texto) | Q(autores__nombre__icontains=texto) | Q(isbn__icontains=texto)
+        ).distinct().order_by('titulo')
+
+    terminos = _terminos(texto)
+    if not terminos:
+        return queryset.none()
+
+    consulta = _consulta(connection.vendor, terminos)
+    if connection.vendor == 'sqlite':
+        pesos = ', '.join(str(peso) for peso in PESOS_SQLITE)
+        return queryset.extra(
+            tables=[TABLA_INDICE],
+            where=[f'{TABLA_INDICE}.rowid = biblioteca_libro.id', f'{TABLA_INDICE} MATCH %s'],
+            params=[consulta],
+            select={'relevancia': f'bm25({TABLA_INDICE}, {pesos})'},
+        ).order_by('relevancia', 'titulo')
+
+    return queryset.extra(
+        tables=[TABLA_INDICE],
+        where=[
+            f'{TABLA_INDICE}.libro_id = biblioteca_libro.id',
+            f"{TABLA_INDICE}.documento @@ to_tsquery('simple', %s)",
+        ],
+        params=[consulta],
+        select={'relevancia': f"-ts_rank({TABLA_INDICE}.documento, to_tsquery('simple', %s))"},
+        select_params=[consulta],
+    ).order_by('relevancia', 'titulo')
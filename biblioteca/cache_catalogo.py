@@ -0,0 +1,170 @@
+"""
+Caché de páginas del catálogo para visitantes anónimos.
+
+- El detalle de un libro se guarda con una clave que incluye su
+  fecha_actualizacion, así que cualquier cambio del libro (también de stock,
+  autores, etiquetas o categoría, que la actualizan) genera una clave nueva.
+  También incluye la de los libros que recomienda y la última reconstrucción
+  de sus recomendaciones.
+- Los listados y la portada dependen de muchos libros a la vez: su clave
+  incluye una versión global del catálogo que se incrementa tras cada commit
+  que toca Libro, Autor, Categoria, Etiqueta o Prestamo.
+
+Con varios procesos la caché debe ser compartida (archivo o base de datos)
+para que todos vean la nueva versión. Las respuestas que se van a guardar se
+generan leyendo de la base primaria, nunca de una réplica con retraso.
+"""
+import hashlib
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+
+from django.conf import settings
+from django.contrib import messages
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from . import enrutador
+from .forms import BusquedaLibroForm
+from .models import Libro
+
+TIMEOUT = 600
+CLAVE_VERSION = 'biblioteca:version-catalogo'
+
+
+def ttl():
+    """Segundos que se guarda una página o un fragmento (BIBLIOTECA_CACHE_TTL)."""
+    return getattr(settings, 'BIBLIOTECA_CACHE_TTL', TIMEOUT)
+
+
+def version_catalogo():
+    """Versión actual del catálogo; cambia cada vez que algo se modifica."""
+    return cache.get_or_set(CLAVE_VERSION, 1, None)
+
+
+def _incrementar_version():
+    try:
+        cache.incr(CLAVE_VERSION)
+    except ValueError:
+        cache.set(CLAVE_VERSION, 2, None)
+
+
+def invalidar_catalogo():
+    """Invalida listados y portada cuando se confirme la transacción en curso."""
+    transaction.on_commit(_incrementar_version)
+
+
+def marcar_modificados(libro_ids):
+    """Actualiza fecha_actualizacion de los libros para renovar sus claves de caché."""
+    libro_ids = list(libro_ids)
+    if libro_ids:
+        Libro.objects.filter(pk__in=libro_ids).update(fecha_actualizacion=timezone.now())
+    invalidar_catalogo()
+
+
+# ============================================================================
+# CLAVES
+# ============================================================================
+
+def clave_portada(request):
+    return f'biblioteca:portada:{version_catalogo()}'
+
+
+def clave_listado(request):
+    """Clave del listado a partir de los parámetros de búsqueda normalizados."""
+    form = BusquedaLibroForm(request.GET)
+    if not form.is_valid():
+        return None
+    categoria = form.cleaned_data.get('categoria')
+    partes = [
+        ' '.join((form.cleaned_data.get('q') or '').lower().split()),
+        str(categoria.pk if categoria else ''),
+        '1' if form.cleaned_data.get('disponible') else '',
+        form.cleaned_data.get('orden') or '',
+        request.GET.get('cursor', ''),
+        request.GET.get('page', ''),
+    ]
+    resumen = hashlib.md5('|'.join(partes).encode()).hexdigest()
+    return f'biblioteca:listado:{version_catalogo()}:{resumen}'
+
+
+def clave_detalle(request, pk):
+    """
+    Clave de la ficha: cambia con el libro, con los libros que recomienda y al recalcular sus recomendaciones.
+
+    La ficha muestra el título y la disponibilidad de los recomendados, así que
+    su fecha_actualizacion más reciente entra en la clave; cada reconstrucción
+    crea filas de Recomendacion con ids nuevos, así que también el id mayor.
+    """
+    fila = (
+        Libro.objects.filter(pk=pk).values_list('fecha_actualizacion')
+        .annotate(
+            vecinos=Max('recomendaciones__recomendado__fecha_actualizacion'),
+            recalculo=Max('recomendaciones__id'),
+        )
+        .order_by('pk').first()
+    )
+    if fila is None:
+        return None
+    fecha, vecinos, recalculo = fila
+    return f'biblioteca:detalle:{pk}:{fecha.timestamp()}:{vecinos.timestamp() if vecinos else ""}:{recalculo or ""}'
+
+
+# ============================================================================
+# DECORADOR
+# ============================================================================
+
+def _cacheable(request):
+    """Solo GET de anónimos sin mensajes pendientes."""
+    return (
+        request.method == 'GET'
+        and not request.user.is_authenticated
+        and not len(messages.get_messages(request))
+    )
+
+
+def cache_anonimo(calcular_clave):
+    """
+    Guarda en caché la respuesta de la vista para visitantes anónimos.
+
+    `calcular_clave(request, *args, **kwargs)` devuelve la clave o None para no
+    usar la caché. Las peticiones con mensajes pendientes no se guardan ni se
+    sirven desde la caché. Si no está en la caché, la vista lee de la primaria.
+    Admite vistas síncronas y asíncronas.
+    """
+    def decorador(vista):
+        if iscoroutinefunction(vista):
+            @wraps(vista)
+            async def envoltura_async(request, *args, **kwargs):
+                clave = None
+                if await sync_to_async(_cacheable)(request):
+                    clave = await sync_to_async(calcular_clave)(request, *args, **kwargs)
+                if clave is None:
+                    return await vista(request, *args, **kwargs)
+                response = await cache.aget(clave)
+                if response is None:
+                    with enrutador.primaria():
+                        response = await vista(request, *args, **kwargs)
+                    if response.status_code == 200 and not response.streaming:
+                        await cache.aset(clave, response, ttl())
+                return response
+            return envoltura_async
+
+        @wraps(vista)
+        def envoltura(request, *args, **kwargs):
+            if not _cacheable(request):
+                return vista(request, *args, **kwargs)
+            clave = calcular_clave(request, *args, **kwargs)
+            if clave is None:
+                return vista(request, *args, **kwargs)
+            response = cache.get(clave)
+            if response is None:
+                with enrutador.primaria():
+                    response = vista(request, *args, **kwargs)
+                if response.status_code == 200 and not response.streaming:
+                    cache.set(clave, response, ttl())
+            return response
+        return envoltura
+    return decorador
@@ -0,0 +1,99 @@
+"""
+Registro de las consultas SQL ejecutadas, detección de N+1 y presupuestos.
+
+RegistroConsultas se engancha a las conexiones con connection.execute_wrapper
+y guarda cada sentencia con su duración. Las sentencias se agrupan por forma
+(sin literales ni listas de parámetros): una misma forma repetida muchas veces
+en una petición es el síntoma típico de un N+1.
+"""
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+
+from django.db import connections
+
+UMBRAL_N_MAS_1 = 5
+
+
+class PresupuestoConsultasExcedido(AssertionError):
+    """Una vista o bloque ejecutó más consultas de las declaradas, o un N+1."""
+
+
+def forma_consulta(sql):
+    """Normaliza una sentencia para agrupar las que solo difieren en sus valores."""
+    sql = re.sub(r'\(\s*%s(?:\s*,\s*%s)*\s*\)', '(...)', sql)
+    sql = re.sub(r"'(?:[^']|'')*'", '?', sql)
+    return re.sub(r'\b\d+\b', 'N', sql)
+
+
+class RegistroConsultas:
+    """Envoltorio de execute_wrapper que acumula las sentencias y su duración."""
+
+    def __init__(self):
+        self.consultas = []
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.consultas.append((sql, time.perf_counter() - inicio))
+
+    @contextmanager
+    def registrar(self):
+        """Registra las consultas de todas las conexiones mientras dure el bloque."""
+        with ExitStack() as pila:
+            for conexion in connections.all():
+                pila.enter_context(conexion.execute_wrapper(self))
+            yield self
+
+    @property
+    def total(self):
+        return len(self.consultas)
+
+    @property
+    def duracion(self):
+        """Tiempo total en base de datos, en segundos."""
+        return sum(duracion for _, duracion in self.consultas)
+
+    def repetidas(self, umbral=UMBRAL_N_MAS_1):
+        """Formas de consulta ejecutadas al menos `umbral` veces, de más a menos."""
+        conteo = Counter(forma_consulta(sql) for sql, _ in self.consultas)
+        return [(forma, veces) for forma, veces in conteo.most_common() if veces >= umbral]
+
+
+@contextmanager
+def presupuesto(maximo=None, umbral=UMBRAL_N_MAS_1):
+    """
+    Falla si el bloque supera `maximo` consultas o repite una forma `umbral` veces.
+
+    Pensado para las pruebas:
+
+        with presupuesto(5):
+            self.client.get(url)
+    """
+    registro = RegistroConsultas()
+    with registro.registrar():
+        yield registro
+    comprobar(registro, maximo, umbral)
+
+
+def comprobar(registro, maximo=None, umbral=UMBRAL_N_MAS_1):
+    """Lanza PresupuestoConsultasExcedido si el registro no respeta los límites."""
+    if maximo is not None and registro.total > maximo:
+        raise PresupuestoConsultasExcedido(
+            f'Se ejecutaron {registro.total} consultas (presupuesto: {maximo}).'
+        )
+    repetidas = registro.repetidas(umbral)
+    if repetidas:
+        forma, veces = repetidas[0]
+        raise PresupuestoConsultasExcedido(f'Posible N+1: {veces} consultas con la forma "{forma}".')
+
+
+def presupuesto_consultas(maximo):
+    """Decorador que declara cuántas consultas puede ejecutar una vista."""
+    def decorador(vista):
+        vista.presupuesto_consultas = maximo
+        return vista
+    return decorador
@@ -0,0 +1,125 @@
+"""
+Lecturas del catálogo en réplicas de solo lectura.
+
+EnrutadorReplicas manda las lecturas de Libro, Autor, Categoria, Etiqueta y
+Recomendacion a una de las réplicas de BIBLIOTECA_BD_REPLICAS. Todo lo demás,
+incluidas las escrituras, va a 'default': préstamos, usuarios, sesiones y
+admin.
+
+Solo se usa una réplica dentro de una petición que lo permite, es decir, una
+petición marcada por LecturaReplicasMiddleware. Los comandos, el shell y las
+tareas en segundo plano leen siempre de la primaria y no pueden mezclar datos
+con retraso con sus escrituras. Dentro de una petición también se lee de la
+primaria en estos casos:
+
+- la petición escribe (POST, PUT, DELETE...);
+- hay una transacción abierta en la primaria;
+- el navegador escribió hace menos de BIBLIOTECA_BD_RETARDO_REPLICA segundos
+  (cookie de lectura de las propias escrituras);
+- la respuesta va a guardarse en la caché de páginas para anónimos
+  (cache_anonimo): datos con retraso quedarían cacheados bajo la versión
+  nueva del catálogo hasta que caducasen.
+
+Las réplicas deben tener el mismo esquema que la primaria: no se migran aparte.
+"""
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+
+COOKIE = 'bd_primaria'
+RETARDO = 5
+MODELOS_CATALOGO = frozenset({
+    'libro', 'autor', 'categoria', 'etiqueta', 'libro_autores', 'libro_etiquetas', 'recomendacion',
+})
+# Escrituras que no cambian datos que el usuario vaya a leer después
+APPS_SIN_SEGUIMIENTO = frozenset({'sessions', 'django_cache'})
+
+
+class EstadoPeticion:
+    """Lo que el enrutador sabe de la petición en curso."""
+
+    def __init__(self, primaria=False):
+        self.primaria = primaria
+        self.escribio = False
+
+
+_estado = ContextVar('biblioteca_estado_replicas', default=None)
+
+
+def replicas():
+    return getattr(settings, 'BIBLIOTECA_BD_REPLICAS', ())
+
+
+def retardo():
+    """Segundos que se lee de la primaria después de escribir."""
+    return getattr(settings, 'BIBLIOTECA_BD_RETARDO_REPLICA', RETARDO)
+
+
+@contextmanager
+def peticion(primaria=False):
+    """Permite leer el catálogo de las réplicas dentro del bloque y devuelve su EstadoPeticion."""
+    estado = EstadoPeticion(primaria)
+    token = _estado.set(estado)
+    try:
+        yield estado
+    finally:
+        _estado.reset(token)
+
+
+@contextmanager
+def primaria():
+    """Lee de la primaria dentro del bloque, aunque la petición en curso permita réplicas."""
+    estado = _estado.get()
+    if estado is None or estado.primaria:
+        yield
+        return
+    estado.primaria = True
+    try:
+        yield
+    finally:
+        estado.primaria = False
+
+
+def escribio_hace_poco(valor_cookie):
+    """True si la cookie de lectura de las propias escrituras sigue vigente."""
+    try:
+        return float(valor_cookie) > time.time()
+    except (TypeError, ValueError):
+        return False
+
+
+class EnrutadorReplicas:
+    """Router de DATABASE_ROUTERS; sin réplicas configuradas no cambia nada."""
+
+    def db_for_read(self, model, **hints):
+        estado = _estado.get()
+        disponibles = replicas()
+        if (
+            estado is None or estado.primaria or not disponibles
+            or model._meta.app_label != 'biblioteca'
+            or model._meta.model_name not in MODELOS_CATALOGO
+            or connections['default'].in_atomic_block
+        ):
+            return None
+        instancia = hints.get('instance')
+        if instancia is not None and instancia._state.db:
+            # Relaciones de un objeto ya cargado: de la misma base que él
+            return instancia._state.db
+        return random.choice(disponibles)
+
+    def db_for_write(self, model, **hints):
+        estado = _estado.get()
+        if estado is not None and model._meta.app_label not in APPS_SIN_SEGUIMIENTO:
+            estado.escribio = True
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Primaria y réplicas tienen los mismos datos
+        bases = {'default', *replicas()}
+        if obj1._state.db in bases and obj2._state.db in bases:
+            return True
+        return None
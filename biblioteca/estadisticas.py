@@ -0,0 +1,139 @@
+"""
+Contadores del catálogo precalculados para la página de inicio.
+
+Cada total vive en una fila de Contador que se ajusta con UPDATE sobre F()
+desde las señales y los caminos masivos (préstamos, importación), así que
+leerlos es una sola consulta pequeña en vez de varios COUNT(*). El comando
+recalcular_estadisticas corrige cualquier desviación.
+
+Los contadores de préstamos de cada libro (Libro.prestamos_activos, etc.)
+siguen la misma idea y se verifican con recalcular_libros().
+"""
+from functools import reduce
+from operator import or_
+
+from django.db.models import Count, F, Max, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+from .models import Autor, Categoria, Contador, Libro, Prestamo, PrestamoArchivado
+from . import cache_catalogo
+
+# Cómo se calcula cada contador desde cero
+CONTADORES = {
+    'libros': lambda: Libro.objects.count(),
+    'autores': lambda: Autor.objects.count(),
+    'categorias': lambda: Categoria.objects.count(),
+    'prestamos_activos': lambda: Prestamo.objects.filter(devuelto=False).count(),
+    'libros_agotados': lambda: Libro.objects.filter(cantidad_disponible=0).count(),
+}
+
+
+def obtener():
+    """Devuelve todos los contadores con una sola consulta."""
+    valores = dict(Contador.objects.values_list('nombre', 'valor'))
+    return {nombre: valores.get(nombre, 0) for nombre in CONTADORES}
+
+
+async def aobtener():
+    """Versión asíncrona de obtener() para las vistas ASGI."""
+    valores = {nombre: valor async for nombre, valor in Contador.objects.values_list('nombre', 'valor')}
+    return {nombre: valores.get(nombre, 0) for nombre in CONTADORES}
+
+
+def incrementar(nombre, delta=1):
+    """Suma `delta` (puede ser negativo) al contador de forma atómica."""
+    if not delta:
+        return
+    if not Contador.objects.filter(nombre=nombre).update(valor=F('valor') + delta):
+        # Si la fila aún no existe se crea con el valor real, que ya incluye el cambio.
+        Contador.objects.get_or_create(nombre=nombre, defaults={'valor': CONTADORES[nombre]()})
+
+
+def recalcular(corregir=True):
+    """
+    Compara cada contador con su valor real y, si `corregir`, lo ajusta.
+
+    Devuelve {nombre: (guardado, real)} solo para los contadores desviados.
+    """
+    guardados = dict(Contador.objects.values_list('nombre', 'valor'))
+    desviados = {}
+    for nombre, calcular in CONTADORES.items():
+        real = calcular()
+        if guardados.get(nombre) != real:
+            desviados[nombre] = (guardados.get(nombre), real)
+            if corregir:
+                Contador.objects.update_or_create(nombre=nombre, defaults={'valor': real})
+    return desviados
+
+
+# ============================================================================
+# CONTADORES DE CADA LIBRO
+# ============================================================================
+
+CONTADORES_LIBRO = ('total_ejemplares', 'prestamos_activos', 'prestamos_totales', 'ultimo_prestamo')
+
+# Libros por UPDATE al corregir, para no pasar miles de parámetros de una vez
+TAMANO_LOTE_LIBROS = 1000
+
+
+def _de_prestamos(agregado, modelo=Prestamo, **filtros):
+    """Subconsulta correlacionada con un agregado de los préstamos del libro."""
+    return Subquery(
+        modelo.objects.filter(libro=OuterRef('pk'), **filtros)
+        .order_by().values('libro').annotate(valor=agregado).values('valor')
+    )
+
+
+def contadores_reales():
+    """Expresiones con el valor real de cada contador del libro, desde Prestamo y su archivo."""
+    activos = Coalesce(_de_prestamos(Count('id'), devuelto=False), 0)
+    ultimo = _de_prestamos(Max('fecha_prestamo'))
+    ultimo_archivado = _de_prestamos(Max('fecha_prestamo'), PrestamoArchivado)
+    return {
+        'total_ejemplares': F('cantidad_disponible') + activos,
+        'prestamos_activos': activos,
+        'prestamos_totales': (
+            Coalesce(_de_prestamos(Count('id')), 0) + Coalesce(_de_prestamos(Count('id'), PrestamoArchivado), 0)
+        ),
+        # GREATEST con NULL da NULL en SQLite: cada lado cae en el otro si está vacío.
+        'ultimo_prestamo': Greatest(Coalesce(ultimo, ultimo_archivado), Coalesce(ultimo_archivado, ultimo)),
+    }
+
+
+def _distinto(campo):
+    """Q de las filas cuyo `campo` no coincide con `campo_real` (NULL incluido)."""
+    real = f'{campo}_real'
+    return (
+        (Q(**{f'{campo}__isnull': False, f'{real}__isnull': False}) & ~Q(**{campo: F(real)}))
+        | Q(**{f'{campo}__isnull': True, f'{real}__isnull': False})
+        | Q(**{f'{campo}__isnull': False, f'{real}__isnull': True})
+    )
+
+
+def recalcular_libros(corregir=True, muestra=10):
+    """
+    Compara los contadores de todos los libros con Prestamo en una sola consulta.
+
+    Si `corregir`, reescribe los desviados con UPDATE por lotes. Devuelve
+    (total de libros desviados, hasta `muestra` filas con guardado y real).
+    """
+    reales = {f'{campo}_real': expresion for campo, expresion in contadores_reales().items()}
+    desviados = (
+        Libro.objects.annotate(**reales)
+        .filter(reduce(or_, (_distinto(campo) for campo in CONTADORES_LIBRO)))
+        .order_by('id')
+    )
+    columnas = ['id', 'titulo', *CONTADORES_LIBRO, *reales]
+    ejemplos = list(desviados.values(*columnas)[:muestra])
+    if not ejemplos:
+        return 0, []
+    ids = list(desviados.values_list('id', flat=True))
+    if corregir:
+        ahora = timezone.now()
+        for inicio in range(0, len(ids), TAMANO_LOTE_LIBROS):
+            Libro.objects.filter(pk__in=ids[inicio:inicio + TAMANO_LOTE_LIBROS]).update(
+                fecha_actualizacion=ahora, **contadores_reales()
+            )
+        cache_catalogo.invalidar_catalogo()
+    return len(ids), ejemplos
@@ -0,0 +1,210 @@
+"""
+Exportación del catálogo y del historial de préstamos en CSV o JSONL.
+
+Las filas se generan con QuerySet.iterator(chunk_size=...): Django lee el
+resultado por bloques y, para los libros, hace el prefetch de autores y
+etiquetas bloque a bloque, así que la memoria no crece con el tamaño de la
+tabla. Las funciones devuelven generadores de texto o bytes que sirven tanto
+para StreamingHttpResponse como para escribir en un archivo.
+
+Los filtros se validan al construir la exportación, antes de empezar a
+enviar datos, para poder responder con un error en lugar de un archivo
+cortado.
+"""
+import csv
+import json
+import zlib
+from datetime import datetime, time
+from itertools import chain
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F, Value
+from django.utils import timezone
+
+from .models import Libro, Prestamo, PrestamoArchivado
+
+TAMANO_BLOQUE = 2000
+FORMATOS = ('csv', 'jsonl')
+ESTADOS = ('activos', 'devueltos')
+
+COLUMNAS_LIBROS = (
+    'id', 'titulo', 'isbn', 'autores', 'categoria', 'etiquetas', 'cantidad_disponible',
+    'editorial', 'idioma', 'fecha_publicacion', 'numero_paginas', 'fecha_agregado',
+)
+COLUMNAS_PRESTAMOS = (
+    'id', 'libro_id', 'libro_titulo', 'libro_isbn', 'usuario_nombre',
+    'fecha_prestamo', 'fecha_devolucion', 'devuelto',
+)
+
+
+class ErrorExportacion(ValueError):
+    """Filtros o formato de exportación no válidos."""
+
+
+# ============================================================================
+# FILTROS
+# ============================================================================
+
+def leer_fecha(texto, fin_del_dia=False):
+    """Convierte 'AAAA-MM-DD' en un datetime consciente (inicio o fin del día)."""
+    if not texto:
+        return None
+    try:
+        fecha = datetime.strptime(texto, '%Y-%m-%d').date()
+    except ValueError:
+        raise ErrorExportacion('La fecha debe tener el formato AAAA-MM-DD.')
+    return timezone.make_aware(datetime.combine(fecha, time.max if fin_del_dia else time.min))
+
+
+def _filtrar_fechas(queryset, campo, desde, hasta):
+    if desde:
+        queryset = queryset.filter(**{f'{campo}__gte': leer_fecha(desde)})
+    if hasta:
+        queryset = queryset.filter(**{f'{campo}__lte': leer_fecha(hasta, fin_del_dia=True)})
+    return queryset
+
+
+# ============================================================================
+# FILAS
+# ============================================================================
+
+def _fila_libro(libro):
+    return {
+        'id': libro.pk,
+        'titulo': libro.titulo,
+        'isbn': libro.isbn,
+        'autores': [autor.nombre for autor in libro.autores.all()],
+        'categoria': libro.categoria.nombre if libro.categoria else None,
+        'etiquetas': [etiqueta.nombre for etiqueta in libro.etiquetas.all()],
+        'cantidad_disponible': libro.cantidad_disponible,
+        'editorial': libro.editorial,
+        'idioma': libro.idioma,
+        'fecha_publicacion': libro.fecha_publicacion,
+        'numero_paginas': libro.numero_paginas,
+        'fecha_agregado': libro.fecha_agregado,
+    }
+
+
+def filas_libros(desde=None, hasta=None, categoria=None, tamano_bloque=TAMANO_BLOQUE):
+    """Libros (filtrados por fecha de alta y categoría) como diccionarios."""
+    queryset = _filtrar_fechas(Libro.objects.all(), 'fecha_agregado', desde, hasta)
+    if categoria:
+        queryset = queryset.filter(categoria_id=categoria)
+    queryset = (
+        queryset.select_related('categoria')
+        .defer('descripcion', 'fecha_actualizacion')
+        .prefetch_related('autores', 'etiquetas')
+        .order_by('pk')
+    )
+    return (_fila_libro(libro) for libro in queryset.iterator(chunk_size=tamano_bloque))
+
+
+def filas_prestamos(desde=None, hasta=None, categoria=None, estado=None, tamano_bloque=TAMANO_BLOQUE):
+    """
+    Préstamos (filtrados por fecha de préstamo, categoría del libro y estado) como diccionarios.
+
+    Primero los de la tabla de préstamos y después los archivados.
+    """
+    queryset = _filtrar_fechas(Prestamo.objects.all(), 'fecha_prestamo', desde, hasta)
+    if categoria:
+        queryset = queryset.filter(libro__categoria_id=categoria)
+    if estado:
+        if estado not in ESTADOS:
+            raise ErrorExportacion(f'Estado desconocido: {estado} (usa {" o ".join(ESTADOS)}).')
+        queryset = queryset.filter(devuelto=estado == 'devueltos')
+    columnas = dict(
+        libro_titulo=F('libro__titulo'), libro_isbn=F('libro__isbn'), usuario_nombre=F('usuario__username'),
+    )
+    recientes = queryset.order_by('pk').values(
+        'id', 'libro_id', 'fecha_prestamo', 'fecha_devolucion', 'devuelto', **columnas
+    ).iterator(chunk_size=tamano_bloque)
+    if estado == 'activos':
+        return recientes
+
+    # Los devueltos antiguos viven en el archivo (ver historial.py)
+    archivados = _filtrar_fechas(PrestamoArchivado.objects.all(), 'fecha_prestamo', desde, hasta)
+    if categoria:
+        archivados = archivados.filter(libro__categoria_id=categoria)
+    archivados = archivados.order_by('pk').values(
+        'id', 'libro_id', 'fecha_prestamo', 'fecha_devolucion', devuelto=Value(True), **columnas
+    ).iterator(chunk_size=tamano_bloque)
+    return chain(recientes, archivados)
+
+
+# ============================================================================
+# FORMATOS
+# ============================================================================
+
+class _Eco:
+    """Pseudo-archivo para csv.writer que devuelve la línea en lugar de guardarla."""
+
+    def write(self, valor):
+        return valor
+
+
+def _valor_csv(valor):
+    if isinstance(valor, list):
+        return '; '.join(valor)
+    if isinstance(valor, datetime):
+        return valor.isoformat()
+    return valor
+
+
+def serializar(filas, formato, columnas):
+    """Genera las líneas de texto de las filas en el formato pedido."""
+    if formato == 'csv':
+        escritor = csv.writer(_Eco())
+        yield escritor.writerow(columnas)
+        for fila in filas:
+            yield escritor.writerow([_valor_csv(fila[columna]) for columna in columnas])
+    elif formato == 'jsonl':
+        for fila in filas:
+            yield json.dumps(fila, cls=DjangoJSONEncoder, ensure_ascii=False) + '\n'
+    else:
+        raise ErrorExportacion(f'Formato desconocido: {formato} (usa {" o ".join(FORMATOS)}).')
+
+
+def codificar(lineas, comprimir=False, tamano_minimo=64 * 1024):
+    """
+    Convierte las líneas a bytes UTF-8, opcionalmente en gzip.
+
+    Las líneas se agrupan hasta `tamano_minimo` bytes para no emitir miles de
+    trozos diminutos.
+    """
+    compresor = zlib.compressobj(wbits=31) if comprimir else None
+    pendiente = []
+    tamano = 0
+    for linea in lineas:
+        datos = linea.encode('utf-8')
+        pendiente.append(datos)
+        tamano += len(datos)
+        if tamano >= tamano_minimo:
+            bloque = b''.join(pendiente)
+            pendiente, tamano = [], 0
+            bloque = compresor.compress(bloque) if compresor else bloque
+            if bloque:
+                yield bloque
+    bloque = b''.join(pendiente)
+    if compresor:
+        bloque = compresor.compress(bloque) + compresor.flush()
+    if bloque:
+        yield bloque
+
+
+def exportar(tipo, formato='csv', comprimir=False, **filtros):
+    """Generador de bytes con la exportación de 'libros' o 'prestamos'."""
+    if formato not in FORMATOS:
+        raise ErrorExportacion(f'Formato desconocido: {formato} (usa {" o ".join(FORMATOS)}).')
+    if filtros.get('categoria'):
+        try:
+            filtros['categoria'] = int(filtros['categoria'])
+        except (TypeError, ValueError):
+            raise ErrorExportacion('La categoría debe ser un ID numérico.')
+    if tipo == 'libros':
+        filtros.pop('estado', None)
+        filas, columnas = filas_libros(**filtros), COLUMNAS_LIBROS
+    elif tipo == 'prestamos':
+        filas, columnas = filas_prestamos(**filtros), COLUMNAS_PRESTAMOS
+    else:
+        raise ErrorExportacion(f'Tipo de exportación desconocido: {tipo}.')
+    return codificar(serializar(filas, formato, columnas), comprimir)
@@ -1,7 +1,9 @@
 from django import forms
 from django.contrib.auth.forms import UserCreationForm, AuthenticationForm
 from django.contrib.auth.models import User
+from django.urls import reverse_lazy
 from .models import Libro, Autor, Categoria, Etiqueta, PerfilUsuario
+from .widgets import SelectorRemoto
 
 # ============================================================================
 # FORMULARIOS DE AUTENTICACIÓN Y USUARIO
@@ -56,6 +58,10 @@ class BusquedaLibroForm(forms.Form):
         required=False, widget=forms.CheckboxInput(attrs={'class': 'form-check-input'}),
         label='Solo disponibles'
     )
+    orden = forms.ChoiceField(
+        choices=[('', 'Título'), ('populares', 'Más prestados')], required=False, label='Ordenar por',
+        widget=forms.Select(attrs={'class': 'form-select'})
+    )
 
 # ============================================================================
 # FORMULARIOS DE MODELOS (CRUD)
@@ -63,9 +69,10 @@ class BusquedaLibroForm(forms.Form):
 
 class LibroForm(forms.ModelForm):
     """Formulario para crear y editar Libros."""
+    # Los selectores solo cargan los elegidos; el resto se busca con AJAX.
     autores = forms.ModelMultipleChoiceField(
         queryset=Autor.objects.all(),
-        widget=forms.CheckboxSelectMultiple,
+        widget=SelectorRemoto(url=reverse_lazy('biblioteca:api_selector', args=['autores'])),
         required=True
     )
 
@@ -82,7 +89,7 @@ class LibroForm(forms.ModelForm):
             'isbn': forms.TextInput(attrs={'class': 'form-control'}),
             'cantidad_disponible': forms.NumberInput(attrs={'class': 'form-control'}),
             'categoria': forms.Select(attrs={'class': 'form-select'}),
-            'etiquetas': forms.CheckboxSelectMultiple,
+            'etiquetas': SelectorRemoto(url=reverse_lazy('biblioteca:api_selector', args=['etiquetas'])),
             'fecha_publicacion': forms.DateInput(attrs={'class': 'form-control', 'type': 'date'}),
             'editorial': forms.TextInput(attrs={'class': 'form-control'}),
             'numero_paginas': forms.NumberInput(attrs={'class': 'form-control'}),
@@ -0,0 +1,101 @@
+"""
+Historial de préstamos en dos niveles: tabla caliente y archivo.
+
+Prestamo guarda los préstamos activos y los devueltos recientes; los
+devueltos hace más de BIBLIOTECA_DIAS_ARCHIVO días se mueven a
+PrestamoArchivado por lotes, cada uno en una transacción corta, de modo que
+la tabla caliente (y sus índices) no crece sin límite.
+
+El historial del usuario se lee de ambas tablas por cursor sobre
+(-fecha_prestamo, -id) con PaginadorCursorCombinado.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+from .ajustes_sqlite import transaccion_escritura
+from .models import Aviso, Prestamo, PrestamoArchivado
+from .paginacion import PaginadorCursorCombinado
+
+DIAS_ARCHIVO = 180
+TAMANO_LOTE = 1000
+POR_PAGINA_HISTORIAL = 10
+
+CAMPOS_ARCHIVADOS = ('id', 'libro_id', 'usuario_id', 'fecha_prestamo', 'fecha_vencimiento', 'fecha_devolucion')
+
+
+# ============================================================================
+# ARCHIVADO
+# ============================================================================
+
+def dias_archivo():
+    """Días tras la devolución a partir de los que se archiva un préstamo (BIBLIOTECA_DIAS_ARCHIVO)."""
+    return getattr(settings, 'BIBLIOTECA_DIAS_ARCHIVO', DIAS_ARCHIVO)
+
+
+def archivables(antes_de):
+    """Préstamos devueltos antes de `antes_de`."""
+    return Prestamo.objects.filter(devuelto=True, fecha_devolucion__lt=antes_de)
+
+
+def archivar_lote(antes_de, desde_id=0, tamano=TAMANO_LOTE):
+    """
+    Mueve al archivo un lote de préstamos con id mayor que `desde_id`.
+
+    Devuelve (préstamos movidos, id del último leído o None si no quedan).
+    """
+    filas = list(
+        archivables(antes_de).filter(id__gt=desde_id).order_by('id').values_list(*CAMPOS_ARCHIVADOS)[:tamano]
+    )
+    if not filas:
+        return 0, None
+
+    ids = [fila[0] for fila in filas]
+    with transaccion_escritura():
+        PrestamoArchivado.objects.bulk_create(
+            [PrestamoArchivado(**dict(zip(CAMPOS_ARCHIVADOS, fila))) for fila in filas],
+            ignore_conflicts=True,
+        )
+        # Sin delete() del ORM: cargaría cada préstamo para emitir señales que aquí
+        # no cambian nada (ya estaban devueltos). Los avisos se conservan sin préstamo.
+        Aviso.objects.filter(prestamo_id__in=ids).update(prestamo=None)
+        marcadores = ', '.join(['%s'] * len(ids))
+        with connection.cursor() as cursor:
+            # Se repite la condición: un préstamo no se borra si alguien lo cambió entretanto.
+            cursor.execute(
+                f'DELETE FROM {Prestamo._meta.db_table} WHERE devuelto = %s AND id IN ({marcadores})',
+                [True, *ids],
+            )
+            movidos = cursor.rowcount
+    return movidos, ids[-1]
+
+
+def archivar(dias=None, tamano=TAMANO_LOTE, max_lotes=None, ahora=None):
+    """
+    Archiva por lotes los préstamos devueltos hace más de `dias` días (por defecto, dias_archivo()).
+
+    Genera (número de lote, préstamos movidos) tras cada lote. El cursor por id
+    avanza siempre, así que la memoria y cada transacción son de tamaño fijo.
+    """
+    antes_de = (ahora or timezone.now()) - timedelta(days=dias_archivo() if dias is None else dias)
+    ultimo_id = 0
+    lote = 0
+    while max_lotes is None or lote < max_lotes:
+        movidos, ultimo_id = archivar_lote(antes_de, ultimo_id, tamano)
+        if ultimo_id is None:
+            return
+        lote += 1
+        yield lote, movidos
+
+
+# ============================================================================
+# HISTORIAL DEL USUARIO
+# ============================================================================
+
+def pagina_historial(usuario, cursor=None, por_pagina=POR_PAGINA_HISTORIAL):
+    """Página de préstamos devueltos del usuario, recientes y archivados, del más nuevo al más antiguo."""
+    recientes = Prestamo.objects.filter(usuario=usuario, devuelto=True).select_related('libro')
+    archivados = PrestamoArchivado.objects.filter(usuario=usuario).select_related('libro')
+    return PaginadorCursorCombinado([recientes, archivados], por_pagina, campo='-fecha_prestamo').get_page(cursor)
@@ -0,0 +1,197 @@
+"""
+Importación masiva del catálogo desde CSV.
+
+Las filas se leen en streaming y se aplican por lotes: las categorías y los
+autores se resuelven con diccionarios en memoria, los libros se insertan o
+actualizan con un solo bulk_create por lote (clave: isbn) y la tabla
+intermedia de autores se rellena también en bloque.
+
+La normalización no toca la base de datos, así que varios archivos pueden
+analizarse en procesos aparte mientras uno solo escribe.
+"""
+import csv
+import os
+import re
+from itertools import islice
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+
+from .ajustes_sqlite import transaccion_escritura
+from .models import Autor, Categoria, Libro
+from . import autocompletado, busqueda, cache_catalogo, estadisticas
+
+TAMANO_LOTE = 1000
+
+# Nombres de categoría de las sucursales (en minúsculas) y su nombre en el catálogo
+MAPEO_CATEGORIAS = {}
+
+
+def mapeo_categorias():
+    """Traducciones de categorías de BIBLIOTECA_MAPEO_CATEGORIAS."""
+    return getattr(settings, 'BIBLIOTECA_MAPEO_CATEGORIAS', MAPEO_CATEGORIAS)
+
+
+# ============================================================================
+# NORMALIZACIÓN DE FILAS
+# ============================================================================
+
+def normalizar_isbn(codigo):
+    """Deja solo dígitos y la X final de un ISBN o código de inventario."""
+    isbn = re.sub(r'[^0-9Xx]', '', codigo or '').upper()
+    if not isbn:
+        raise ValueError('sin código')
+    if len(isbn) > 13:
+        raise ValueError(f'código demasiado largo: {codigo}')
+    return isbn
+
+
+def normalizar_categoria(nombre):
+    """Limpia espacios y traduce el nombre según mapeo_categorias()."""
+    nombre = ' '.join((nombre or '').split())
+    return mapeo_categorias().get(nombre.lower(), nombre)[:100] or None
+
+
+def normalizar_fila(fila):
+    """Convierte una fila del CSV en un diccionario listo para importar; lanza ValueError si no es válida."""
+    titulo = (fila.get('TÍTULO') or '').strip()
+    if not titulo:
+        raise ValueError('sin título')
+    autores = [' '.join(nombre.split()) for nombre in (fila.get('AUTOR') or '').split(';') if nombre.strip()]
+    if not autores:
+        raise ValueError(f'sin autor: {titulo}')
+    try:
+        cantidad = max(0, int(fila.get('STOCK') or 1))
+    except ValueError:
+        raise ValueError(f'stock no numérico: {titulo}')
+    return {
+        'titulo': titulo[:200],
+        'isbn': normalizar_isbn(fila.get('CÓDIGO')),
+        'categoria': normalizar_categoria(fila.get('TIPO')),
+        'autores': [nombre[:100] for nombre in autores],
+        'cantidad_disponible': cantidad,
+    }
+
+
+def leer_csv(ruta):
+    """Recorre el CSV fila a fila sin cargarlo entero en memoria."""
+    with open(ruta, 'r', encoding='utf-8-sig', newline='') as archivo:
+        yield from csv.DictReader(archivo)
+
+
+def procesar_archivo(ruta):
+    """
+    Lee y normaliza un CSV completo sin tocar la base de datos.
+
+    Pensada para ejecutarse en un proceso aparte: devuelve la ruta, las filas
+    normalizadas y los mensajes de las filas descartadas.
+    """
+    filas, errores = [], []
+    for numero, fila in enumerate(leer_csv(ruta), start=2):
+        try:
+            filas.append(normalizar_fila(fila))
+        except ValueError as e:
+            errores.append(f'{os.path.basename(ruta)}:{numero}: {e}')
+    return ruta, filas, errores
+
+
+def en_lotes(iterable, tamano):
+    """Agrupa un iterable en listas de como mucho `tamano` elementos."""
+    iterador = iter(iterable)
+    while lote := list(islice(iterador, tamano)):
+        yield lote
+
+
+# ============================================================================
+# ESCRITURA POR LOTES
+# ============================================================================
+
+class Importador:
+    """Aplica lotes de filas normalizadas, recordando los IDs ya resueltos."""
+
+    def __init__(self):
+        self.categorias = {}
+        self.autores = {}
+        self.creados = 0
+        self.actualizados = 0
+
+    def _resolver_categorias(self, nombres):
+        faltantes = set(nombres) - self.categorias.keys()
+        if not faltantes:
+            return
+        self.categorias.update(Categoria.objects.filter(nombre__in=faltantes).values_list('nombre', 'id'))
+        nuevas = faltantes - self.categorias.keys()
+        if nuevas:
+            Categoria.objects.bulk_create([Categoria(nombre=nombre) for nombre in nuevas], ignore_conflicts=True)
+            self.categorias.update(Categoria.objects.filter(nombre__in=nuevas).values_list('nombre', 'id'))
+            estadisticas.incrementar('categorias', len(nuevas))
+
+    def _resolver_autores(self, nombres):
+        faltantes = set(nombres) - self.autores.keys()
+        if not faltantes:
+            return
+        # Autor.nombre no es único: si hay repetidos se usa el de menor id.
+        for nombre, pk in Autor.objects.filter(nombre__in=faltantes).order_by('-id').values_list('nombre', 'id'):
+            self.autores[nombre] = pk
+        nuevos = faltantes - self.autores.keys()
+        if nuevos:
+            for autor in Autor.objects.bulk_create([Autor(nombre=nombre) for nombre in nuevos]):
+                self.autores[autor.nombre] = autor.pk
+            estadisticas.incrementar('autores', len(nuevos))
+
+    def aplicar_lote(self, filas):
+        """Inserta o actualiza un lote de filas normalizadas en una sola transacción."""
+        # Un ISBN repetido dentro del lote se queda con su última aparición.
+        filas = list({fila['isbn']: fila for fila in filas}.values())
+        isbns = [fila['isbn'] for fila in filas]
+
+        with transaccion_escritura():
+            self._resolver_categorias(fila['categoria'] for fila in filas if fila['categoria'])
+            self._resolver_autores(nombre for fila in filas for nombre in fila['autores'])
+
+            existentes = set(Libro.objects.filter(isbn__in=isbns).values_list('isbn', flat=True))
+            agotados_antes = Libro.objects.filter(isbn__in=existentes, cantidad_disponible=0).count()
+            Libro.objects.bulk_create(
+                [
+                    Libro(
+                        titulo=fila['titulo'],
+                        isbn=fila['isbn'],
+                        categoria_id=self.categorias.get(fila['categoria']),
+                        cantidad_disponible=fila['cantidad_disponible'],
+                    )
+                    for fila in filas
+                ],
+                update_conflicts=True,
+                unique_fields=['isbn'],
+                update_fields=['titulo', 'categoria', 'cantidad_disponible', 'fecha_actualizacion'],
+            )
+            # El upsert no conoce los préstamos activos de los libros existentes.
+            Libro.objects.filter(isbn__in=isbns).update(
+                total_ejemplares=F('cantidad_disponible') + F('prestamos_activos')
+            )
+            ids = dict(Libro.objects.filter(isbn__in=isbns).values_list('isbn', 'id'))
+
+            # Los autores del CSV reemplazan a los anteriores de cada libro.
+            Intermedia = Libro.autores.through
+            Intermedia.objects.filter(libro_id__in=ids.values()).delete()
+            Intermedia.objects.bulk_create(
+                [
+                    Intermedia(libro_id=ids[fila['isbn']], autor_id=self.autores[nombre])
+                    for fila in filas
+                    for nombre in dict.fromkeys(fila['autores'])
+                ],
+                ignore_conflicts=True,
+            )
+
+            # bulk_create no emite señales: el índice, los contadores y la caché se actualizan aquí.
+            busqueda.actualizar_libros(ids.values())
+            cache_catalogo.invalidar_catalogo()
+            transaction.on_commit(autocompletado.invalidar)
+            estadisticas.incrementar('libros', len(filas) - len(existentes))
+            estadisticas.incrementar(
+                'libros_agotados', sum(1 for fila in filas if fila['cantidad_disponible'] == 0) - agotados_antes
+            )
+
+        self.creados += len(filas) - len(existentes)
+        self.actualizados += len(existentes)
@@ -0,0 +1,43 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from biblioteca import historial
+
+
+class Command(BaseCommand):
+    help = 'Mueve al archivo, por lotes, los préstamos devueltos hace tiempo'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dias', type=int, default=historial.dias_archivo(),
+            help=f'Antigüedad mínima de la devolución en días (por defecto: {historial.dias_archivo()})'
+        )
+        parser.add_argument(
+            '--lote', type=int, default=historial.TAMANO_LOTE,
+            help=f'Préstamos por lote y transacción (por defecto: {historial.TAMANO_LOTE})'
+        )
+        parser.add_argument(
+            '--max-lotes', type=int, dest='max_lotes',
+            help='Detenerse tras este número de lotes; el resto queda para la siguiente ejecución'
+        )
+        parser.add_argument('--dry-run', action='store_true', help='Solo muestra cuántos préstamos se archivarían')
+
+    def handle(self, *args, **options):
+        if options['lote'] < 1 or options['dias'] < 0:
+            raise CommandError('--lote debe ser mayor que cero y --dias no puede ser negativo.')
+
+        if options['dry_run']:
+            antes_de = timezone.now() - timedelta(days=options['dias'])
+            self.stdout.write(f'Se archivarían {historial.archivables(antes_de).count()} préstamos.')
+            return
+
+        lotes = movidos = 0
+        for lotes, cantidad in historial.archivar(options['dias'], options['lote'], options['max_lotes']):
+            movidos += cantidad
+            if options['verbosity'] >= 2:
+                self.stdout.write(f'  Lote {lotes}: {cantidad} préstamos')
+
+        self.stdout.write(self.style.SUCCESS('✓ Archivado completado'))
+        self.stdout.write(f'  Lotes: {lotes}')
+        self.stdout.write(f'  Préstamos archivados: {movidos}')
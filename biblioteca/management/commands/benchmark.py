@@ -0,0 +1,152 @@
+import json
+import platform
+import random
+
+import django
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+from django.utils import timezone
+from biblioteca import autocompletado
+from biblioteca.models import Libro
+from biblioteca.paginacion import codificar_cursor
+from biblioteca.rendimiento import PALABRAS, medir, sembrar_biblioteca
+
+
+class Command(BaseCommand):
+    help = 'Mide latencia, consultas y rendimiento de las vistas principales sobre una biblioteca sintética'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--libros', type=int, default=10000, help='Libros a generar (por defecto: 10000)')
+        parser.add_argument('--usuarios', type=int, default=200, help='Usuarios a generar (por defecto: 200)')
+        parser.add_argument(
+            '--prestamos-por-libro', type=int, default=2, dest='prestamos_por_libro',
+            help='Préstamos históricos por libro (por defecto: 2)'
+        )
+        parser.add_argument('--repeticiones', type=int, default=50, help='Peticiones por escenario (por defecto: 50)')
+        parser.add_argument('--escenarios', nargs='+', help='Ejecutar solo estos escenarios')
+        parser.add_argument('--keepdb', action='store_true', help='Reutilizar la base de pruebas ya sembrada')
+        parser.add_argument('--etiqueta', type=str, default='', help='Nombre de la ejecución (p. ej. el commit)')
+        parser.add_argument('--json', type=str, help='Guardar los resultados en este archivo JSON ("-" para stdout)')
+
+    def handle(self, *args, **options):
+        # Todo se ejecuta sobre una base de pruebas aparte, nunca sobre la real.
+        nombre_original = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=options['keepdb'])
+        try:
+            if not Libro.objects.exists():
+                self.stdout.write(f'Sembrando biblioteca sintética de {options["libros"]} libros...')
+                sembrar_biblioteca(
+                    libros=options['libros'],
+                    usuarios=options['usuarios'],
+                    prestamos_por_libro=options['prestamos_por_libro'],
+                    salida=self.stdout.write,
+                )
+            with override_settings(ALLOWED_HOSTS=['testserver']):
+                resultados = self._ejecutar(options)
+        finally:
+            connection.creation.destroy_test_db(nombre_original, verbosity=0, keepdb=options['keepdb'])
+
+        informe = {
+            'etiqueta': options['etiqueta'],
+            'fecha': timezone.now().isoformat(),
+            'django': django.get_version(),
+            'python': platform.python_version(),
+            'motor': connection.vendor,
+            'libros': options['libros'],
+            'repeticiones': options['repeticiones'],
+            'escenarios': resultados,
+        }
+        self._imprimir(resultados)
+        if options['json']:
+            texto = json.dumps(informe, indent=2, ensure_ascii=False)
+            if options['json'] == '-':
+                self.stdout.write(texto)
+            else:
+                with open(options['json'], 'w', encoding='utf-8') as archivo:
+                    archivo.write(texto)
+                self.stdout.write(self.style.SUCCESS(f'✓ Resultados guardados en {options["json"]}'))
+
+    def _escenarios(self):
+        """Devuelve {nombre: función(i) -> respuesta} para cada escenario medido."""
+        rng = random.Random(7)
+        ids = list(Libro.objects.order_by('?').values_list('id', flat=True)[:1000])
+        total = Libro.objects.count()
+        profundo = Libro.objects.order_by('titulo', 'id').values_list('titulo', 'id')[int(total * 0.9)]
+        cursor_profundo = codificar_cursor(profundo[0], profundo[1], 's', total * 9 // 120)
+
+        autor_id = Libro.autores.through.objects.values_list('autor_id', flat=True).first()
+
+        anonimo = Client()
+        lector = User.objects.filter(prestamos__devuelto=False).first() or User.objects.create_user('lector-bench')
+        cliente_lector = Client()
+        cliente_lector.force_login(lector)
+        admin, _ = User.objects.get_or_create(username='admin-bench', defaults={'is_staff': True, 'is_superuser': True})
+        cliente_admin = Client()
+        cliente_admin.force_login(admin)
+        solicitantes = list(User.objects.filter(username__startswith='lector')[:50])
+        clientes_solicitud = []
+        for usuario in solicitantes:
+            cliente = Client()
+            cliente.force_login(usuario)
+            clientes_solicitud.append(cliente)
+
+        def prefijo():
+            palabra = rng.choice(PALABRAS)
+            return palabra[:rng.randint(2, len(palabra))]
+
+        return {
+            'index': lambda i: anonimo.get(reverse('biblioteca:index')),
+            'lista_libros': lambda i: anonimo.get(reverse('biblioteca:lista_libros')),
+            'lista_libros_busqueda': lambda i: anonimo.get(
+                reverse('biblioteca:lista_libros'), {'q': rng.choice(PALABRAS)}
+            ),
+            'lista_libros_pagina_profunda': lambda i: anonimo.get(
+                reverse('biblioteca:lista_libros'), {'cursor': cursor_profundo}
+            ),
+            'detalle_libro': lambda i: anonimo.get(reverse('biblioteca:detalle_libro', args=[rng.choice(ids)])),
+            'mis_prestamos': lambda i: cliente_lector.get(reverse('biblioteca:mis_prestamos')),
+            'perfil_usuario': lambda i: cliente_lector.get(reverse('biblioteca:perfil_usuario')),
+            'detalle_libro_autenticado': lambda i: cliente_lector.get(
+                reverse('biblioteca:detalle_libro', args=[rng.choice(ids)])
+            ),
+            'solicitar_prestamo': lambda i: clientes_solicitud[i % len(clientes_solicitud)].get(
+                reverse('biblioteca:solicitar_prestamo', args=[rng.choice(ids)])
+            ),
+            'admin_libros': lambda i: cliente_admin.get(reverse('admin:biblioteca_libro_changelist')),
+            'admin_libros_busqueda': lambda i: cliente_admin.get(
+                reverse('admin:biblioteca_libro_changelist'), {'q': rng.choice(PALABRAS)}
+            ),
+            'admin_libros_autor': lambda i: cliente_admin.get(
+                reverse('admin:biblioteca_libro_changelist'), {'autor': autor_id}
+            ),
+            'admin_prestamos': lambda i: cliente_admin.get(reverse('admin:biblioteca_prestamo_changelist')),
+            'sugerencias': lambda i: anonimo.get(reverse('biblioteca:api_sugerencias'), {'q': prefijo()}),
+            # Solo la búsqueda en el índice en memoria, sin la pila HTTP
+            'sugerencias_indice': lambda i: autocompletado.sugerir(prefijo()),
+        }
+
+    def _ejecutar(self, options):
+        escenarios = self._escenarios()
+        seleccion = options['escenarios'] or list(escenarios)
+        resultados = {}
+        for nombre in seleccion:
+            if nombre not in escenarios:
+                self.stdout.write(self.style.WARNING(f'Escenario desconocido: {nombre}'))
+                continue
+            # Una petición de calentamiento para no medir la carga de plantillas.
+            escenarios[nombre](0)
+            resultados[nombre] = medir(escenarios[nombre], options['repeticiones'])
+        return resultados
+
+    def _imprimir(self, resultados):
+        self.stdout.write(self.style.SUCCESS('✓ Benchmark completado'))
+        self.stdout.write(f'  {"Escenario":<30} {"p50 ms":>9} {"p95 ms":>9} {"consultas":>10} {"pet/s":>8}')
+        for nombre, datos in resultados.items():
+            self.stdout.write(
+                f'  {nombre:<30} {datos["p50_ms"]:>9} {datos["p95_ms"]:>9} '
+                f'{datos["consultas_por_peticion"]:>10} {datos["peticiones_por_segundo"]:>8}'
+            )
@@ -0,0 +1,181 @@
+import json
+import random
+import threading
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, close_old_connections, connection, connections
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+from biblioteca.models import Libro
+from biblioteca.prestamos import PrestamoError, devolver_prestamo, solicitar_prestamo
+from biblioteca.rendimiento import perfil_bd, resumir, sembrar_biblioteca
+
+
+def _perfiles(vendor):
+    """
+    Configuraciones a comparar según el motor: la anterior y las de producción.
+
+    Cada perfil cambia la conexión ('conexion') y, si hace falta, ajustes de
+    settings ('ajustes').
+    """
+    if vendor == 'sqlite':
+        return {
+            # Como estaba settings.py al principio: diario de rollback, 5 s de espera y BEGIN
+            'sqlite_original': {
+                'conexion': {'OPTIONS': {}},
+                'ajustes': {'BIBLIOTECA_SQLITE_PRAGMAS': {}, 'BIBLIOTECA_SQLITE_IMMEDIATE': False},
+            },
+            # Solo WAL y synchronous=NORMAL
+            'sqlite_wal': {
+                'conexion': {'OPTIONS': {'timeout': 20}},
+                'ajustes': {
+                    'BIBLIOTECA_SQLITE_PRAGMAS': {'journal_mode': 'WAL', 'synchronous': 'NORMAL'},
+                    'BIBLIOTECA_SQLITE_IMMEDIATE': False,
+                },
+            },
+            # ajustes_sqlite completo: PRAGMA de settings y BEGIN IMMEDIATE
+            'sqlite_ajustado': {'conexion': {'OPTIONS': {'timeout': 20}}, 'ajustes': {}},
+        }
+    perfiles = {
+        'sin_persistencia': {'conexion': {'CONN_MAX_AGE': 0, 'CONN_HEALTH_CHECKS': False, 'OPTIONS': {}}},
+        'persistente': {'conexion': {'CONN_MAX_AGE': 600, 'CONN_HEALTH_CHECKS': True, 'OPTIONS': {}}},
+    }
+    try:
+        import psycopg_pool  # noqa: F401
+    except ImportError:
+        pass
+    else:
+        perfiles['pool'] = {'conexion': {
+            'CONN_MAX_AGE': 0, 'CONN_HEALTH_CHECKS': False, 'OPTIONS': {'pool': {'max_size': 20}},
+        }}
+    return perfiles
+
+
+# El modo del diario se guarda en el archivo: se fija una vez, antes de abrir los hilos.
+DIARIOS_SQLITE = {'sqlite_original': 'DELETE', 'sqlite_wal': 'WAL', 'sqlite_ajustado': 'WAL'}
+
+
+class Command(BaseCommand):
+    help = 'Compara configuraciones de la base de datos con lecturas y préstamos concurrentes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--libros', type=int, default=2000, help='Libros a generar (por defecto: 2000)')
+        parser.add_argument('--operaciones', type=int, default=400, help='Operaciones por perfil (por defecto: 400)')
+        parser.add_argument('--concurrencia', type=int, default=8, help='Hilos simultáneos (por defecto: 8)')
+        parser.add_argument(
+            '--escrituras', type=float, default=0.2,
+            help='Proporción de operaciones que prestan y devuelven un libro (por defecto: 0.2)'
+        )
+        parser.add_argument('--perfiles', nargs='+', help='Medir solo estos perfiles')
+        parser.add_argument('--keepdb', action='store_true', help='Reutilizar la base de pruebas ya sembrada')
+        parser.add_argument('--json', type=str, help='Guardar los resultados en este archivo JSON ("-" para stdout)')
+
+    def handle(self, *args, **options):
+        nombre_original = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=options['keepdb'])
+        try:
+            if not Libro.objects.exists():
+                self.stdout.write(f'Sembrando biblioteca sintética de {options["libros"]} libros...')
+                sembrar_biblioteca(libros=options['libros'], usuarios=50, salida=self.stdout.write)
+            self.libros = list(Libro.objects.values_list('id', flat=True))
+            self.lectores = list(User.objects.filter(username__startswith='lector'))
+            perfiles = _perfiles(connection.vendor)
+            if options['perfiles']:
+                perfiles = {nombre: perfiles[nombre] for nombre in options['perfiles']}
+            resultados = {}
+            # Sin caché: cada lectura llega a la base de datos
+            with override_settings(
+                ALLOWED_HOSTS=['testserver'],
+                CACHES={'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}},
+            ):
+                for nombre, perfil in perfiles.items():
+                    with override_settings(**perfil.get('ajustes', {})), perfil_bd(**perfil['conexion']):
+                        if nombre in DIARIOS_SQLITE:
+                            with connection.cursor() as cursor:
+                                cursor.execute(f'PRAGMA journal_mode={DIARIOS_SQLITE[nombre]}')
+                            connection.close()
+                        resultados[nombre] = self._medir(options)
+        finally:
+            connections.close_all()
+            connection.creation.destroy_test_db(nombre_original, verbosity=0, keepdb=options['keepdb'])
+
+        self._imprimir(resultados)
+        if options['json']:
+            texto = json.dumps({'motor': connection.vendor, 'perfiles': resultados, **{
+                clave: options[clave] for clave in ('libros', 'operaciones', 'concurrencia', 'escrituras')
+            }}, indent=2, ensure_ascii=False)
+            if options['json'] == '-':
+                self.stdout.write(texto)
+            else:
+                with open(options['json'], 'w', encoding='utf-8') as archivo:
+                    archivo.write(texto)
+                self.stdout.write(self.style.SUCCESS(f'✓ Resultados guardados en {options["json"]}'))
+
+    def _medir(self, options):
+        """Cada hilo imita un proceso de servidor: lee fichas y, a veces, presta y devuelve."""
+        pendientes = list(range(options['operaciones']))
+        cerrojo = threading.Lock()
+        lecturas, escrituras, bloqueos = [], [], []
+
+        def trabajador(numero):
+            rng = random.Random(numero)
+            cliente = Client()
+            lector = self.lectores[numero % len(self.lectores)]
+            try:
+                while True:
+                    with cerrojo:
+                        if not pendientes:
+                            return
+                        pendientes.pop()
+                    libro_id = rng.choice(self.libros)
+                    escritura = rng.random() < options['escrituras']
+                    inicio = time.perf_counter()
+                    try:
+                        if escritura:
+                            try:
+                                devolver_prestamo(solicitar_prestamo(libro_id, lector))
+                            except PrestamoError:
+                                pass
+                            finally:
+                                # Como al terminar una petición: cierra si CONN_MAX_AGE lo pide
+                                close_old_connections()
+                        else:
+                            respuesta = cliente.get(reverse('biblioteca:detalle_libro', args=[libro_id]))
+                            if respuesta.status_code >= 400:
+                                raise AssertionError(f'Respuesta {respuesta.status_code} en la ficha {libro_id}')
+                    except OperationalError:
+                        # "database is locked": el error que vería el usuario
+                        bloqueos.append(libro_id)
+                        continue
+                    (escrituras if escritura else lecturas).append(time.perf_counter() - inicio)
+            finally:
+                connections.close_all()
+
+        hilos = [threading.Thread(target=trabajador, args=(i,)) for i in range(options['concurrencia'])]
+        inicio_total = time.perf_counter()
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        duracion = time.perf_counter() - inicio_total
+
+        resumen = resumir(lecturas + escrituras, [], duracion)
+        resumen.pop('consultas_por_peticion')
+        resumen['p95_lectura_ms'] = resumir(lecturas, [], duracion)['p95_ms']
+        resumen['p95_escritura_ms'] = resumir(escrituras, [], duracion)['p95_ms']
+        resumen['errores_bloqueo'] = len(bloqueos)
+        return resumen
+
+    def _imprimir(self, resultados):
+        self.stdout.write(self.style.SUCCESS('✓ Benchmark de base de datos completado'))
+        self.stdout.write(
+            f'  {"Perfil":<18} {"op/s":>8} {"p50 ms":>8} {"p95 lect.":>10} {"p95 escr.":>10} {"bloqueos":>9}'
+        )
+        for nombre, r in resultados.items():
+            self.stdout.write(
+                f'  {nombre:<18} {r["peticiones_por_segundo"]:>8} {r["p50_ms"]:>8} '
+                f'{r["p95_lectura_ms"]:>10} {r["p95_escritura_ms"]:>10} {r["errores_bloqueo"]:>9}'
+            )
@@ -0,0 +1,112 @@
+import json
+import random
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+from django.utils import timezone
+from biblioteca import recomendaciones, vencimientos
+from biblioteca.models import Libro, Prestamo
+from biblioteca.rendimiento import medir, sembrar_biblioteca
+
+
+class Command(BaseCommand):
+    help = 'Mide la construcción completa e incremental de las recomendaciones y su lectura en el detalle'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--libros', type=int, default=5000, help='Libros a generar (por defecto: 5000)')
+        parser.add_argument('--usuarios', type=int, default=500, help='Usuarios a generar (por defecto: 500)')
+        parser.add_argument(
+            '--prestamos-por-libro', type=int, default=3, dest='prestamos_por_libro',
+            help='Préstamos históricos por libro (por defecto: 3)'
+        )
+        parser.add_argument(
+            '--nuevos', type=int, default=100,
+            help='Préstamos nuevos antes de la reconstrucción incremental (por defecto: 100)'
+        )
+        parser.add_argument('--repeticiones', type=int, default=100, help='Peticiones al detalle (por defecto: 100)')
+        parser.add_argument('--keepdb', action='store_true', help='Reutilizar la base de pruebas ya sembrada')
+        parser.add_argument('--json', type=str, help='Guardar los resultados en este archivo JSON ("-" para stdout)')
+
+    def handle(self, *args, **options):
+        nombre_original = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=options['keepdb'])
+        try:
+            if not Libro.objects.exists():
+                self.stdout.write(f'Sembrando biblioteca sintética de {options["libros"]} libros...')
+                sembrar_biblioteca(
+                    libros=options['libros'],
+                    usuarios=options['usuarios'],
+                    prestamos_por_libro=options['prestamos_por_libro'],
+                    salida=self.stdout.write,
+                )
+            resultados, detalle = self._medir(options)
+        finally:
+            connection.creation.destroy_test_db(nombre_original, verbosity=0, keepdb=options['keepdb'])
+
+        self._imprimir(resultados, detalle)
+        if options['json']:
+            texto = json.dumps({'motor': connection.vendor, 'fases': resultados, 'detalle': detalle, **{
+                clave: options[clave] for clave in ('libros', 'usuarios', 'prestamos_por_libro', 'nuevos')
+            }}, indent=2, ensure_ascii=False)
+            if options['json'] == '-':
+                self.stdout.write(texto)
+            else:
+                with open(options['json'], 'w', encoding='utf-8') as archivo:
+                    archivo.write(texto)
+                self.stdout.write(self.style.SUCCESS(f'✓ Resultados guardados en {options["json"]}'))
+
+    def _reconstruir(self, **kwargs):
+        inicio = time.perf_counter()
+        libros = filas = 0
+        for _, cantidad, creadas in recomendaciones.reconstruir(**kwargs):
+            libros += cantidad
+            filas += creadas
+        return {'segundos': round(time.perf_counter() - inicio, 3), 'libros': libros, 'filas': filas}
+
+    def _medir(self, options):
+        resultados = {}
+        inicio = time.perf_counter()
+        recomendaciones.Similitudes.cargar()
+        resultados['carga_indices'] = {'segundos': round(time.perf_counter() - inicio, 3), 'libros': 0, 'filas': 0}
+        resultados['completa'] = self._reconstruir(completo=True)
+
+        # Préstamos nuevos de unos pocos lectores: solo sus libros quedan pendientes
+        rng = random.Random(3)
+        ids = list(Libro.objects.values_list('id', flat=True))
+        lectores = list(User.objects.filter(username__startswith='lector')[:10])
+        ahora = timezone.now()
+        Prestamo.objects.bulk_create([
+            Prestamo(
+                libro_id=rng.choice(ids), usuario=rng.choice(lectores), devuelto=True, fecha_devolucion=ahora,
+                fecha_vencimiento=vencimientos.calcular_vencimiento(ahora),
+            )
+            for _ in range(options['nuevos'])
+        ], ignore_conflicts=True)
+        resultados['incremental'] = self._reconstruir()
+        resultados['sin_cambios'] = self._reconstruir()
+
+        cliente = Client()
+        with override_settings(
+            ALLOWED_HOSTS=['testserver'],
+            CACHES={'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}},
+        ):
+            detalle = medir(
+                lambda i: cliente.get(reverse('biblioteca:detalle_libro', args=[rng.choice(ids)])),
+                options['repeticiones'],
+            )
+        return resultados, detalle
+
+    def _imprimir(self, resultados, detalle):
+        self.stdout.write(self.style.SUCCESS('✓ Benchmark de recomendaciones completado'))
+        self.stdout.write(f'  {"Fase":<20} {"segundos":>9} {"libros":>8} {"filas":>8}')
+        for nombre, datos in resultados.items():
+            self.stdout.write(f'  {nombre:<20} {datos["segundos"]:>9} {datos["libros"]:>8} {datos["filas"]:>8}')
+        self.stdout.write(
+            f'  Detalle de libro: p50 {detalle["p50_ms"]} ms, '
+            f'{detalle["consultas_por_peticion"]} consultas por petición'
+        )
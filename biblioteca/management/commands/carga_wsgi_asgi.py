@@ -0,0 +1,158 @@
+import asyncio
+import json
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, connections
+from django.test import AsyncClient, Client
+from django.test.utils import override_settings
+from django.urls import reverse
+from biblioteca.models import Libro
+from biblioteca.rendimiento import resumir, sembrar_biblioteca
+
+ENDPOINTS = ('index', 'lista_libros', 'detalle_libro', 'mis_prestamos')
+
+
+def _sin_consultas(resumen):
+    # Las consultas no se cuentan aquí: las conexiones son de otros hilos.
+    resumen.pop('consultas_por_peticion')
+    return resumen
+
+
+class Command(BaseCommand):
+    help = 'Compara el rendimiento con carga concurrente de las vistas del catálogo bajo WSGI y ASGI'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--libros', type=int, default=2000, help='Libros a generar (por defecto: 2000)')
+        parser.add_argument('--peticiones', type=int, default=200, help='Peticiones por endpoint (por defecto: 200)')
+        parser.add_argument(
+            '--concurrencia', type=int, default=16,
+            help='Peticiones simultáneas: hilos en WSGI, corrutinas en ASGI (por defecto: 16)'
+        )
+        parser.add_argument('--con-cache', action='store_true', dest='con_cache',
+                            help='No desactivar la caché de páginas para anónimos')
+        parser.add_argument('--keepdb', action='store_true', help='Reutilizar la base de pruebas ya sembrada')
+        parser.add_argument('--json', type=str, help='Guardar los resultados en este archivo JSON ("-" para stdout)')
+
+    def handle(self, *args, **options):
+        nombre_original = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=options['keepdb'])
+        try:
+            if not Libro.objects.exists():
+                self.stdout.write(f'Sembrando biblioteca sintética de {options["libros"]} libros...')
+                sembrar_biblioteca(libros=options['libros'], usuarios=50, salida=self.stdout.write)
+            ajustes = {'ALLOWED_HOSTS': ['testserver']}
+            if not options['con_cache']:
+                # Sin caché se mide el trabajo real de las vistas, no la caché.
+                ajustes['CACHES'] = {'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+            with override_settings(**ajustes):
+                urls = self._urls()
+                with override_settings(ROOT_URLCONF='biblioteca_config.urls_sync'):
+                    wsgi = {nombre: self._medir_wsgi(url, options) for nombre, url in urls.items()}
+                with override_settings(ROOT_URLCONF='biblioteca_config.urls_async'):
+                    asgi = {nombre: asyncio.run(self._medir_asgi(url, options)) for nombre, url in urls.items()}
+        finally:
+            connections.close_all()
+            connection.creation.destroy_test_db(nombre_original, verbosity=0, keepdb=options['keepdb'])
+
+        self._imprimir(wsgi, asgi)
+        if options['json']:
+            texto = json.dumps({'wsgi': wsgi, 'asgi': asgi, **{
+                clave: options[clave] for clave in ('libros', 'peticiones', 'concurrencia')
+            }}, indent=2, ensure_ascii=False)
+            if options['json'] == '-':
+                self.stdout.write(texto)
+            else:
+                with open(options['json'], 'w', encoding='utf-8') as archivo:
+                    archivo.write(texto)
+                self.stdout.write(self.style.SUCCESS(f'✓ Resultados guardados en {options["json"]}'))
+
+    def _urls(self):
+        libro_id = Libro.objects.order_by('?').values_list('id', flat=True).first()
+        self.lector = User.objects.filter(prestamos__devuelto=False).first() or User.objects.first()
+        return {
+            'index': reverse('biblioteca:index'),
+            'lista_libros': reverse('biblioteca:lista_libros'),
+            'detalle_libro': reverse('biblioteca:detalle_libro', args=[libro_id]),
+            'mis_prestamos': reverse('biblioteca:mis_prestamos'),
+        }
+
+    def _medir_wsgi(self, url, options):
+        """Un hilo por petición simultánea, como un servidor WSGI con hilos."""
+        pendientes = list(range(options['peticiones']))
+        cerrojo = threading.Lock()
+        latencias, errores = [], []
+
+        def trabajador():
+            cliente = Client()
+            try:
+                cliente.force_login(self.lector)
+                while True:
+                    with cerrojo:
+                        if not pendientes or errores:
+                            return
+                        pendientes.pop()
+                    inicio = time.perf_counter()
+                    respuesta = cliente.get(url)
+                    if respuesta.status_code >= 400:
+                        errores.append(respuesta.status_code)
+                        return
+                    latencias.append(time.perf_counter() - inicio)
+            finally:
+                # Cada hilo cierra sus conexiones: si no, quedan abiertas tras destruir la base de pruebas
+                connections.close_all()
+
+        hilos = [threading.Thread(target=trabajador) for _ in range(options['concurrencia'])]
+        inicio_total = time.perf_counter()
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        if errores:
+            raise AssertionError(f'Respuesta {errores[0]} en {url}')
+        return _sin_consultas(resumir(latencias, [], time.perf_counter() - inicio_total))
+
+    async def _medir_asgi(self, url, options):
+        """Corrutinas concurrentes sobre el manejador ASGI en un solo bucle de eventos."""
+        clientes = []
+        for _ in range(options['concurrencia']):
+            cliente = AsyncClient()
+            await cliente.aforce_login(self.lector)
+            clientes.append(cliente)
+        cola = asyncio.Queue()
+        for i in range(options['peticiones']):
+            cola.put_nowait(i)
+        latencias = []
+
+        async def trabajador(cliente):
+            while not cola.empty():
+                cola.get_nowait()
+                inicio = time.perf_counter()
+                respuesta = await cliente.get(url)
+                if respuesta.status_code >= 400:
+                    raise AssertionError(f'Respuesta {respuesta.status_code} en {url}')
+                latencias.append(time.perf_counter() - inicio)
+
+        inicio_total = time.perf_counter()
+        try:
+            await asyncio.gather(*(trabajador(cliente) for cliente in clientes))
+        finally:
+            # El ORM asíncrono usa el hilo de sync_to_async: se cierran sus conexiones
+            await sync_to_async(connections.close_all)()
+        return _sin_consultas(resumir(latencias, [], time.perf_counter() - inicio_total))
+
+    def _imprimir(self, wsgi, asgi):
+        self.stdout.write(self.style.SUCCESS('✓ Prueba de carga completada'))
+        self.stdout.write(
+            f'  {"Endpoint":<16} {"WSGI pet/s":>11} {"ASGI pet/s":>11} {"WSGI p95":>10} {"ASGI p95":>10}'
+        )
+        for nombre in ENDPOINTS:
+            self.stdout.write(
+                f'  {nombre:<16} {wsgi[nombre]["peticiones_por_segundo"]:>11} '
+                f'{asgi[nombre]["peticiones_por_segundo"]:>11} '
+                f'{wsgi[nombre]["p95_ms"]:>10} {asgi[nombre]["p95_ms"]:>10}'
+            )
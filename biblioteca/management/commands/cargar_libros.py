@@ -1,12 +1,18 @@
-import csv
+import glob
 import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import django
 from django.core.management.base import BaseCommand
 from django.conf import settings
-from biblioteca.models import Autor, Categoria, Libro
+from biblioteca.importacion import (
+    TAMANO_LOTE, Importador, en_lotes, leer_csv, normalizar_fila, procesar_archivo,
+)
 
 
 class Command(BaseCommand):
-    help = 'Carga libros desde el archivo CSV de la Biblioteca IBG'
+    help = 'Carga libros desde uno o varios archivos CSV de la Biblioteca IBG'
 
     def add_arguments(self, parser):
         parser.add_argument(
@@ -14,101 +20,112 @@ class Command(BaseCommand):
             nargs='?',
             type=str,
             default='Biblioteca IBG - Biblioteca.csv',
-            help='Ruta del archivo CSV a cargar (por defecto: Biblioteca IBG - Biblioteca.csv)'
+            help='Archivo CSV, directorio o patrón glob a cargar (por defecto: Biblioteca IBG - Biblioteca.csv)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=TAMANO_LOTE,
+            help=f'Filas por lote y por transacción (por defecto: {TAMANO_LOTE})'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count() or 1,
+            help='Procesos que leen y normalizan archivos en paralelo (por defecto: núcleos disponibles)'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Valida los archivos sin escribir en la base de datos'
         )
 
-    def handle(self, *args, **options):
-        csv_file = options['csv_file']
-        
-        # Construir la ruta del archivo
+    def _resolver_archivos(self, csv_file):
+        """Convierte el argumento en la lista de archivos CSV a cargar."""
         if not os.path.isabs(csv_file):
             csv_file = os.path.join(settings.BASE_DIR, csv_file)
+        if os.path.isdir(csv_file):
+            return sorted(glob.glob(os.path.join(csv_file, '*.csv')))
+        if glob.has_magic(csv_file):
+            return sorted(glob.glob(csv_file))
+        return [csv_file] if os.path.exists(csv_file) else []
 
-        # Verificar que el archivo existe
-        if not os.path.exists(csv_file):
+    def handle(self, *args, **options):
+        archivos = self._resolver_archivos(options['csv_file'])
+
+        # Verificar que hay algo que cargar
+        if not archivos:
             self.stdout.write(
-                self.style.ERROR(f'El archivo "{csv_file}" no existe.')
+                self.style.ERROR(f'No se encontraron archivos CSV en "{options["csv_file"]}".')
             )
             return
 
-        try:
-            with open(csv_file, 'r', encoding='utf-8') as file:
-                reader = csv.DictReader(file)
-                
-                libros_creados = 0
-                libros_actualizados = 0
-                errores = 0
-
-                for row in reader:
-                    try:
-                        # Obtener o crear categoría
-                        categoria_nombre = row.get('TIPO', '').strip()
-                        if categoria_nombre:
-                            categoria, _ = Categoria.objects.get_or_create(
-                                nombre=categoria_nombre
-                            )
-                        else:
-                            categoria = None
-
-                        # Obtener o crear autor
-                        autor_nombre = row.get('AUTOR', '').strip()
-                        if not autor_nombre:
-                            self.stdout.write(
-                                self.style.WARNING(f'Skipping libro sin autor: {row.get("TÍTULO")}')
-                            )
-                            errores += 1
-                            continue
-
-                        autor, _ = Autor.objects.get_or_create(
-                            nombre=autor_nombre
-                        )
-
-                        # Obtener datos del libro
-                        titulo = row.get('TÍTULO', '').strip()
-                        codigo = row.get('CÓDIGO', '').strip()
-                        isbn = row.get('CÓDIGO', '').strip() if '97' in row.get('CÓDIGO', '') else ''
-                        stock = int(row.get('STOCK', '1') or '1')
-
-                        if not titulo or not codigo:
-                            self.stdout.write(
-                                self.style.WARNING(f'Skipping libro sin título o código: {titulo}')
-                            )
-                            errores += 1
-                            continue
-
-                        # Crear o actualizar libro
-                        libro, created = Libro.objects.update_or_create(
-                            codigo=codigo,
-                            defaults={
-                                'titulo': titulo,
-                                'autor': autor,
-                                'categoria': categoria,
-                                'isbn': isbn,
-                                'stock': stock,
-                                'disponible': stock > 0,
-                            }
-                        )
-
-                        if created:
-                            libros_creados += 1
-                        else:
-                            libros_actualizados += 1
-
-                    except Exception as e:
-                        self.stdout.write(
-                            self.style.ERROR(f'Error procesando fila: {str(e)}')
-                        )
-                        errores += 1
-                        continue
-
-            # Resumen
-            self.stdout.write(self.style.SUCCESS('✓ Carga completada'))
-            self.stdout.write(f'  Libros creados: {libros_creados}')
-            self.stdout.write(f'  Libros actualizados: {libros_actualizados}')
-            if errores > 0:
-                self.stdout.write(self.style.WARNING(f'  Errores: {errores}'))
+        self.importador = Importador()
+        self.filas_validas = 0
+        self.errores = 0
+        inicio = time.perf_counter()
 
+        try:
+            if len(archivos) == 1:
+                self._cargar_archivo(archivos[0], options)
+            else:
+                self._cargar_en_paralelo(archivos, options)
         except Exception as e:
             self.stdout.write(
                 self.style.ERROR(f'Error al leer el archivo: {str(e)}')
             )
+            return
+
+        duracion = time.perf_counter() - inicio
+        velocidad = (self.filas_validas + self.errores) / duracion if duracion else 0
+
+        # Resumen
+        if options['dry_run']:
+            self.stdout.write(self.style.SUCCESS('✓ Validación completada (sin cambios)'))
+            self.stdout.write(f'  Filas válidas: {self.filas_validas}')
+        else:
+            self.stdout.write(self.style.SUCCESS('✓ Carga completada'))
+            self.stdout.write(f'  Libros creados: {self.importador.creados}')
+            self.stdout.write(f'  Libros actualizados: {self.importador.actualizados}')
+        if self.errores > 0:
+            self.stdout.write(self.style.WARNING(f'  Errores: {self.errores}'))
+        self.stdout.write(f'  Archivos: {len(archivos)}')
+        self.stdout.write(f'  Tiempo: {duracion:.2f} s ({velocidad:.0f} filas/s)')
+
+    def _cargar_archivo(self, ruta, options):
+        """Lee un único archivo en streaming y lo aplica lote a lote."""
+        for numero, lote in enumerate(en_lotes(leer_csv(ruta), options['batch_size']), start=1):
+            filas = []
+            for row in lote:
+                try:
+                    filas.append(normalizar_fila(row))
+                except ValueError as e:
+                    self.stdout.write(self.style.WARNING(f'Skipping fila: {e}'))
+                    self.errores += 1
+
+            self.filas_validas += len(filas)
+            if filas and not options['dry_run']:
+                self.importador.aplicar_lote(filas)
+            self.stdout.write(f'  Lote {numero}: {self.filas_validas + self.errores} filas leídas')
+
+    def _cargar_en_paralelo(self, archivos, options):
+        """
+        Normaliza los archivos en un pool de procesos y escribe desde este.
+
+        Solo el proceso principal escribe en la base de datos, así que SQLite
+        sigue teniendo un único escritor mientras el análisis usa todos los núcleos.
+        Los resultados se aplican en el orden de los archivos, no en el que
+        terminan: si un ISBN se repite, gana siempre el último archivo.
+        """
+        workers = max(1, min(options['workers'], len(archivos)))
+        with ProcessPoolExecutor(max_workers=workers, initializer=django.setup) as pool:
+            for ruta, filas, errores in pool.map(procesar_archivo, archivos):
+                for error in errores:
+                    self.stdout.write(self.style.WARNING(f'Skipping fila: {error}'))
+                self.errores += len(errores)
+                self.filas_validas += len(filas)
+
+                if not options['dry_run']:
+                    for lote in en_lotes(filas, options['batch_size']):
+                        self.importador.aplicar_lote(lote)
+                self.stdout.write(f'  {os.path.basename(ruta)}: {len(filas)} filas válidas')
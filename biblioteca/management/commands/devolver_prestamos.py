@@ -0,0 +1,55 @@
+from datetime import datetime, time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from biblioteca.models import Prestamo
+from biblioteca.prestamos import devolver_prestamos_en_lote
+
+
+class Command(BaseCommand):
+    help = 'Marca como devueltos, en lote, los préstamos activos que cumplan los filtros'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ids', nargs='+', type=int, help='IDs de préstamos concretos')
+        parser.add_argument('--usuario', type=str, help='Nombre de usuario del lector')
+        parser.add_argument('--libro', type=int, help='ID del libro')
+        parser.add_argument(
+            '--antes-de', type=str, dest='antes_de',
+            help='Solo préstamos realizados antes de esta fecha (AAAA-MM-DD)'
+        )
+        parser.add_argument('--todos', action='store_true', help='Devolver todos los préstamos activos')
+        parser.add_argument('--dry-run', action='store_true', help='Solo muestra cuántos se devolverían')
+
+    def handle(self, *args, **options):
+        queryset = Prestamo.objects.filter(devuelto=False)
+        filtros = False
+
+        if options['ids']:
+            queryset = queryset.filter(pk__in=options['ids'])
+            filtros = True
+        if options['usuario']:
+            queryset = queryset.filter(usuario__username=options['usuario'])
+            filtros = True
+        if options['libro']:
+            queryset = queryset.filter(libro_id=options['libro'])
+            filtros = True
+        if options['antes_de']:
+            try:
+                fecha = datetime.strptime(options['antes_de'], '%Y-%m-%d').date()
+            except ValueError:
+                raise CommandError('La fecha debe tener el formato AAAA-MM-DD.')
+            queryset = queryset.filter(
+                fecha_prestamo__lt=timezone.make_aware(datetime.combine(fecha, time.min))
+            )
+            filtros = True
+
+        if not filtros and not options['todos']:
+            raise CommandError('Indica al menos un filtro o usa --todos.')
+
+        if options['dry_run']:
+            self.stdout.write(f'Se devolverían {queryset.count()} préstamos.')
+            return
+
+        devueltos = devolver_prestamos_en_lote(queryset)
+        self.stdout.write(self.style.SUCCESS('✓ Devolución completada'))
+        self.stdout.write(f'  Préstamos devueltos: {devueltos}')
@@ -0,0 +1,60 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from biblioteca.exportacion import ESTADOS, FORMATOS, TAMANO_BLOQUE, ErrorExportacion, exportar
+
+
+class Command(BaseCommand):
+    help = 'Exporta el catálogo o el historial de préstamos en CSV o JSONL sin cargarlo en memoria'
+
+    def add_arguments(self, parser):
+        parser.add_argument('tipo', choices=('libros', 'prestamos'), help='Qué exportar')
+        parser.add_argument(
+            '--formato', choices=FORMATOS, default='csv', help='Formato de salida (por defecto: csv)'
+        )
+        parser.add_argument('--gzip', action='store_true', help='Comprimir la salida con gzip')
+        parser.add_argument('--salida', type=str, help='Archivo de destino (por defecto: stdout)')
+        parser.add_argument('--desde', type=str, help='Fecha inicial (AAAA-MM-DD)')
+        parser.add_argument('--hasta', type=str, help='Fecha final, incluida (AAAA-MM-DD)')
+        parser.add_argument('--categoria', type=int, help='ID de la categoría')
+        parser.add_argument('--estado', choices=ESTADOS, help='Solo préstamos activos o devueltos')
+        parser.add_argument(
+            '--chunk-size', type=int, default=TAMANO_BLOQUE, dest='chunk_size',
+            help=f'Filas leídas por bloque (por defecto: {TAMANO_BLOQUE})'
+        )
+
+    def handle(self, *args, **options):
+        if options['estado'] and options['tipo'] != 'prestamos':
+            raise CommandError('--estado solo se aplica a la exportación de préstamos.')
+        filtros = {
+            'desde': options['desde'],
+            'hasta': options['hasta'],
+            'categoria': options['categoria'],
+            'tamano_bloque': options['chunk_size'],
+        }
+        if options['tipo'] == 'prestamos':
+            filtros['estado'] = options['estado']
+        try:
+            contenido = exportar(options['tipo'], options['formato'], options['gzip'], **filtros)
+        except ErrorExportacion as e:
+            raise CommandError(str(e))
+
+        inicio = time.perf_counter()
+        escritos = 0
+        if options['salida']:
+            with open(options['salida'], 'wb') as archivo:
+                for bloque in contenido:
+                    archivo.write(bloque)
+                    escritos += len(bloque)
+        else:
+            for bloque in contenido:
+                sys.stdout.buffer.write(bloque)
+                escritos += len(bloque)
+            sys.stdout.buffer.flush()
+            return
+
+        duracion = time.perf_counter() - inicio
+        self.stdout.write(self.style.SUCCESS(f'✓ Exportación guardada en {options["salida"]}'))
+        self.stdout.write(f'  Tamaño: {escritos / 1024:.1f} KiB')
+        self.stdout.write(f'  Tiempo: {duracion:.2f} s')
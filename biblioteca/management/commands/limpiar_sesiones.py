@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+from biblioteca import sesiones
+
+
+class Command(BaseCommand):
+    help = 'Borra por lotes las sesiones caducadas (alternativa a clearsessions para tablas grandes)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--lote', type=int, default=sesiones.TAMANO_LOTE,
+            help=f'Sesiones por lote y transacción (por defecto: {sesiones.TAMANO_LOTE})'
+        )
+        parser.add_argument(
+            '--max-lotes', type=int, dest='max_lotes',
+            help='Detenerse tras este número de lotes; el resto queda para la siguiente ejecución'
+        )
+        parser.add_argument('--dry-run', action='store_true', help='Solo muestra cuántas sesiones se borrarían')
+
+    def handle(self, *args, **options):
+        if options['lote'] < 1:
+            raise CommandError('--lote debe ser mayor que cero.')
+
+        if options['dry_run']:
+            self.stdout.write(f'Se borrarían {sesiones.expiradas().count()} sesiones caducadas.')
+            return
+
+        lotes = borradas = 0
+        for lotes, cantidad in sesiones.limpiar_expiradas(options['lote'], options['max_lotes']):
+            borradas += cantidad
+            if options['verbosity'] >= 2:
+                self.stdout.write(f'  Lote {lotes}: {cantidad} sesiones')
+
+        self.stdout.write(self.style.SUCCESS('✓ Limpieza de sesiones completada'))
+        self.stdout.write(f'  Lotes: {lotes}')
+        self.stdout.write(f'  Sesiones borradas: {borradas}')
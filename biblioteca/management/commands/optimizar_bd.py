@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+from biblioteca import ajustes_sqlite
+
+
+class Command(BaseCommand):
+    help = 'Actualiza las estadísticas del planificador (PRAGMA optimize / ANALYZE); pensado para cron'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--completo', action='store_true',
+            help='En SQLite, ANALYZE de todas las tablas en lugar de PRAGMA optimize'
+        )
+
+    def handle(self, *args, **options):
+        sentencias = ajustes_sqlite.optimizar(analizar_todo=options['completo'])
+        self.stdout.write(self.style.SUCCESS('✓ Base de datos optimizada'))
+        self.stdout.write(f'  Motor: {connection.vendor}')
+        for sentencia in sentencias:
+            self.stdout.write(f'  {sentencia}')
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from biblioteca import vencimientos
+
+
+class Command(BaseCommand):
+    help = 'Genera avisos de los préstamos vencidos en lotes pequeños (apto para cron)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--lote', type=int, default=vencimientos.TAMANO_LOTE,
+            help=f'Préstamos por lote y transacción (por defecto: {vencimientos.TAMANO_LOTE})'
+        )
+        parser.add_argument(
+            '--max-lotes', type=int, dest='max_lotes',
+            help='Detenerse tras este número de lotes; el resto queda para la siguiente ejecución'
+        )
+        parser.add_argument('--dry-run', action='store_true', help='Solo muestra cuántos préstamos están vencidos')
+
+    def handle(self, *args, **options):
+        if options['lote'] < 1:
+            raise CommandError('--lote debe ser mayor que cero.')
+        ahora = timezone.now()
+
+        if options['dry_run']:
+            self.stdout.write(f'Hay {vencimientos.vencidos(ahora).count()} préstamos vencidos sin aviso.')
+            return
+
+        lotes = avisos = 0
+        for lotes, creados in vencimientos.procesar_vencidos(ahora, options['lote'], options['max_lotes']):
+            avisos += creados
+            if options['verbosity'] >= 2:
+                self.stdout.write(f'  Lote {lotes}: {creados} avisos')
+
+        self.stdout.write(self.style.SUCCESS('✓ Vencimientos procesados'))
+        self.stdout.write(f'  Lotes: {lotes}')
+        self.stdout.write(f'  Avisos generados: {avisos}')
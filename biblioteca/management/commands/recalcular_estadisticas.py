@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from biblioteca import estadisticas
+
+
+class Command(BaseCommand):
+    help = 'Recalcula los contadores de la página de inicio y de cada libro y corrige las desviaciones'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--solo-informe',
+            action='store_true',
+            help='Muestra las desviaciones sin corregirlas'
+        )
+
+    def handle(self, *args, **options):
+        corregir = not options['solo_informe']
+        with transaction.atomic():
+            desviados = estadisticas.recalcular(corregir=corregir)
+            libros_desviados, ejemplos = estadisticas.recalcular_libros(corregir=corregir)
+
+        if not desviados and not libros_desviados:
+            self.stdout.write(self.style.SUCCESS('✓ Todos los contadores están al día'))
+            return
+
+        for nombre, (guardado, real) in desviados.items():
+            self.stdout.write(f'  {nombre}: guardado {guardado}, real {real}')
+        for fila in ejemplos:
+            diferencias = ', '.join(
+                f'{campo} {fila[campo]} → {fila[f"{campo}_real"]}'
+                for campo in estadisticas.CONTADORES_LIBRO if fila[campo] != fila[f'{campo}_real']
+            )
+            self.stdout.write(f'  Libro {fila["id"]} ({fila["titulo"]}): {diferencias}')
+        if libros_desviados > len(ejemplos):
+            self.stdout.write(f'  ... y {libros_desviados - len(ejemplos)} libros más')
+        if not corregir:
+            self.stdout.write(self.style.WARNING(
+                f'{len(desviados)} contadores y {libros_desviados} libros desviados (sin corregir)'
+            ))
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                f'✓ {len(desviados)} contadores y {libros_desviados} libros corregidos'
+            ))
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+from biblioteca import recomendaciones
+
+
+class Command(BaseCommand):
+    help = 'Recalcula los libros recomendados de cada libro (solo los pendientes, salvo con --completo)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--completo', action='store_true',
+            help='Recalcular todos los libros en lugar de solo los cambiados desde la última vez'
+        )
+        parser.add_argument(
+            '--lote', type=int, default=recomendaciones.TAMANO_LOTE,
+            help=f'Libros por lote y transacción (por defecto: {recomendaciones.TAMANO_LOTE})'
+        )
+        parser.add_argument(
+            '--vecinos', type=int, default=recomendaciones.vecinos_por_libro(),
+            help=f'Recomendaciones por libro (por defecto: {recomendaciones.vecinos_por_libro()})'
+        )
+
+    def handle(self, *args, **options):
+        if options['lote'] < 1 or options['vecinos'] < 1:
+            raise CommandError('--lote y --vecinos deben ser mayores que cero.')
+
+        lotes = libros = filas = 0
+        for lotes, cantidad, creadas in recomendaciones.reconstruir(
+            options['completo'], options['lote'], options['vecinos']
+        ):
+            libros += cantidad
+            filas += creadas
+            if options['verbosity'] >= 2:
+                self.stdout.write(f'  Lote {lotes}: {cantidad} libros, {creadas} recomendaciones')
+
+        self.stdout.write(self.style.SUCCESS('✓ Recomendaciones recalculadas'))
+        self.stdout.write(f'  Lotes: {lotes}')
+        self.stdout.write(f'  Libros recalculados: {libros}')
+        self.stdout.write(f'  Recomendaciones guardadas: {filas}')
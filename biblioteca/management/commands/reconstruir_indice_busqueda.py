@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from biblioteca import busqueda
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye el índice de búsqueda de texto completo del catálogo'
+
+    def handle(self, *args, **options):
+        if not busqueda.soportado():
+            self.stdout.write(
+                self.style.WARNING(f'El motor "{connection.vendor}" no tiene índice de texto completo; no hay nada que reconstruir.')
+            )
+            return
+
+        with transaction.atomic():
+            busqueda.crear_tabla(connection)
+            total = busqueda.reconstruir()
+
+        self.stdout.write(self.style.SUCCESS('✓ Índice reconstruido'))
+        self.stdout.write(f'  Libros indexados: {total}')
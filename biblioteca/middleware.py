@@ -0,0 +1,85 @@
+import logging
+import time
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.urls import reverse
+
+from .consultas import UMBRAL_N_MAS_1, RegistroConsultas, comprobar
+from . import enrutador
+
+logger = logging.getLogger(__name__)
+
+
+class PerfiladoConsultasMiddleware:
+    """
+    Registra las consultas SQL de cada petición.
+
+    Añade la cabecera Server-Timing con el número de consultas y el tiempo en
+    base de datos, avisa en el log de posibles N+1 y de las vistas que superan
+    su presupuesto (@presupuesto_consultas). Con BIBLIOTECA_PRESUPUESTO_ESTRICTO
+    lanza PresupuestoConsultasExcedido, lo que hace fallar las pruebas.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'BIBLIOTECA_PERFILADO_CONSULTAS', settings.DEBUG):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.umbral = getattr(settings, 'BIBLIOTECA_UMBRAL_N_MAS_1', UMBRAL_N_MAS_1)
+        self.estricto = getattr(settings, 'BIBLIOTECA_PRESUPUESTO_ESTRICTO', False)
+
+    def __call__(self, request):
+        registro = RegistroConsultas()
+        with registro.registrar():
+            response = self.get_response(request)
+
+        response['Server-Timing'] = (
+            f'db;dur={registro.duracion * 1000:.1f};desc="{registro.total} consultas"'
+        )
+
+        maximo = getattr(request, 'presupuesto_consultas', None)
+        if maximo is not None and registro.total > maximo:
+            logger.warning('%s ejecutó %d consultas (presupuesto: %d)', request.path, registro.total, maximo)
+        for forma, veces in registro.repetidas(self.umbral):
+            logger.warning('Posible N+1 en %s: %d veces "%s"', request.path, veces, forma)
+
+        if self.estricto:
+            comprobar(registro, maximo, self.umbral)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.presupuesto_consultas = getattr(view_func, 'presupuesto_consultas', None)
+
+
+class LecturaReplicasMiddleware:
+    """
+    Permite que las lecturas del catálogo de la petición vayan a una réplica.
+
+    Las peticiones que modifican datos, las del admin y las que llegan poco
+    después de una escritura leen de la primaria. Si la petición escribe, se
+    deja la cookie que mantiene las lecturas en la primaria durante
+    BIBLIOTECA_BD_RETARDO_REPLICA segundos. Ver biblioteca/enrutador.py.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.prefijo_admin = reverse('admin:index')
+
+    def __call__(self, request):
+        if not enrutador.replicas():
+            return self.get_response(request)
+
+        primaria = (
+            request.method not in ('GET', 'HEAD', 'OPTIONS')
+            or request.path.startswith(self.prefijo_admin)
+            or enrutador.escribio_hace_poco(request.COOKIES.get(enrutador.COOKIE))
+        )
+        with enrutador.peticion(primaria) as estado:
+            response = self.get_response(request)
+
+        if estado.escribio or request.method not in ('GET', 'HEAD', 'OPTIONS'):
+            retardo = enrutador.retardo()
+            response.set_cookie(
+                enrutador.COOKIE, str(time.time() + retardo), max_age=retardo, httponly=True, samesite='Lax'
+            )
+        return response
@@ -0,0 +1,59 @@
+# Generated by Django 6.0 on 2026-10-17 10:00
+
+from django.db import migrations
+
+# Copia fija del esquema de biblioteca/busqueda.py en esta migración: si el
+# módulo cambia más adelante, esta migración debe seguir creando lo mismo.
+TABLA_INDICE = 'biblioteca_libro_busqueda'
+
+SQL_SQLITE = [
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {TABLA_INDICE} USING fts5("
+    "titulo, autores, isbn, editorial, descripcion, "
+    "tokenize='unicode61 remove_diacritics 2')",
+    f"INSERT INTO {TABLA_INDICE} (rowid, titulo, autores, isbn, editorial, descripcion) "
+    "SELECT l.id, l.titulo, "
+    "COALESCE((SELECT group_concat(a.nombre, ' ') FROM biblioteca_libro_autores la "
+    "JOIN biblioteca_autor a ON a.id = la.autor_id WHERE la.libro_id = l.id), ''), "
+    "l.isbn, COALESCE(l.editorial, ''), l.descripcion "
+    "FROM biblioteca_libro l",
+]
+
+SQL_POSTGRESQL = [
+    f"CREATE TABLE IF NOT EXISTS {TABLA_INDICE} ("
+    "libro_id bigint PRIMARY KEY REFERENCES biblioteca_libro(id) ON DELETE CASCADE, "
+    "documento tsvector NOT NULL)",
+    f"CREATE INDEX IF NOT EXISTS {TABLA_INDICE}_documento_gin ON {TABLA_INDICE} USING GIN (documento)",
+    f"INSERT INTO {TABLA_INDICE} (libro_id, documento) "
+    "SELECT l.id, "
+    "setweight(to_tsvector('simple', l.titulo), 'A') || "
+    "setweight(to_tsvector('simple', COALESCE((SELECT string_agg(a.nombre, ' ') "
+    "FROM biblioteca_libro_autores la JOIN biblioteca_autor a ON a.id = la.autor_id "
+    "WHERE la.libro_id = l.id), '')), 'A') || "
+    "setweight(to_tsvector('simple', l.isbn || ' ' || COALESCE(l.editorial, '')), 'B') || "
+    "setweight(to_tsvector('simple', l.descripcion), 'C') "
+    "FROM biblioteca_libro l",
+]
+
+SQL_POR_MOTOR = {'sqlite': SQL_SQLITE, 'postgresql': SQL_POSTGRESQL}
+
+
+def crear_indice(apps, schema_editor):
+    # En otros motores la búsqueda recurre a icontains y no hay índice
+    for sql in SQL_POR_MOTOR.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(sql, params=None)
+
+
+def eliminar_indice(apps, schema_editor):
+    if schema_editor.connection.vendor in SQL_POR_MOTOR:
+        schema_editor.execute(f'DROP TABLE IF EXISTS {TABLA_INDICE}', params=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('biblioteca', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_indice, eliminar_indice),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 6.0 on 2026-10-17 10:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('biblioteca', '0002_indice_busqueda'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='libro',
+            index=models.Index(fields=['titulo', 'id'], name='libro_titulo_id_idx'),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 6.0 on 2026-10-17 11:00
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, F
+from django.utils import timezone
+
+
+def cerrar_duplicados(apps, schema_editor):
+    """
+    Deja un solo préstamo activo por libro y usuario antes de crear la restricción.
+
+    Sin transacción, dos solicitudes simultáneas podían crear dos préstamos
+    activos del mismo libro. Se conserva el más antiguo; los demás se dan por
+    devueltos y su ejemplar vuelve al stock.
+    """
+    Libro = apps.get_model('biblioteca', 'Libro')
+    Prestamo = apps.get_model('biblioteca', 'Prestamo')
+    repetidos = (
+        Prestamo.objects.filter(devuelto=False).values('libro_id', 'usuario_id')
+        .annotate(total=Count('id')).filter(total__gt=1).order_by()
+    )
+    ahora = timezone.now()
+    for grupo in repetidos:
+        activos = Prestamo.objects.filter(devuelto=False, libro_id=grupo['libro_id'], usuario_id=grupo['usuario_id'])
+        sobrantes = list(activos.order_by('fecha_prestamo', 'id').values_list('id', flat=True)[1:])
+        Prestamo.objects.filter(pk__in=sobrantes).update(devuelto=True, fecha_devolucion=ahora)
+        Libro.objects.filter(pk=grupo['libro_id']).update(cantidad_disponible=F('cantidad_disponible') + len(sobrantes))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('biblioteca', '0003_libro_titulo_id_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(cerrar_duplicados, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='prestamo',
+            constraint=models.UniqueConstraint(condition=models.Q(('devuelto', False)), fields=('libro', 'usuario'), name='prestamo_activo_unico'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 6.0 on 2026-10-17 12:00
+
+from django.db import migrations, models
+
+
+def inicializar_contadores(apps, schema_editor):
+    Contador = apps.get_model('biblioteca', 'Contador')
+    Libro = apps.get_model('biblioteca', 'Libro')
+    Autor = apps.get_model('biblioteca', 'Autor')
+    Categoria = apps.get_model('biblioteca', 'Categoria')
+    Prestamo = apps.get_model('biblioteca', 'Prestamo')
+    Contador.objects.bulk_create([
+        Contador(nombre='libros', valor=Libro.objects.count()),
+        Contador(nombre='autores', valor=Autor.objects.count()),
+        Contador(nombre='categorias', valor=Categoria.objects.count()),
+        Contador(nombre='prestamos_activos', valor=Prestamo.objects.filter(devuelto=False).count()),
+        Contador(nombre='libros_agotados', valor=Libro.objects.filter(cantidad_disponible=0).count()),
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('biblioteca', '0004_prestamo_activo_unico'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Contador',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(max_length=50, unique=True)),
+                ('valor', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(inicializar_contadores, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 6.0 on 2026-10-17 13:00
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('biblioteca', '0005_contador'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='libro',
+            index=models.Index(condition=models.Q(('cantidad_disponible__gt', 0)), fields=['titulo', 'id'], name='libro_disponible_titulo_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='libro',
+            index=models.Index(fields=['categoria', 'titulo', 'id'], name='libro_categoria_titulo_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='libro',
+            index=models.Index(fields=['-fecha_agregado'], name='libro_agregado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='prestamo',
+            index=models.Index(fields=['usuario', '-fecha_prestamo'], name='prestamo_usuario_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='prestamo',
+            index=models.Index(condition=models.Q(('devuelto', False)), fields=['usuario', 'libro'], name='prestamo_activo_usuario_idx'),
+        ),
+    ]
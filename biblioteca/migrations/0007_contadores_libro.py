@@ -0,0 +1,58 @@
+# Generated by Django 6.0 on 2026-10-17 14:00
+
+from django.db import migrations, models
+from django.db.models import Count, F, Max, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def poblar_contadores(apps, schema_editor):
+    Libro = apps.get_model('biblioteca', 'Libro')
+    Prestamo = apps.get_model('biblioteca', 'Prestamo')
+
+    def de_prestamos(agregado, **filtros):
+        return Subquery(
+            Prestamo.objects.filter(libro=OuterRef('pk'), **filtros)
+            .order_by().values('libro').annotate(valor=agregado).values('valor')
+        )
+
+    Libro.objects.update(
+        prestamos_activos=Coalesce(de_prestamos(Count('id'), devuelto=False), 0),
+        prestamos_totales=Coalesce(de_prestamos(Count('id')), 0),
+        ultimo_prestamo=de_prestamos(Max('fecha_prestamo')),
+    )
+    Libro.objects.update(total_ejemplares=F('cantidad_disponible') + F('prestamos_activos'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('biblioteca', '0006_indices_consultas_frecuentes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='libro',
+            name='total_ejemplares',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='libro',
+            name='prestamos_activos',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='libro',
+            name='prestamos_totales',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='libro',
+            name='ultimo_prestamo',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(poblar_contadores, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='libro',
+            index=models.Index(fields=['-prestamos_totales', '-id'], name='libro_populares_idx'),
+        ),
+    ]
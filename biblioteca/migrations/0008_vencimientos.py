@@ -0,0 +1,64 @@
+# Generated by Django 6.0 on 2026-10-17 15:00
+
+from datetime import timedelta
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F
+
+
+def poblar_vencimientos(apps, schema_editor):
+    Prestamo = apps.get_model('biblioteca', 'Prestamo')
+    dias = getattr(settings, 'BIBLIOTECA_DIAS_PRESTAMO', 14)
+    Prestamo.objects.update(fecha_vencimiento=F('fecha_prestamo') + timedelta(days=dias))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('biblioteca', '0007_contadores_libro'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='prestamo',
+            name='fecha_vencimiento',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='prestamo',
+            name='aviso_vencido',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(poblar_vencimientos, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='prestamo',
+            name='fecha_vencimiento',
+            field=models.DateTimeField(blank=True),
+        ),
+        migrations.AddIndex(
+            model_name='prestamo',
+            index=models.Index(condition=models.Q(('aviso_vencido__isnull', True), ('devuelto', False)), fields=['fecha_vencimiento', 'id'], name='prestamo_vencido_pendiente_idx'),
+        ),
+        migrations.CreateModel(
+            name='Aviso',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('vencimiento', 'Préstamo vencido')], max_length=20)),
+                ('mensaje', models.TextField()),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True)),
+                ('fecha_envio', models.DateTimeField(blank=True, null=True)),
+                ('prestamo', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='avisos', to='biblioteca.prestamo')),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='avisos', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Aviso',
+                'verbose_name_plural': 'Avisos',
+                'ordering': ['-fecha_creacion'],
+                'indexes': [models.Index(condition=models.Q(('fecha_envio__isnull', True)), fields=['fecha_creacion', 'id'], name='aviso_pendiente_idx')],
+                'constraints': [models.UniqueConstraint(fields=('prestamo', 'tipo'), name='aviso_unico_por_prestamo')],
+            },
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 6.0 on 2026-10-17 16:00
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('biblioteca', '0008_vencimientos'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='aviso',
+            name='prestamo',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='avisos', to='biblioteca.prestamo'),
+        ),
+        migrations.CreateModel(
+            name='PrestamoArchivado',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('fecha_prestamo', models.DateTimeField()),
+                ('fecha_vencimiento', models.DateTimeField()),
+                ('fecha_devolucion', models.DateTimeField()),
+                ('fecha_archivado', models.DateTimeField(auto_now_add=True)),
+                ('libro', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='prestamos_archivados', to='biblioteca.libro')),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='prestamos_archivados', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Préstamo archivado',
+                'verbose_name_plural': 'Préstamos archivados',
+                'ordering': ['-fecha_prestamo'],
+                'indexes': [models.Index(fields=['usuario', '-fecha_prestamo', '-id'], name='archivado_usuario_fecha_idx')],
+            },
+        ),
+    ]
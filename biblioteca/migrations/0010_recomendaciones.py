@@ -0,0 +1,30 @@
+# Generated by Django 6.0 on 2026-10-17 18:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('biblioteca', '0009_prestamos_archivados'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Recomendacion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('posicion', models.PositiveSmallIntegerField()),
+                ('puntuacion', models.FloatField()),
+                ('libro', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='recomendaciones', to='biblioteca.libro')),
+                ('recomendado', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='biblioteca.libro')),
+            ],
+            options={
+                'verbose_name': 'Recomendación',
+                'verbose_name_plural': 'Recomendaciones',
+                'ordering': ['libro', 'posicion'],
+                'constraints': [models.UniqueConstraint(fields=('libro', 'posicion'), name='recomendacion_posicion_unica')],
+            },
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 6.0 on 2026-10-18 10:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('biblioteca', '0010_recomendaciones'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='autor',
+            index=models.Index(fields=['nombre', 'id'], name='autor_nombre_id_idx'),
+        ),
+    ]
@@ -1,7 +1,6 @@
 from django.db import models
 from django.contrib.auth.models import User
 from django.core.validators import MinValueValidator, MaxValueValidator
-from django.utils import timezone
 
 # Modelo PerfilUsuario con Relación Uno a Uno
 class PerfilUsuario(models.Model):
@@ -21,6 +20,12 @@ class Autor(models.Model):
     biografia = models.TextField(blank=True, null=True)
     fecha_nacimiento = models.DateField(blank=True, null=True)
 
+    class Meta:
+        indexes = [
+            # Selector de autores paginado por cursor sobre (nombre, id)
+            models.Index(fields=['nombre', 'id'], name='autor_nombre_id_idx'),
+        ]
+
     def __str__(self):
         return self.nombre
 
@@ -44,6 +49,15 @@ class Etiqueta(models.Model):
     def __str__(self):
         return self.nombre
 
+# Modelo Contador para estadísticas precalculadas
+class Contador(models.Model):
+    """Totales del catálogo mantenidos por señales y servicios (ver estadisticas.py)."""
+    nombre = models.CharField(max_length=50, unique=True)
+    valor = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f'{self.nombre}: {self.valor}'
+
 # Modelo Libro
 class Libro(models.Model):
     """Modelo principal para los libros de la biblioteca."""
@@ -67,10 +81,32 @@ class Libro(models.Model):
     fecha_agregado = models.DateTimeField(auto_now_add=True)
     fecha_actualizacion = models.DateTimeField(auto_now=True)
 
+    # Contadores desnormalizados: los mantiene el servicio de préstamos con F()
+    # y los verifica el comando recalcular_estadisticas.
+    total_ejemplares = models.PositiveIntegerField(default=0, editable=False)
+    prestamos_activos = models.PositiveIntegerField(default=0, editable=False)
+    prestamos_totales = models.PositiveIntegerField(default=0, editable=False)
+    ultimo_prestamo = models.DateTimeField(blank=True, null=True, editable=False)
+
     class Meta:
         ordering = ['titulo']
         verbose_name = 'Libro'
         verbose_name_plural = 'Libros'
+        indexes = [
+            # Soporta la paginación por cursor sobre (titulo, id)
+            models.Index(fields=['titulo', 'id'], name='libro_titulo_id_idx'),
+            # Listado filtrado por "solo disponibles": índice parcial, más pequeño
+            models.Index(
+                fields=['titulo', 'id'], condition=models.Q(cantidad_disponible__gt=0),
+                name='libro_disponible_titulo_idx',
+            ),
+            # Listado filtrado por categoría y ordenado por título
+            models.Index(fields=['categoria', 'titulo', 'id'], name='libro_categoria_titulo_idx'),
+            # Libros recientes de la portada
+            models.Index(fields=['-fecha_agregado'], name='libro_agregado_idx'),
+            # Listado ordenado por popularidad (paginación por cursor descendente)
+            models.Index(fields=['-prestamos_totales', '-id'], name='libro_populares_idx'),
+        ]
 
     def __str__(self):
         return self.titulo
@@ -81,22 +117,128 @@ class Prestamo(models.Model):
     libro = models.ForeignKey(Libro, on_delete=models.CASCADE, related_name='prestamos')
     usuario = models.ForeignKey(User, on_delete=models.CASCADE, related_name='prestamos')
     fecha_prestamo = models.DateTimeField(auto_now_add=True)
+    # Si se deja vacía, se calcula con BIBLIOTECA_DIAS_PRESTAMO al guardar
+    fecha_vencimiento = models.DateTimeField(blank=True)
     fecha_devolucion = models.DateTimeField(blank=True, null=True)
     devuelto = models.BooleanField(default=False)
+    # Cuándo se generó el aviso de vencimiento (ver vencimientos.py)
+    aviso_vencido = models.DateTimeField(blank=True, null=True, editable=False)
 
     class Meta:
         ordering = ['-fecha_prestamo']
         verbose_name = 'Préstamo'
         verbose_name_plural = 'Préstamos'
+        constraints = [
+            # Un usuario no puede tener dos préstamos activos del mismo libro
+            models.UniqueConstraint(
+                fields=['libro', 'usuario'], condition=models.Q(devuelto=False),
+                name='prestamo_activo_unico',
+            ),
+        ]
+        indexes = [
+            # Historial del usuario ordenado del más reciente al más antiguo
+            models.Index(fields=['usuario', '-fecha_prestamo'], name='prestamo_usuario_fecha_idx'),
+            # Préstamos activos de un usuario: solo indexa los no devueltos
+            models.Index(
+                fields=['usuario', 'libro'], condition=models.Q(devuelto=False),
+                name='prestamo_activo_usuario_idx',
+            ),
+            # Vencidos sin aviso, recorridos por cursor (fecha_vencimiento, id).
+            # Las filas salen del índice al devolverse o al avisar.
+            models.Index(
+                fields=['fecha_vencimiento', 'id'],
+                condition=models.Q(devuelto=False, aviso_vencido__isnull=True),
+                name='prestamo_vencido_pendiente_idx',
+            ),
+        ]
 
     def __str__(self):
         return f'{self.libro.titulo} prestado a {self.usuario.username}'
 
     def devolver(self):
         """Marca el libro como devuelto."""
-        self.fecha_devolucion = timezone.now()
-        self.devuelto = True
-        self.save()
-        # Incrementar el stock del libro
-        self.libro.cantidad_disponible += 1
-        self.libro.save()
+        from .prestamos import devolver_prestamo
+        return devolver_prestamo(self)
+
+# Modelo PrestamoArchivado: historial frío de préstamos devueltos
+class PrestamoArchivado(models.Model):
+    """
+    Préstamo devuelto hace tiempo, movido fuera de Prestamo (ver historial.py).
+
+    Conserva el id original, así que archivar dos veces el mismo préstamo no
+    lo duplica.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    libro = models.ForeignKey(Libro, on_delete=models.CASCADE, related_name='prestamos_archivados')
+    usuario = models.ForeignKey(User, on_delete=models.CASCADE, related_name='prestamos_archivados')
+    fecha_prestamo = models.DateTimeField()
+    fecha_vencimiento = models.DateTimeField()
+    fecha_devolucion = models.DateTimeField()
+    fecha_archivado = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-fecha_prestamo']
+        verbose_name = 'Préstamo archivado'
+        verbose_name_plural = 'Préstamos archivados'
+        indexes = [
+            # Historial del usuario por cursor (-fecha_prestamo, -id)
+            models.Index(fields=['usuario', '-fecha_prestamo', '-id'], name='archivado_usuario_fecha_idx'),
+        ]
+
+    # Un préstamo archivado siempre está devuelto; así se pinta igual que Prestamo.
+    devuelto = True
+
+    def __str__(self):
+        return f'{self.libro.titulo} prestado a {self.usuario.username} (archivado)'
+
+# Modelo Aviso: bandeja de salida local de notificaciones
+class Aviso(models.Model):
+    """Notificación pendiente de enviar a un lector (p. ej. préstamo vencido)."""
+    TIPOS = [('vencimiento', 'Préstamo vencido')]
+
+    tipo = models.CharField(max_length=20, choices=TIPOS)
+    usuario = models.ForeignKey(User, on_delete=models.CASCADE, related_name='avisos')
+    # Queda vacío cuando el préstamo se archiva: el aviso se conserva igualmente
+    prestamo = models.ForeignKey(Prestamo, on_delete=models.SET_NULL, null=True, blank=True, related_name='avisos')
+    mensaje = models.TextField()
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    fecha_envio = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        ordering = ['-fecha_creacion']
+        verbose_name = 'Aviso'
+        verbose_name_plural = 'Avisos'
+        constraints = [
+            # Un solo aviso de cada tipo por préstamo, aunque el proceso se repita
+            models.UniqueConstraint(fields=['prestamo', 'tipo'], name='aviso_unico_por_prestamo'),
+        ]
+        indexes = [
+            # Avisos por enviar, del más antiguo al más reciente
+            models.Index(
+                fields=['fecha_creacion', 'id'], condition=models.Q(fecha_envio__isnull=True),
+                name='aviso_pendiente_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.get_tipo_display()} para {self.usuario.username}'
+
+# Modelo Recomendacion: vecinos precalculados de cada libro
+class Recomendacion(models.Model):
+    """Libro parecido a otro según los préstamos, las etiquetas y los autores (ver recomendaciones.py)."""
+    # Sin índice propio: lo cubre la restricción única (libro, posicion)
+    libro = models.ForeignKey(Libro, on_delete=models.CASCADE, related_name='recomendaciones', db_index=False)
+    recomendado = models.ForeignKey(Libro, on_delete=models.CASCADE, related_name='+')
+    posicion = models.PositiveSmallIntegerField()
+    puntuacion = models.FloatField()
+
+    class Meta:
+        ordering = ['libro', 'posicion']
+        verbose_name = 'Recomendación'
+        verbose_name_plural = 'Recomendaciones'
+        constraints = [
+            models.UniqueConstraint(fields=['libro', 'posicion'], name='recomendacion_posicion_unica'),
+        ]
+
+    def __str__(self):
+        return f'{self.libro_id} → {self.recomendado_id} ({self.puntuacion:.3f})'
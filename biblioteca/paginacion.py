@@ -0,0 +1,205 @@
+"""
+Paginación por cursor (keyset) para listados grandes.
+
+En vez de OFFSET, cada página continúa a partir del último (campo, id) visto,
+de modo que la página 5.000 cuesta lo mismo que la primera. El total se
+obtiene de un conteo guardado en caché.
+"""
+import base64
+import datetime
+import hashlib
+import json
+import math
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet, ValidationError
+from django.core.paginator import Paginator
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+CONTEO_TTL = 300
+
+
+def conteo_ttl():
+    """Segundos que se reutiliza un total ya contado (BIBLIOTECA_CONTEO_TTL)."""
+    return getattr(settings, 'BIBLIOTECA_CONTEO_TTL', CONTEO_TTL)
+
+
+def conteo_en_cache(queryset):
+    """Devuelve el total del queryset, recalculándolo como mucho cada conteo_ttl() segundos."""
+    try:
+        sql = str(queryset.order_by().query)
+    except EmptyResultSet:
+        # queryset.none(), p. ej. una búsqueda sin ningún término: no hay SQL que ejecutar
+        return 0
+    clave = 'biblioteca:conteo:' + hashlib.md5(sql.encode()).hexdigest()
+    total = cache.get(clave)
+    if total is None:
+        total = queryset.order_by().count()
+        cache.set(clave, total, conteo_ttl())
+    return total
+
+
+class PaginadorConteoEnCache(Paginator):
+    """Paginator con OFFSET cuyo total sale de conteo_en_cache (para el admin)."""
+
+    @cached_property
+    def count(self):
+        return conteo_en_cache(self.object_list)
+
+
+def codificar_cursor(valor, pk, direccion, numero):
+    """Empaqueta la posición en un token opaco apto para la URL."""
+    if isinstance(valor, (datetime.date, datetime.datetime)):
+        # isoformat completo: los microsegundos importan para no saltar filas.
+        valor = valor.isoformat()
+    datos = json.dumps({'v': valor, 'i': pk, 'd': direccion, 'n': numero}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(datos.encode()).decode().rstrip('=')
+
+
+def decodificar_cursor(token):
+    """Desempaqueta un token; lanza ValueError si no es válido."""
+    try:
+        relleno = '=' * (-len(token) % 4)
+        datos = json.loads(base64.urlsafe_b64decode(token + relleno))
+        valor, pk, direccion, numero = datos['v'], int(datos['i']), datos['d'], int(datos['n'])
+    except (TypeError, KeyError, ValueError, UnicodeDecodeError) as e:
+        raise ValueError('Cursor de paginación no válido.') from e
+    if direccion not in ('s', 'a') or numero < 1 or valor is None or isinstance(valor, (bool, list, dict)):
+        raise ValueError('Cursor de paginación no válido.')
+    return valor, pk, direccion, numero
+
+
+class PaginaCursor:
+    """Página de resultados con la misma interfaz básica que django.core.paginator.Page."""
+
+    def __init__(self, object_list, number, num_pages, count, cursor_anterior, cursor_siguiente):
+        self.object_list = object_list
+        self.number = number
+        self.num_pages = num_pages
+        self.count = count
+        self.cursor_anterior = cursor_anterior
+        self.cursor_siguiente = cursor_siguiente
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.cursor_siguiente is not None
+
+    def has_previous(self):
+        return self.cursor_anterior is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+def _valor(objeto, campo):
+    """Lee un campo tanto de una instancia como de una fila de values()."""
+    return objeto[campo] if isinstance(objeto, dict) else getattr(objeto, campo)
+
+
+class PaginadorCursor:
+    """
+    Pagina un queryset ordenado por (campo, id) usando cursores opacos.
+
+    El campo puede llevar '-' para orden descendente. Admite querysets de
+    instancias y de values() (que deben incluir el campo y 'id').
+    """
+
+    def __init__(self, queryset, per_page, campo='titulo'):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.descendente = campo.startswith('-')
+        self.campo = campo.lstrip('-')
+
+    def get_page(self, token=None):
+        """Devuelve la página del token; un token ausente o inválido da la primera."""
+        try:
+            posicion = decodificar_cursor(token) if token else None
+        except ValueError:
+            posicion = None
+        if posicion is None:
+            return self._pagina(None, None, 's', 1)
+        try:
+            return self._pagina(*posicion)
+        except (ValueError, ValidationError):
+            # Token bien formado con un valor que no encaja con el tipo del campo
+            return self._pagina(None, None, 's', 1)
+
+    def _pagina(self, valor, pk, direccion, numero):
+        campo = self.campo
+        adelante = direccion == 's'
+        # Hacia atrás se recorre la base en el sentido contrario al del listado.
+        ascendente = adelante != self.descendente
+
+        # Se pide un elemento de más para saber si hay otra página en ese sentido.
+        objetos = self._leer(self.queryset, ascendente, valor, pk)
+        hay_mas = len(objetos) > self.per_page
+        objetos = objetos[:self.per_page]
+
+        if adelante:
+            hay_siguiente, hay_anterior = hay_mas, pk is not None
+        else:
+            objetos.reverse()
+            hay_siguiente, hay_anterior = True, hay_mas
+
+        count = self._contar()
+        num_pages = max(1, math.ceil(count / self.per_page))
+        numero = min(numero, num_pages)
+
+        cursor_anterior = cursor_siguiente = None
+        if objetos and hay_anterior:
+            primero = objetos[0]
+            cursor_anterior = codificar_cursor(
+                _valor(primero, campo), _valor(primero, 'id'), 'a', max(1, numero - 1)
+            )
+        if objetos and hay_siguiente:
+            ultimo = objetos[-1]
+            cursor_siguiente = codificar_cursor(_valor(ultimo, campo), _valor(ultimo, 'id'), 's', numero + 1)
+
+        return PaginaCursor(objetos, numero, num_pages, count, cursor_anterior, cursor_siguiente)
+
+    def _leer(self, queryset, ascendente, valor, pk):
+        """Hasta per_page + 1 objetos a partir de la posición (valor, pk), en el sentido pedido."""
+        campo = self.campo
+        operador = 'gt' if ascendente else 'lt'
+        queryset = queryset.order_by(*((campo, 'id') if ascendente else (f'-{campo}', '-id')))
+        if pk is not None:
+            queryset = queryset.filter(
+                Q(**{f'{campo}__{operador}': valor}) | Q(**{campo: valor, f'id__{operador}': pk})
+            )
+        return list(queryset[:self.per_page + 1])
+
+    def _contar(self):
+        return conteo_en_cache(self.queryset)
+
+
+class PaginadorCursorCombinado(PaginadorCursor):
+    """
+    Pagina por cursor varios querysets como si fueran uno solo.
+
+    Todos deben ordenarse por el mismo campo y no compartir ids (p. ej. una
+    tabla y su archivo). Cada página lee per_page + 1 filas de cada queryset
+    y las mezcla en memoria, así que su coste no depende del total.
+    """
+
+    def __init__(self, querysets, per_page, campo='titulo'):
+        super().__init__(None, per_page, campo)
+        self.querysets = querysets
+
+    def _leer(self, queryset, ascendente, valor, pk):
+        objetos = []
+        for queryset in self.querysets:
+            objetos.extend(super()._leer(queryset, ascendente, valor, pk))
+        objetos.sort(key=lambda objeto: (_valor(objeto, self.campo), _valor(objeto, 'id')), reverse=not ascendente)
+        return objetos[:self.per_page + 1]
+
+    def _contar(self):
+        # Un solo COUNT sobre la unión (UNION ALL: no comparten ids)
+        primero, *resto = [queryset.order_by().values('pk') for queryset in self.querysets]
+        return conteo_en_cache(primero.union(*resto, all=True) if resto else primero)
@@ -0,0 +1,140 @@
+"""
+Servicio de préstamos: solicitud y devolución atómicas.
+
+El stock se modifica con UPDATE condicionales sobre expresiones F(), de modo
+que dos solicitudes simultáneas nunca dejan cantidad_disponible en negativo
+ni pierden una actualización. En las mismas sentencias se mantienen los
+contadores de préstamos del libro (prestamos_activos, prestamos_totales y
+ultimo_prestamo); total_ejemplares no cambia al prestar ni al devolver.
+
+En SQLite las transacciones empiezan con BEGIN IMMEDIATE (ver ajustes_sqlite.py)
+para que la concurrencia se resuelva esperando y no con "database is locked".
+"""
+from collections import Counter, defaultdict
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .ajustes_sqlite import transaccion_escritura
+from .models import Libro, Prestamo
+from . import cache_catalogo, estadisticas
+
+# Préstamos por UPDATE ... WHERE id IN (...) en las devoluciones en lote
+TAMANO_LOTE = 1000
+
+
+class PrestamoError(Exception):
+    """Error base del servicio de préstamos."""
+
+
+class LibroNoDisponible(PrestamoError):
+    """El libro no existe o no quedan ejemplares disponibles."""
+
+
+class PrestamoDuplicado(PrestamoError):
+    """El usuario ya tiene un préstamo activo de ese libro."""
+
+
+class PrestamoYaDevuelto(PrestamoError):
+    """El préstamo ya estaba marcado como devuelto."""
+
+
+def _restar_activos(cantidad):
+    # Nunca por debajo de cero aunque el contador esté desviado; lo corrige
+    # recalcular_estadisticas.
+    return Greatest(F('prestamos_activos') - cantidad, 0)
+
+
+def solicitar_prestamo(libro_id, usuario):
+    """Presta un ejemplar del libro al usuario y devuelve el Prestamo creado."""
+    with transaccion_escritura():
+        # UPDATE ... WHERE cantidad_disponible > 0: solo descuenta si queda stock.
+        descontados = Libro.objects.filter(pk=libro_id, cantidad_disponible__gt=0).update(
+            cantidad_disponible=F('cantidad_disponible') - 1, fecha_actualizacion=timezone.now()
+        )
+        if not descontados:
+            raise LibroNoDisponible('Este libro no está disponible actualmente.')
+        try:
+            with transaction.atomic():
+                prestamo = Prestamo.objects.create(libro_id=libro_id, usuario=usuario)
+        except IntegrityError as e:
+            # La restricción de préstamo activo único lo impide; se revierte el descuento.
+            raise PrestamoDuplicado('Ya tienes un préstamo activo para este libro.') from e
+        # La fila ya está bloqueada por el UPDATE anterior; ultimo_prestamo es la fecha exacta del préstamo.
+        Libro.objects.filter(pk=libro_id).update(
+            prestamos_activos=F('prestamos_activos') + 1,
+            prestamos_totales=F('prestamos_totales') + 1,
+            ultimo_prestamo=prestamo.fecha_prestamo,
+        )
+        if Libro.objects.filter(pk=libro_id, cantidad_disponible=0).exists():
+            estadisticas.incrementar('libros_agotados')
+    return prestamo
+
+
+def devolver_prestamo(prestamo):
+    """Marca el préstamo como devuelto y repone el ejemplar en el stock."""
+    ahora = timezone.now()
+    with transaccion_escritura():
+        marcados = Prestamo.objects.filter(pk=prestamo.pk, devuelto=False).update(
+            devuelto=True, fecha_devolucion=ahora
+        )
+        if not marcados:
+            raise PrestamoYaDevuelto('Este préstamo ya fue devuelto.')
+        Libro.objects.filter(pk=prestamo.libro_id).update(
+            cantidad_disponible=F('cantidad_disponible') + 1,
+            prestamos_activos=_restar_activos(1),
+            fecha_actualizacion=ahora,
+        )
+        estadisticas.incrementar('prestamos_activos', -1)
+        cache_catalogo.invalidar_catalogo()
+        if Libro.objects.filter(pk=prestamo.libro_id, cantidad_disponible=1).exists():
+            estadisticas.incrementar('libros_agotados', -1)
+    prestamo.devuelto = True
+    prestamo.fecha_devolucion = ahora
+    return prestamo
+
+
+def devolver_prestamos_en_lote(queryset):
+    """
+    Devuelve de una vez todos los préstamos activos del queryset.
+
+    Marca los préstamos por sus ids, en UPDATE de hasta TAMANO_LOTE filas, y
+    repone el stock con un UPDATE por cada grupo de libros que recupera el
+    mismo número de ejemplares.
+    Devuelve la cantidad de préstamos marcados.
+    """
+    ahora = timezone.now()
+    with transaccion_escritura():
+        # Se bloquean y anotan las filas a devolver antes de marcarlas: sus ids,
+        # y no la fecha de devolución, dicen qué libros recuperan ejemplares.
+        pendientes = list(queryset.select_for_update().filter(devuelto=False).values_list('id', 'libro_id'))
+        if not pendientes:
+            return 0
+        marcados = 0
+        for desde in range(0, len(pendientes), TAMANO_LOTE):
+            ids = [pk for pk, _ in pendientes[desde:desde + TAMANO_LOTE]]
+            marcados += Prestamo.objects.filter(pk__in=ids, devuelto=False).update(
+                devuelto=True, fecha_devolucion=ahora
+            )
+        devueltos_por_libro = Counter(libro_id for _, libro_id in pendientes).items()
+
+        libros_por_cantidad = defaultdict(list)
+        for libro_id, total in devueltos_por_libro:
+            libros_por_cantidad[total].append(libro_id)
+
+        # Los libros agotados dejarán de estarlo al reponer el stock.
+        libro_ids = [pk for ids in libros_por_cantidad.values() for pk in ids]
+        recuperados = Libro.objects.filter(pk__in=libro_ids, cantidad_disponible=0).count()
+
+        for total, libro_ids in libros_por_cantidad.items():
+            Libro.objects.filter(pk__in=libro_ids).update(
+                cantidad_disponible=F('cantidad_disponible') + total,
+                prestamos_activos=_restar_activos(total),
+                fecha_actualizacion=ahora,
+            )
+        estadisticas.incrementar('prestamos_activos', -marcados)
+        cache_catalogo.invalidar_catalogo()
+        estadisticas.incrementar('libros_agotados', -recuperados)
+    return marcados
@@ -0,0 +1,267 @@
+"""
+Recomendaciones «quienes leyeron este libro también leyeron».
+
+Cada libro guarda sus libros más parecidos en Recomendacion, ya ordenados,
+así que la página de detalle los lee con una sola consulta sobre el índice
+(libro, posicion). El cálculo se hace fuera de línea, con el comando
+recalcular_recomendaciones, y mezcla dos similitudes:
+
+- préstamos: coseno entre los lectores de los dos libros, es decir, los
+  usuarios que leyeron ambos normalizados por la popularidad de cada libro.
+  Cuenta también el archivo de préstamos;
+- contenido: Jaccard entre las etiquetas y los autores de los dos libros.
+
+La matriz usuario × libro es muy dispersa. En lugar de multiplicarla entera
+se recorren solo los pares que comparten un lector o un rasgo, con índices
+invertidos en memoria. Se ignoran los lectores y los rasgos demasiado
+comunes: no distinguen nada y harían crecer los pares de forma cuadrática.
+
+Las reconstrucciones son incrementales: solo se recalculan los libros
+modificados desde la anterior (fecha_actualizacion) y los libros de los
+usuarios con préstamos nuevos. Para ellos basta leer los préstamos de sus
+lectores y cuántos lectores tiene cada libro candidato, no todo el
+historial. Los vecinos de los demás pueden quedar algo desfasados hasta la
+siguiente reconstrucción completa (--completo).
+"""
+import heapq
+import math
+from collections import Counter, defaultdict
+from itertools import chain
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.db.models import Count, Max, Prefetch
+from django.utils import timezone
+
+from .ajustes_sqlite import transaccion_escritura
+from .models import Contador, Libro, Prestamo, PrestamoArchivado, Recomendacion
+
+VECINOS = 6
+# Peso de etiquetas y autores frente a los préstamos (0-1)
+PESO_CONTENIDO = 0.3
+MAX_LECTURAS_USUARIO = 500
+MAX_LIBROS_RASGO = 1000
+TAMANO_LOTE = 500
+
+# Marcas de la última reconstrucción, en Contador (la fecha en microsegundos)
+MARCA_PRESTAMO = 'recomendaciones_ultimo_prestamo'
+MARCA_FECHA = 'recomendaciones_fecha'
+
+
+# ============================================================================
+# SIMILITUD
+# ============================================================================
+
+def vecinos_por_libro():
+    """Recomendaciones que se guardan por libro (BIBLIOTECA_RECOMENDACIONES_VECINOS)."""
+    return getattr(settings, 'BIBLIOTECA_RECOMENDACIONES_VECINOS', VECINOS)
+
+
+def peso_de_contenido():
+    """Peso de la similitud por contenido (BIBLIOTECA_RECOMENDACIONES_PESO_CONTENIDO)."""
+    return getattr(settings, 'BIBLIOTECA_RECOMENDACIONES_PESO_CONTENIDO', PESO_CONTENIDO)
+
+
+def _trozos(ids, tamano=TAMANO_LOTE):
+    """Parte `ids` en listas de `tamano` para no superar el límite de parámetros de un IN."""
+    ids = list(ids)
+    for desde in range(0, len(ids), tamano):
+        yield ids[desde:desde + tamano]
+
+
+def _lecturas(**filtros):
+    """Pares (usuario, libro) de los préstamos activos, devueltos y archivados que cumplen `filtros`."""
+    return chain.from_iterable(
+        modelo.objects.filter(**filtros).values_list('usuario_id', 'libro_id').iterator(chunk_size=10000)
+        for modelo in (Prestamo, PrestamoArchivado)
+    )
+
+
+def _lecturas_de(campo, ids):
+    """Pares (usuario, libro) de los préstamos cuyo `campo` ('usuario_id' o 'libro_id') está en `ids`."""
+    return chain.from_iterable(_lecturas(**{f'{campo}__in': trozo}) for trozo in _trozos(ids))
+
+
+def lectores_voraces():
+    """
+    Usuarios con más de MAX_LECTURAS_USUARIO libros distintos, que se ignoran.
+
+    Quien los supera tiene más de la mitad en alguna de las dos tablas: se
+    buscan esos candidatos agregando en la base de datos y solo de ellos se
+    leen los préstamos.
+    """
+    candidatos = set()
+    for modelo in (Prestamo, PrestamoArchivado):
+        candidatos.update(
+            modelo.objects.values('usuario_id').annotate(libros=Count('libro_id', distinct=True))
+            .filter(libros__gt=MAX_LECTURAS_USUARIO // 2).values_list('usuario_id', flat=True)
+        )
+    libros_de = defaultdict(set)
+    for usuario, libro in _lecturas_de('usuario_id', candidatos):
+        libros_de[usuario].add(libro)
+    return {usuario for usuario, libros in libros_de.items() if len(libros) > MAX_LECTURAS_USUARIO}
+
+
+def _agrupar(pares, maximo):
+    """
+    Agrupa pares (clave, libro) en {clave: libros} e invierte el índice a {libro: claves}.
+
+    Se descartan las claves con más de `maximo` libros.
+    """
+    libros_de = defaultdict(set)
+    for clave, libro_id in pares:
+        libros_de[clave].add(libro_id)
+    libros_de = {clave: list(libros) for clave, libros in libros_de.items() if len(libros) <= maximo}
+    claves_de = defaultdict(set)
+    for clave, libros in libros_de.items():
+        for libro_id in libros:
+            claves_de[libro_id].add(clave)
+    return libros_de, claves_de
+
+
+class Similitudes:
+    """
+    Índices invertidos de lectores y rasgos del catálogo.
+
+    Con `total_lectores` ({libro: lectores}) los índices de lectores pueden
+    cubrir solo una parte de los préstamos: el número de lectores de cada
+    libro, que normaliza el coseno, sale de ahí.
+    """
+
+    def __init__(self, lecturas, rasgos, peso_contenido=None, total_lectores=None):
+        self.libros_de_lector, self.lectores = _agrupar(lecturas, MAX_LECTURAS_USUARIO)
+        self.libros_con_rasgo, self.rasgos = _agrupar(rasgos, MAX_LIBROS_RASGO)
+        self.peso_contenido = peso_de_contenido() if peso_contenido is None else peso_contenido
+        self.total_lectores = total_lectores
+
+    @classmethod
+    def cargar(cls, libros=None, **kwargs):
+        """
+        Lee de la base de datos los préstamos (activos, devueltos y archivados), etiquetas y autores.
+
+        Con `libros` solo se leen los préstamos de sus lectores, lo necesario
+        para calcular sus vecinos, y cuántos lectores tiene cada libro que
+        esos lectores leyeron.
+        """
+        etiquetas = Libro.etiquetas.through.objects.values_list('etiqueta_id', 'libro_id').iterator(chunk_size=10000)
+        autores = Libro.autores.through.objects.values_list('autor_id', 'libro_id').iterator(chunk_size=10000)
+        rasgos = [*((('e', etiqueta), libro) for etiqueta, libro in etiquetas),
+                  *((('a', autor), libro) for autor, libro in autores)]
+        if libros is None:
+            return cls(list(_lecturas()), rasgos, **kwargs)
+
+        voraces = lectores_voraces()
+        usuarios = {usuario for usuario, _ in _lecturas_de('libro_id', libros)} - voraces
+        lecturas = list(_lecturas_de('usuario_id', usuarios))
+        candidatos = {libro for _, libro in lecturas}
+        pares = {(usuario, libro) for usuario, libro in _lecturas_de('libro_id', candidatos) if usuario not in voraces}
+        return cls(lecturas, rasgos, total_lectores=Counter(libro for _, libro in pares), **kwargs)
+
+    def _total_lectores(self, libro_id):
+        if self.total_lectores is None:
+            return len(self.lectores[libro_id])
+        return self.total_lectores[libro_id]
+
+    def vecinos(self, libro_id, cantidad=None):
+        """Los `cantidad` libros más parecidos como [(libro_id, puntuación)], de mayor a menor."""
+        cantidad = vecinos_por_libro() if cantidad is None else cantidad
+        lectores = self.lectores.get(libro_id, ())
+        rasgos = self.rasgos.get(libro_id, ())
+        coincidencias = Counter()
+        for lector in lectores:
+            coincidencias.update(self.libros_de_lector[lector])
+        comunes = Counter()
+        for rasgo in rasgos:
+            comunes.update(self.libros_con_rasgo[rasgo])
+        coincidencias.pop(libro_id, None)
+        comunes.pop(libro_id, None)
+
+        puntuaciones = []
+        for otro in coincidencias.keys() | comunes.keys():
+            coseno = jaccard = 0.0
+            if coincidencias[otro]:
+                coseno = coincidencias[otro] / math.sqrt(len(lectores) * self._total_lectores(otro))
+            if comunes[otro]:
+                jaccard = comunes[otro] / (len(rasgos) + len(self.rasgos[otro]) - comunes[otro])
+            puntuacion = (1 - self.peso_contenido) * coseno + self.peso_contenido * jaccard
+            puntuaciones.append((puntuacion, -otro))
+        # A igual puntuación, el libro más antiguo
+        return [(-otro, puntuacion) for puntuacion, otro in heapq.nlargest(cantidad, puntuaciones)]
+
+
+# ============================================================================
+# RECONSTRUCCIÓN
+# ============================================================================
+
+def _marcas():
+    return dict(Contador.objects.filter(nombre__in=[MARCA_PRESTAMO, MARCA_FECHA]).values_list('nombre', 'valor'))
+
+
+def pendientes():
+    """
+    Ids de los libros cuyos vecinos han podido cambiar desde la última reconstrucción.
+
+    Devuelve None si nunca se ha hecho ninguna: hay que calcularlos todos.
+    """
+    marcas = _marcas()
+    if MARCA_FECHA not in marcas:
+        return None
+    desde = datetime.fromtimestamp(marcas[MARCA_FECHA] / 1_000_000, tz=dt_timezone.utc)
+    libros = set(Libro.objects.filter(fecha_actualizacion__gte=desde).values_list('id', flat=True))
+    lectores = set(
+        Prestamo.objects.filter(id__gt=marcas.get(MARCA_PRESTAMO, 0)).values_list('usuario_id', flat=True)
+    )
+    if lectores:
+        lectores -= lectores_voraces()
+        libros.update(libro for _, libro in _lecturas_de('usuario_id', lectores))
+    return libros
+
+
+def guardar_lote(similitudes, libro_ids, cantidad=None):
+    """Sustituye los vecinos guardados de `libro_ids` en una transacción; devuelve las filas creadas."""
+    filas = [
+        Recomendacion(libro_id=libro_id, recomendado_id=otro, posicion=posicion, puntuacion=puntuacion)
+        for libro_id in libro_ids
+        for posicion, (otro, puntuacion) in enumerate(similitudes.vecinos(libro_id, cantidad))
+    ]
+    with transaccion_escritura():
+        Recomendacion.objects.filter(libro_id__in=libro_ids).delete()
+        Recomendacion.objects.bulk_create(filas)
+    return len(filas)
+
+
+def reconstruir(completo=False, tamano=TAMANO_LOTE, cantidad=None, similitudes=None):
+    """
+    Recalcula por lotes los vecinos de los libros pendientes, o de todos con `completo`.
+
+    Genera (número de lote, libros, filas) tras cada lote. Las marcas para la
+    siguiente reconstrucción incremental se guardan solo al terminar.
+    """
+    inicio = timezone.now()
+    ultimo_prestamo = Prestamo.objects.aggregate(ultimo=Max('id'))['ultimo'] or 0
+    libros = None if completo else pendientes()
+    similitudes = similitudes or Similitudes.cargar(libros)
+    if libros is None:
+        libros = Libro.objects.order_by('id').values_list('id', flat=True)
+    libros = sorted(libros)
+
+    for lote, desde in enumerate(range(0, len(libros), tamano), 1):
+        ids = libros[desde:desde + tamano]
+        yield lote, len(ids), guardar_lote(similitudes, ids, cantidad)
+
+    for nombre, valor in ((MARCA_PRESTAMO, ultimo_prestamo), (MARCA_FECHA, int(inicio.timestamp() * 1_000_000))):
+        Contador.objects.update_or_create(nombre=nombre, defaults={'valor': valor})
+
+
+# ============================================================================
+# LECTURA
+# ============================================================================
+
+def prefetch():
+    """Prefetch de los vecinos de un libro con su título y stock: una consulta por el índice (libro, posicion)."""
+    return Prefetch(
+        'recomendaciones',
+        queryset=Recomendacion.objects.select_related('recomendado').only(
+            'libro', 'posicion', 'recomendado__titulo', 'recomendado__cantidad_disponible'
+        ),
+    )
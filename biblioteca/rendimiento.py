@@ -0,0 +1,195 @@
+"""
+Utilidades para medir el rendimiento de la biblioteca.
+
+Incluye la generación de una biblioteca sintética de tamaño configurable y la
+medición de peticiones con el cliente de pruebas de Django (latencia,
+consultas por petición y rendimiento).
+"""
+import random
+import statistics
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.db import connections, transaction
+from django.utils import timezone
+
+from .consultas import RegistroConsultas
+from .models import Autor, Categoria, Etiqueta, Libro, PerfilUsuario, Prestamo
+from . import autocompletado, busqueda, estadisticas, vencimientos
+
+TAMANO_LOTE = 5000
+
+PALABRAS = (
+    'amor guerra sombra ciudad mar noche tiempo casa jardín sueño río montaña viaje silencio '
+    'memoria fuego luna camino historia secreto invierno verano isla bosque libro palabra'
+).split()
+
+
+# ============================================================================
+# DATOS SINTÉTICOS
+# ============================================================================
+
+@contextmanager
+def sin_auto_now_add(modelo, campo):
+    """Permite fijar a mano un campo auto_now_add mientras dure el bloque."""
+    field = modelo._meta.get_field(campo)
+    field.auto_now_add = False
+    try:
+        yield
+    finally:
+        field.auto_now_add = True
+
+
+def _frase(rng, minimo, maximo):
+    return ' '.join(rng.choice(PALABRAS) for _ in range(rng.randint(minimo, maximo))).capitalize()
+
+
+def sembrar_biblioteca(libros=10000, usuarios=200, prestamos_por_libro=2, semilla=42, salida=None):
+    """
+    Llena la base de datos con una biblioteca sintética reproducible.
+
+    Crea un autor cada diez libros, categorías, etiquetas, usuarios y un
+    historial de préstamos repartido en el último año (la mayoría devueltos).
+    """
+    rng = random.Random(semilla)
+    log = salida or (lambda mensaje: None)
+    ahora = timezone.now()
+
+    with transaction.atomic():
+        categorias = Categoria.objects.bulk_create([Categoria(nombre=f'Categoría {i}') for i in range(50)])
+        etiquetas = Etiqueta.objects.bulk_create([Etiqueta(nombre=f'etiqueta-{i}') for i in range(200)])
+        autores = Autor.objects.bulk_create(
+            [Autor(nombre=f'{_frase(rng, 1, 1)} {_frase(rng, 1, 2)} {i}') for i in range(max(1, libros // 10))],
+            batch_size=TAMANO_LOTE,
+        )
+        lectores = User.objects.bulk_create(
+            [User(username=f'lector{i}', email=f'lector{i}@example.com') for i in range(usuarios)]
+        )
+        PerfilUsuario.objects.bulk_create([PerfilUsuario(user=usuario) for usuario in lectores])
+    log(f'  Catálogo base: {len(autores)} autores, {len(lectores)} usuarios')
+
+    LibroAutores = Libro.autores.through
+    LibroEtiquetas = Libro.etiquetas.through
+    creados = 0
+    while creados < libros:
+        tamano = min(TAMANO_LOTE, libros - creados)
+        with transaction.atomic():
+            lote = Libro.objects.bulk_create([
+                Libro(
+                    titulo=_frase(rng, 1, 5),
+                    descripcion=_frase(rng, 10, 40),
+                    isbn=f'{979_0000000000 + creados + i}',
+                    cantidad_disponible=rng.randint(0, 5),
+                    categoria=rng.choice(categorias),
+                    editorial=f'Editorial {rng.randint(1, 100)}',
+                )
+                for i in range(tamano)
+            ])
+            LibroAutores.objects.bulk_create([
+                LibroAutores(libro_id=libro.pk, autor_id=autor.pk)
+                for libro in lote
+                for autor in rng.sample(autores, min(len(autores), rng.randint(1, 3)))
+            ], ignore_conflicts=True)
+            LibroEtiquetas.objects.bulk_create([
+                LibroEtiquetas(libro_id=libro.pk, etiqueta_id=etiqueta.pk)
+                for libro in lote
+                for etiqueta in rng.sample(etiquetas, rng.randint(0, 3))
+            ], ignore_conflicts=True)
+            with sin_auto_now_add(Prestamo, 'fecha_prestamo'):
+                historial = []
+                for libro in lote:
+                    for _ in range(prestamos_por_libro):
+                        fecha = ahora - timedelta(days=rng.randint(0, 365), minutes=rng.randint(0, 1440))
+                        devuelto = rng.random() < 0.9
+                        historial.append(Prestamo(
+                            libro_id=libro.pk,
+                            usuario=rng.choice(lectores),
+                            fecha_prestamo=fecha,
+                            fecha_vencimiento=vencimientos.calcular_vencimiento(fecha),
+                            devuelto=devuelto,
+                            fecha_devolucion=fecha + timedelta(days=rng.randint(1, 30)) if devuelto else None,
+                        ))
+                # Puede repetirse un préstamo activo (libro, usuario): se descarta.
+                Prestamo.objects.bulk_create(historial, ignore_conflicts=True)
+        creados += tamano
+        log(f'  Libros creados: {creados}/{libros}')
+
+    # bulk_create no emite señales: se reconstruyen los índices y los contadores.
+    busqueda.reconstruir()
+    autocompletado.invalidar()
+    estadisticas.recalcular()
+    estadisticas.recalcular_libros()
+    return {'libros': libros, 'autores': len(autores), 'usuarios': len(lectores)}
+
+
+# ============================================================================
+# MEDICIÓN
+# ============================================================================
+
+def percentil(valores, p):
+    """Percentil p (0-100) por interpolación lineal."""
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    posicion = (len(ordenados) - 1) * p / 100
+    inferior = int(posicion)
+    superior = min(inferior + 1, len(ordenados) - 1)
+    return ordenados[inferior] + (ordenados[superior] - ordenados[inferior]) * (posicion - inferior)
+
+
+def resumir(latencias, consultas, duracion_total):
+    """Resume latencias (segundos) y consultas por petición en un diccionario serializable."""
+    return {
+        'peticiones': len(latencias),
+        'p50_ms': round(percentil(latencias, 50) * 1000, 2),
+        'p95_ms': round(percentil(latencias, 95) * 1000, 2),
+        'media_ms': round(statistics.fmean(latencias) * 1000, 2) if latencias else 0.0,
+        'consultas_por_peticion': round(statistics.fmean(consultas), 2) if consultas else 0.0,
+        'peticiones_por_segundo': round(len(latencias) / duracion_total, 1) if duracion_total else 0.0,
+    }
+
+
+def medir(funcion, repeticiones):
+    """
+    Ejecuta `funcion(i)` las veces indicadas y devuelve el resumen.
+
+    La función suele hacer una petición con el cliente de pruebas; si devuelve
+    una respuesta con código de error se lanza AssertionError.
+    """
+    latencias, consultas = [], []
+    inicio_total = time.perf_counter()
+    for i in range(repeticiones):
+        registro = RegistroConsultas()
+        with registro.registrar():
+            inicio = time.perf_counter()
+            respuesta = funcion(i)
+            latencias.append(time.perf_counter() - inicio)
+        consultas.append(registro.total)
+        codigo = getattr(respuesta, 'status_code', 200)
+        if codigo >= 400:
+            raise AssertionError(f'Respuesta {codigo} durante la medición.')
+    return resumir(latencias, consultas, time.perf_counter() - inicio_total)
+
+
+@contextmanager
+def perfil_bd(alias='default', **cambios):
+    """
+    Aplica cambios a la configuración de la conexión (CONN_MAX_AGE, OPTIONS...) dentro del bloque.
+
+    Se cierran las conexiones al entrar y al salir para que las nuevas se
+    abran con la configuración indicada; los hilos creados dentro del bloque
+    también la usan.
+    """
+    configuracion = connections.settings[alias]
+    original = {clave: configuracion.get(clave) for clave in cambios}
+    connections.close_all()
+    configuracion.update(cambios)
+    try:
+        yield
+    finally:
+        connections.close_all()
+        if hasattr(connections[alias], 'close_pool'):
+            connections[alias].close_pool()
+        configuracion.update(original)
@@ -0,0 +1,54 @@
+"""
+Sesiones y autenticación en el camino de cada petición.
+
+- Con una caché compartida las sesiones usan el motor cached_db (ver
+  settings.py): se leen de la caché y la base de datos queda como respaldo.
+  Con la caché en memoria de cada proceso se leen de la base de datos.
+- BackendConPerfil carga el usuario de la sesión junto con su perfil en una
+  sola consulta; AuthenticationMiddleware lo guarda en request.user para el
+  resto de la petición.
+- limpiar_expiradas() borra por lotes las sesiones caducadas, para no
+  bloquear la tabla con un único DELETE enorme como clearsessions.
+"""
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.models import User
+from django.contrib.sessions.models import Session
+from django.utils import timezone
+
+from .ajustes_sqlite import transaccion_escritura
+
+TAMANO_LOTE = 1000
+
+
+class BackendConPerfil(ModelBackend):
+    """ModelBackend que trae user.perfil en la misma consulta que el usuario."""
+
+    def get_user(self, user_id):
+        try:
+            user = User._default_manager.select_related('perfil').get(pk=user_id)
+        except User.DoesNotExist:
+            return None
+        return user if self.user_can_authenticate(user) else None
+
+
+def expiradas(ahora=None):
+    return Session.objects.filter(expire_date__lt=ahora or timezone.now())
+
+
+def limpiar_expiradas(tamano=TAMANO_LOTE, max_lotes=None, ahora=None):
+    """
+    Borra las sesiones caducadas en lotes de `tamano`, cada uno en su transacción.
+
+    Genera (número de lote, sesiones borradas) tras cada lote; recorre el índice
+    de expire_date, así que cada lote solo lee las filas que borra.
+    """
+    ahora = ahora or timezone.now()
+    lote = 0
+    while max_lotes is None or lote < max_lotes:
+        with transaccion_escritura():
+            claves = list(expiradas(ahora).values_list('session_key', flat=True)[:tamano])
+            if not claves:
+                return
+            borradas, _ = Session.objects.filter(session_key__in=claves).delete()
+        lote += 1
+        yield lote, borradas
@@ -0,0 +1,210 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, post_delete, pre_delete, m2m_changed
+from django.dispatch import receiver
+from .models import Libro, Autor, Categoria, Etiqueta, Prestamo
+from . import autocompletado, busqueda, cache_catalogo, estadisticas, vencimientos
+
+# ============================================================================
+# ÍNDICE DE BÚSQUEDA
+# ============================================================================
+
+@receiver(post_save, sender=Libro)
+def indexar_libro(sender, instance, raw=False, **kwargs):
+    """Reindexa el libro cada vez que se guarda."""
+    if not raw:
+        busqueda.actualizar_libros([instance.pk])
+
+@receiver(post_delete, sender=Libro)
+def desindexar_libro(sender, instance, **kwargs):
+    """Quita el libro eliminado del índice."""
+    busqueda.eliminar_libros([instance.pk])
+
+@receiver(m2m_changed, sender=Libro.autores.through)
+def reindexar_autores_de_libro(sender, instance, action, reverse, pk_set, **kwargs):
+    """Reindexa los libros afectados al cambiar la relación libro-autor."""
+    if action not in ('post_add', 'post_remove', 'post_clear', 'pre_clear'):
+        return
+    if not reverse:
+        busqueda.actualizar_libros([instance.pk])
+    elif action == 'pre_clear':
+        # Al vaciar desde el autor, pk_set no trae los libros: se guardan antes.
+        instance._libros_a_reindexar = list(instance.libros.values_list('pk', flat=True))
+    elif action == 'post_clear':
+        busqueda.actualizar_libros(getattr(instance, '_libros_a_reindexar', []))
+    else:
+        busqueda.actualizar_libros(pk_set or [])
+
+@receiver(post_save, sender=Autor)
+def reindexar_libros_de_autor(sender, instance, created, raw=False, **kwargs):
+    """Reindexa los libros del autor cuando cambia su nombre."""
+    if not raw and not created:
+        busqueda.actualizar_libros(instance.libros.values_list('pk', flat=True))
+
+@receiver(pre_delete, sender=Autor)
+def recordar_libros_de_autor(sender, instance, **kwargs):
+    """Guarda los libros del autor antes de que se borren sus relaciones."""
+    instance._libros_a_reindexar = list(instance.libros.values_list('pk', flat=True))
+
+@receiver(post_delete, sender=Autor)
+def reindexar_tras_eliminar_autor(sender, instance, **kwargs):
+    """Reindexa los libros que perdieron al autor eliminado."""
+    busqueda.actualizar_libros(getattr(instance, '_libros_a_reindexar', []))
+
+# ============================================================================
+# SUGERENCIAS DEL BUSCADOR
+# ============================================================================
+
+@receiver(post_save, sender=Libro)
+def sugerencias_libro(sender, instance, raw=False, **kwargs):
+    """Actualiza el título y el ISBN en el índice de sugerencias del proceso."""
+    if not raw:
+        transaction.on_commit(partial(autocompletado.actualizar_libro, instance.pk, instance.titulo, instance.isbn))
+
+@receiver(post_save, sender=Autor)
+def sugerencias_autor(sender, instance, raw=False, **kwargs):
+    """Actualiza el nombre del autor en el índice de sugerencias del proceso."""
+    if not raw:
+        transaction.on_commit(partial(autocompletado.actualizar_autor, instance.pk, instance.nombre))
+
+@receiver(post_delete, sender=Libro)
+@receiver(post_delete, sender=Autor)
+def quitar_sugerencia(sender, instance, **kwargs):
+    """Quita el libro o autor eliminado de las sugerencias."""
+    tipo = 'libro' if sender is Libro else 'autor'
+    transaction.on_commit(partial(autocompletado.quitar, tipo, instance.pk))
+
+# ============================================================================
+# CONTADORES DEL LIBRO Y VENCIMIENTOS
+# ============================================================================
+
+@receiver(pre_save, sender=Libro)
+def refrescar_contadores_libro(sender, instance, raw=False, **kwargs):
+    """
+    Toma los contadores de préstamos de la base antes de guardar.
+
+    save() escribe todas las columnas y la instancia puede venir de un formulario
+    cargado antes del último préstamo. total_ejemplares sigue a cantidad_disponible.
+    """
+    if raw:
+        return
+    actuales = None
+    if not instance._state.adding:
+        actuales = Libro.objects.filter(pk=instance.pk).values(
+            'prestamos_activos', 'prestamos_totales', 'ultimo_prestamo'
+        ).first()
+    for campo, valor in (actuales or {}).items():
+        setattr(instance, campo, valor)
+    instance.total_ejemplares = instance.cantidad_disponible + instance.prestamos_activos
+
+@receiver(pre_save, sender=Prestamo)
+def asignar_vencimiento(sender, instance, raw=False, **kwargs):
+    """Los préstamos creados sin fecha de vencimiento reciben la de por defecto."""
+    if not raw and instance.fecha_vencimiento is None:
+        instance.fecha_vencimiento = vencimientos.calcular_vencimiento(instance.fecha_prestamo)
+
+# ============================================================================
+# ESTADÍSTICAS
+# ============================================================================
+
+@receiver(pre_save, sender=Libro)
+def recordar_agotado(sender, instance, raw=False, **kwargs):
+    """Guarda si el libro estaba agotado antes de editarlo."""
+    if not raw and not instance._state.adding:
+        instance._agotado_antes = Libro.objects.filter(pk=instance.pk, cantidad_disponible=0).exists()
+
+@receiver(post_save, sender=Libro)
+def contar_libro(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    agotado = instance.cantidad_disponible == 0
+    if created:
+        estadisticas.incrementar('libros')
+        estadisticas.incrementar('libros_agotados', int(agotado))
+    else:
+        estadisticas.incrementar('libros_agotados', int(agotado) - int(getattr(instance, '_agotado_antes', agotado)))
+
+@receiver(post_delete, sender=Libro)
+def descontar_libro(sender, instance, **kwargs):
+    estadisticas.incrementar('libros', -1)
+    estadisticas.incrementar('libros_agotados', -int(instance.cantidad_disponible == 0))
+
+@receiver(post_save, sender=Autor)
+@receiver(post_save, sender=Categoria)
+def contar_autor_o_categoria(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        estadisticas.incrementar('autores' if sender is Autor else 'categorias')
+
+@receiver(post_delete, sender=Autor)
+@receiver(post_delete, sender=Categoria)
+def descontar_autor_o_categoria(sender, instance, **kwargs):
+    estadisticas.incrementar('autores' if sender is Autor else 'categorias', -1)
+
+@receiver(pre_save, sender=Prestamo)
+def recordar_devuelto(sender, instance, raw=False, **kwargs):
+    """Guarda si el préstamo estaba devuelto antes de editarlo (p. ej. desde el admin)."""
+    if not raw and not instance._state.adding:
+        instance._devuelto_antes = Prestamo.objects.filter(pk=instance.pk, devuelto=True).exists()
+
+@receiver(post_save, sender=Prestamo)
+def contar_prestamo(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    activo = not instance.devuelto
+    activo_antes = False if created else not getattr(instance, '_devuelto_antes', instance.devuelto)
+    estadisticas.incrementar('prestamos_activos', int(activo) - int(activo_antes))
+
+@receiver(post_delete, sender=Prestamo)
+def descontar_prestamo(sender, instance, **kwargs):
+    estadisticas.incrementar('prestamos_activos', -int(not instance.devuelto))
+
+# ============================================================================
+# CACHÉ DEL CATÁLOGO
+# ============================================================================
+
+@receiver(post_save, sender=Libro)
+@receiver(post_delete, sender=Libro)
+@receiver(post_save, sender=Prestamo)
+@receiver(post_delete, sender=Prestamo)
+def invalidar_catalogo(sender, raw=False, **kwargs):
+    """Invalida listados y portada; el detalle se renueva con fecha_actualizacion."""
+    if not raw:
+        cache_catalogo.invalidar_catalogo()
+
+@receiver(m2m_changed, sender=Libro.autores.through)
+@receiver(m2m_changed, sender=Libro.etiquetas.through)
+def renovar_cache_relaciones(sender, instance, action, reverse, pk_set, **kwargs):
+    """Marca como modificados los libros cuyos autores o etiquetas cambian."""
+    if action not in ('post_add', 'post_remove', 'post_clear', 'pre_clear'):
+        return
+    if not reverse:
+        if action != 'pre_clear':
+            cache_catalogo.marcar_modificados([instance.pk])
+    elif action == 'pre_clear':
+        instance._libros_a_renovar = list(instance.libros.values_list('pk', flat=True))
+    elif action == 'post_clear':
+        cache_catalogo.marcar_modificados(getattr(instance, '_libros_a_renovar', []))
+    else:
+        cache_catalogo.marcar_modificados(pk_set or [])
+
+@receiver(pre_delete, sender=Autor)
+@receiver(pre_delete, sender=Categoria)
+@receiver(pre_delete, sender=Etiqueta)
+def recordar_libros_relacionados(sender, instance, **kwargs):
+    """Guarda los libros relacionados antes de que se borre la relación."""
+    instance._libros_a_renovar = list(instance.libros.values_list('pk', flat=True))
+
+@receiver(post_save, sender=Autor)
+@receiver(post_save, sender=Categoria)
+@receiver(post_save, sender=Etiqueta)
+def renovar_cache_libros_relacionados(sender, instance, created, raw=False, **kwargs):
+    """Un cambio de nombre afecta a todas las fichas de sus libros."""
+    if not raw and not created:
+        cache_catalogo.marcar_modificados(instance.libros.values_list('pk', flat=True))
+
+@receiver(post_delete, sender=Autor)
+@receiver(post_delete, sender=Categoria)
+@receiver(post_delete, sender=Etiqueta)
+def renovar_cache_tras_eliminar(sender, instance, **kwargs):
+    cache_catalogo.marcar_modificados(getattr(instance, '_libros_a_renovar', []))
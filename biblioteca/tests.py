@@ -1,3 +1,1377 @@
-from django.test import TestCase
+import base64
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+from unittest import mock
+from datetime import timedelta
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.db import connection, connections, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from . import enrutador, estadisticas, recomendaciones, sesiones, vencimientos
+from .ajustes_sqlite import transaccion_escritura
+from .consultas import PresupuestoConsultasExcedido, presupuesto
+from .models import (
+    Autor, Aviso, Categoria, Etiqueta, Libro, PerfilUsuario, Prestamo, PrestamoArchivado, Recomendacion,
+)
+from .prestamos import (
+    LibroNoDisponible, PrestamoDuplicado, PrestamoYaDevuelto, solicitar_prestamo, devolver_prestamo,
+    devolver_prestamos_en_lote,
+)
+
+
+class ServicioPrestamosTests(TestCase):
+    """Solicitud y devolución de préstamos a través del servicio."""
+
+    def setUp(self):
+        self.usuario = User.objects.create_user('lector', password='clave-segura-123')
+        self.libro = Libro.objects.create(titulo='Rayuela', isbn='9780000000001', cantidad_disponible=1)
+
+    def test_solicitar_descuenta_stock(self):
+        solicitar_prestamo(self.libro.pk, self.usuario)
+        self.libro.refresh_from_db()
+        self.assertEqual(self.libro.cantidad_disponible, 0)
+
+    def test_sin_stock_no_crea_prestamo(self):
+        solicitar_prestamo(self.libro.pk, self.usuario)
+        otro = User.objects.create_user('otro', password='clave-segura-123')
+        with self.assertRaises(LibroNoDisponible):
+            solicitar_prestamo(self.libro.pk, otro)
+        self.assertEqual(Prestamo.objects.count(), 1)
+
+    def test_prestamo_activo_duplicado_revierte_stock(self):
+        self.libro.cantidad_disponible = 2
+        self.libro.save()
+        solicitar_prestamo(self.libro.pk, self.usuario)
+        with self.assertRaises(PrestamoDuplicado):
+            solicitar_prestamo(self.libro.pk, self.usuario)
+        self.libro.refresh_from_db()
+        self.assertEqual(self.libro.cantidad_disponible, 1)
+
+    def test_devolver_una_sola_vez(self):
+        prestamo = solicitar_prestamo(self.libro.pk, self.usuario)
+        devolver_prestamo(prestamo)
+        with self.assertRaises(PrestamoYaDevuelto):
+            devolver_prestamo(prestamo)
+        self.libro.refresh_from_db()
+        self.assertEqual(self.libro.cantidad_disponible, 1)
+
+    def test_contadores_del_libro(self):
+        prestamo = solicitar_prestamo(self.libro.pk, self.usuario)
+        self.libro.refresh_from_db()
+        self.assertEqual(
+            (self.libro.total_ejemplares, self.libro.prestamos_activos, self.libro.prestamos_totales), (1, 1, 1)
+        )
+        self.assertIsNotNone(self.libro.ultimo_prestamo)
+        devolver_prestamo(prestamo)
+        self.libro.refresh_from_db()
+        self.assertEqual(
+            (self.libro.total_ejemplares, self.libro.prestamos_activos, self.libro.prestamos_totales), (1, 0, 1)
+        )
+
+
+class ConcurrenciaPrestamosTests(TransactionTestCase):
+    """Muchos hilos pidiendo el mismo título nunca dejan el stock en negativo."""
+
+    HILOS = 16
+    STOCK = 5
+
+    def test_stock_nunca_negativo(self):
+        libro = Libro.objects.create(titulo='Ficciones', isbn='9780000000002', cantidad_disponible=self.STOCK)
+        usuarios = [User(username=f'lector{i}') for i in range(self.HILOS)]
+        User.objects.bulk_create(usuarios)
+        usuarios = list(User.objects.filter(username__startswith='lector'))
+        barrera = threading.Barrier(len(usuarios))
+        errores = []
+
+        def pedir(usuario):
+            barrera.wait()
+            try:
+                solicitar_prestamo(libro.pk, usuario)
+            except LibroNoDisponible:
+                pass
+            except Exception as e:  # Cualquier otro error invalida la prueba
+                errores.append(e)
+            finally:
+                connection.close()
+
+        hilos = [threading.Thread(target=pedir, args=(usuario,)) for usuario in usuarios]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+
+        libro.refresh_from_db()
+        self.assertEqual(errores, [])
+        self.assertGreaterEqual(libro.cantidad_disponible, 0)
+        self.assertEqual(Prestamo.objects.filter(libro=libro).count(), self.STOCK - libro.cantidad_disponible)
+
+    def test_transaccion_escritura_inmediata(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('Solo aplica a SQLite')
+        with CaptureQueriesContext(connection) as consultas:
+            with transaccion_escritura():
+                Categoria.objects.create(nombre='Poesía')
+            with transaction.atomic():
+                Categoria.objects.create(nombre='Teatro')
+        inicios = [c['sql'] for c in consultas.captured_queries if c['sql'].startswith('BEGIN')]
+        # Solo la transacción de escritura cambia de modo
+        self.assertEqual(inicios, ['BEGIN IMMEDIATE', 'BEGIN'])
+
+    def test_escrituras_concurrentes_sin_bloqueos(self):
+        """Préstamos y devoluciones simultáneos esperan su turno en vez de fallar con "database is locked"."""
+        libros = [
+            Libro.objects.create(titulo=f'Libro {i}', isbn=f'97800000001{i:02d}', cantidad_disponible=self.HILOS)
+            for i in range(4)
+        ]
+        User.objects.bulk_create([User(username=f'lector{i}') for i in range(self.HILOS)])
+        usuarios = list(User.objects.filter(username__startswith='lector'))
+        barrera = threading.Barrier(len(usuarios))
+        errores = []
+
+        def ciclo(usuario):
+            barrera.wait()
+            try:
+                for libro in libros:
+                    prestamo = solicitar_prestamo(libro.pk, usuario)
+                    devolver_prestamo(prestamo)
+                    # Lee y luego escribe en la misma transacción
+                    with transaccion_escritura():
+                        disponible = Libro.objects.get(pk=libro.pk).cantidad_disponible
+                        Libro.objects.filter(pk=libro.pk).update(cantidad_disponible=disponible)
+            except Exception as e:
+                errores.append(e)
+            finally:
+                connection.close()
+
+        hilos = [threading.Thread(target=ciclo, args=(usuario,)) for usuario in usuarios]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+
+        self.assertEqual(errores, [])
+        self.assertEqual(Prestamo.objects.count(), self.HILOS * len(libros))
+        for libro in libros:
+            libro.refresh_from_db()
+            self.assertEqual(libro.cantidad_disponible, self.HILOS)
+
+
+class MigracionPrestamoUnicoTests(TransactionTestCase):
+    """La migración 0004 cierra los préstamos activos repetidos antes de crear la restricción."""
+
+    def migrar(self, destino):
+        from django.db.migrations.executor import MigrationExecutor
+        ejecutor = MigrationExecutor(connection)
+        ejecutor.loader.build_graph()
+        ejecutor.migrate([('biblioteca', destino)])
+        return ejecutor.loader.project_state([('biblioteca', destino)]).apps
+
+    def tearDown(self):
+        from django.db.migrations.executor import MigrationExecutor
+        ejecutor = MigrationExecutor(connection)
+        ejecutor.migrate(ejecutor.loader.graph.leaf_nodes())
+
+    def test_cierra_duplicados_y_devuelve_el_stock(self):
+        apps = self.migrar('0003_libro_titulo_id_idx')
+        Libro = apps.get_model('biblioteca', 'Libro')
+        Prestamo = apps.get_model('biblioteca', 'Prestamo')
+        usuario = apps.get_model('auth', 'User').objects.create(username='lector')
+        libro = Libro.objects.create(titulo='Rayuela', isbn='9780000000003', cantidad_disponible=2)
+        primero, *_ = [Prestamo.objects.create(libro=libro, usuario=usuario) for _ in range(3)]
+        Prestamo.objects.create(libro=libro, usuario=usuario, devuelto=True)
+
+        self.migrar('0004_prestamo_activo_unico')
+
+        self.assertEqual(list(Prestamo.objects.filter(devuelto=False).values_list('id', flat=True)), [primero.pk])
+        self.assertEqual(Libro.objects.get().cantidad_disponible, 4)
+
+
+class DevolucionEnLoteTests(TestCase):
+    """Devolución masiva con UPDATE agregados."""
+
+    def test_repone_stock_por_libro(self):
+        libros = [
+            Libro.objects.create(titulo=f'Libro {i}', isbn=f'978000000010{i}', cantidad_disponible=3)
+            for i in range(2)
+        ]
+        for i in range(3):
+            usuario = User.objects.create_user(f'lector{i}', password='clave-segura-123')
+            solicitar_prestamo(libros[0].pk, usuario)
+            if i < 2:
+                solicitar_prestamo(libros[1].pk, usuario)
+
+        # SAVEPOINT, lectura de los pendientes, UPDATE de préstamos, conteo de
+        # agotados, dos UPDATE de stock, dos UPDATE de contadores y RELEASE
+        with self.assertNumQueries(9):
+            devueltos = devolver_prestamos_en_lote(Prestamo.objects.all())
+
+        self.assertEqual(devueltos, 5)
+        self.assertFalse(Prestamo.objects.filter(devuelto=False).exists())
+        for libro in libros:
+            libro.refresh_from_db()
+            self.assertEqual(libro.cantidad_disponible, 3)
+        self.assertEqual(devolver_prestamos_en_lote(Prestamo.objects.all()), 0)
+
+    def test_no_confunde_devoluciones_del_mismo_instante(self):
+        libros = [
+            Libro.objects.create(titulo=f'Libro {i}', isbn=f'978000000012{i}', cantidad_disponible=1)
+            for i in range(2)
+        ]
+        usuario = User.objects.create_user('lector', password='clave-segura-123')
+        prestamos = [solicitar_prestamo(libro.pk, usuario) for libro in libros]
+        instante = timezone.now()
+        with mock.patch('biblioteca.prestamos.timezone.now', return_value=instante):
+            devolver_prestamo(prestamos[0])
+            # El préstamo ya devuelto en el mismo microsegundo no repone stock otra vez
+            self.assertEqual(devolver_prestamos_en_lote(Prestamo.objects.filter(pk=prestamos[1].pk)), 1)
+        for libro in libros:
+            libro.refresh_from_db()
+            self.assertEqual(libro.cantidad_disponible, 1)
+
+    def test_queryset_filtrado_por_activos(self):
+        usuario = User.objects.create_user('lector', password='clave-segura-123')
+        libro = Libro.objects.create(titulo='Libro', isbn='9780000000110', cantidad_disponible=1)
+        solicitar_prestamo(libro.pk, usuario)
+        devolver_prestamos_en_lote(Prestamo.objects.filter(devuelto=False, usuario=usuario))
+        libro.refresh_from_db()
+        self.assertEqual(libro.cantidad_disponible, 1)
+
+
+@override_settings(BIBLIOTECA_PERFILADO_CONSULTAS=True, BIBLIOTECA_PRESUPUESTO_ESTRICTO=True)
+class PresupuestoConsultasTests(TestCase):
+    """Las vistas principales respetan su presupuesto y no hacen N+1."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_user('lector', password='clave-segura-123')
+        categoria = Categoria.objects.create(nombre='Novela')
+        for i in range(10):
+            libro = Libro.objects.create(
+                titulo=f'Libro {i}', isbn=f'97800000002{i:02d}', categoria=categoria, cantidad_disponible=2
+            )
+            libro.autores.add(Autor.objects.create(nombre=f'Autor {i}'))
+            solicitar_prestamo(libro.pk, cls.usuario)
+        cls.libro = libro
+
+    def test_vistas_dentro_del_presupuesto(self):
+        self.client.force_login(self.usuario)
+        for url in (
+            reverse('biblioteca:index'),
+            reverse('biblioteca:lista_libros'),
+            reverse('biblioteca:detalle_libro', args=[self.libro.pk]),
+            reverse('biblioteca:mis_prestamos'),
+        ):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertIn('db;dur=', response['Server-Timing'])
+
+    def test_mis_prestamos_con_archivo_y_cache_fria(self):
+        from . import historial
+        devueltos = [devolver_prestamo(prestamo) for prestamo in Prestamo.objects.order_by('id')[:4]]
+        Prestamo.objects.filter(pk__in=[prestamo.pk for prestamo in devueltos[:2]]).update(
+            fecha_devolucion=timezone.now() - timedelta(days=400)
+        )
+        list(historial.archivar())
+        self.assertEqual(PrestamoArchivado.objects.count(), 2)
+        self.client.force_login(self.usuario)
+        cache.clear()
+
+        # Sesión, usuario, historial (dos niveles y un solo conteo), activos y sus autores
+        with self.assertNumQueries(7):
+            response = self.client.get(reverse('biblioteca:mis_prestamos'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['historial'].count, 4)
+
+    def test_detecta_n_mas_1(self):
+        with self.assertRaises(PresupuestoConsultasExcedido):
+            with presupuesto():
+                for libro in Libro.objects.all():
+                    list(libro.autores.all())
+
+
+class EstadisticasTests(TestCase):
+    """Los contadores siguen a los cambios del catálogo sin desviarse."""
+
+    def test_contadores_sin_desviacion(self):
+        usuario = User.objects.create_user('lector', password='clave-segura-123')
+        categoria = Categoria.objects.create(nombre='Ensayo')
+        autor = Autor.objects.create(nombre='Autora')
+        libros = [
+            Libro.objects.create(titulo=f'Libro {i}', isbn=f'978000000030{i}', categoria=categoria, cantidad_disponible=1)
+            for i in range(3)
+        ]
+        libros[0].autores.add(autor)
+        prestamo = solicitar_prestamo(libros[0].pk, usuario)
+        solicitar_prestamo(libros[1].pk, usuario)
+        devolver_prestamo(prestamo)
+        devolver_prestamos_en_lote(Prestamo.objects.filter(libro=libros[1]))
+        solicitar_prestamo(libros[2].pk, usuario)
+        libros[0].cantidad_disponible = 0
+        libros[0].save()
+        libros[1].delete()
+        Autor.objects.create(nombre='Otro').delete()
+
+        self.assertEqual(estadisticas.recalcular(), {})
+        self.assertEqual(estadisticas.recalcular_libros(), (0, []))
+        self.assertEqual(estadisticas.obtener()['libros_agotados'], 2)
+        self.assertEqual(estadisticas.obtener()['prestamos_activos'], 1)
+
+    def test_corrige_contadores_de_libro(self):
+        usuario = User.objects.create_user('lector', password='clave-segura-123')
+        libro = Libro.objects.create(titulo='Libro', isbn='9780000000310', cantidad_disponible=2)
+        solicitar_prestamo(libro.pk, usuario)
+        Libro.objects.filter(pk=libro.pk).update(prestamos_activos=0, prestamos_totales=7, ultimo_prestamo=None)
+
+        desviados, ejemplos = estadisticas.recalcular_libros(corregir=False)
+        self.assertEqual(desviados, 1)
+        self.assertEqual((ejemplos[0]['prestamos_totales'], ejemplos[0]['prestamos_totales_real']), (7, 1))
+
+        estadisticas.recalcular_libros()
+        libro.refresh_from_db()
+        self.assertEqual((libro.total_ejemplares, libro.prestamos_activos, libro.prestamos_totales), (2, 1, 1))
+        self.assertIsNotNone(libro.ultimo_prestamo)
+        self.assertEqual(estadisticas.recalcular_libros(), (0, []))
+
+    def test_listado_por_popularidad(self):
+        usuarios = [User.objects.create_user(f'lector{i}', password='clave-segura-123') for i in range(2)]
+        libros = [
+            Libro.objects.create(titulo=titulo, isbn=f'978000000032{i}', cantidad_disponible=2)
+            for i, titulo in enumerate(['Aleph', 'Boquitas pintadas', 'Cien años de soledad'])
+        ]
+        for usuario in usuarios:
+            solicitar_prestamo(libros[2].pk, usuario)
+        solicitar_prestamo(libros[1].pk, usuarios[0])
+
+        response = self.client.get(reverse('biblioteca:lista_libros'), {'orden': 'populares'})
+        self.assertEqual([libro.titulo for libro in response.context['libros']],
+                         ['Cien años de soledad', 'Boquitas pintadas', 'Aleph'])
+
+
+class IndiceBusquedaTests(TestCase):
+    """El índice de texto completo sigue a los libros, los autores y su relación."""
+
+    def setUp(self):
+        from . import busqueda
+        if not busqueda.soportado():
+            self.skipTest('El motor no tiene índice de texto completo')
+        self.busqueda = busqueda
+        self.autor = Autor.objects.create(nombre='Gabriela Mistral')
+        self.libro = Libro.objects.create(titulo='Desolación', isbn='9780000000420', cantidad_disponible=1)
+        self.libro.autores.add(self.autor)
+        self.otro = Libro.objects.create(titulo='Ternura', isbn='9780000000421', cantidad_disponible=1)
+        self.otro.autores.add(self.autor)
+
+    def _encontrados(self, texto):
+        return set(self.busqueda.filtrar(Libro.objects.all(), texto).values_list('titulo', flat=True))
+
+    def test_guardar_renombrar_y_eliminar_libro(self):
+        self.assertEqual(self._encontrados('desolación'), {'Desolación'})
+        self.libro.titulo = 'Lagar'
+        self.libro.save()
+        self.assertEqual(self._encontrados('desolación'), set())
+        self.assertEqual(self._encontrados('lagar'), {'Lagar'})
+        self.libro.delete()
+        self.assertEqual(self._encontrados('lagar'), set())
+        self.assertEqual(self._encontrados('mistral'), {'Ternura'})
+
+    def test_renombrar_y_eliminar_autor(self):
+        self.autor.nombre = 'Lucila Godoy'
+        self.autor.save()
+        self.assertEqual(self._encontrados('mistral'), set())
+        self.assertEqual(self._encontrados('godoy'), {'Desolación', 'Ternura'})
+        self.autor.delete()
+        self.assertEqual(self._encontrados('godoy'), set())
+        self.assertEqual(self._encontrados('ternura'), {'Ternura'})
+
+    def test_cambios_de_autores_reindexan(self):
+        neruda = Autor.objects.create(nombre='Pablo Neruda')
+        self.libro.autores.add(neruda)
+        self.assertEqual(self._encontrados('neruda'), {'Desolación'})
+        self.libro.autores.remove(neruda)
+        self.assertEqual(self._encontrados('neruda'), set())
+        # Desde el lado del autor (relación inversa)
+        neruda.libros.add(self.otro)
+        self.assertEqual(self._encontrados('neruda'), {'Ternura'})
+        self.autor.libros.remove(self.libro)
+        self.assertEqual(self._encontrados('mistral'), {'Ternura'})
+        self.autor.libros.clear()
+        self.assertEqual(self._encontrados('mistral'), set())
+        self.otro.autores.clear()
+        self.assertEqual(self._encontrados('neruda'), set())
+
+    def test_reconstruir_indice_vacio(self):
+        from io import StringIO
+        from django.core.management import call_command
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.busqueda.TABLA_INDICE}')
+        self.assertEqual(self._encontrados('mistral'), set())
+
+        salida = StringIO()
+        call_command('reconstruir_indice_busqueda', stdout=salida)
+        self.assertIn('Libros indexados: 2', salida.getvalue())
+        self.assertEqual(self._encontrados('mistral'), {'Desolación', 'Ternura'})
+        self.assertEqual(self._encontrados('9780000000421'), {'Ternura'})
+
+
+class CacheCatalogoTests(TestCase):
+    """Las páginas cacheadas para anónimos reflejan los cambios al momento."""
+
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.libro = Libro.objects.create(titulo='Pedro Páramo', isbn='9780000000400', cantidad_disponible=1)
+        self.autor = Autor.objects.create(nombre='Juan Rulfo')
+        self.libro.autores.add(self.autor)
+        self.url = reverse('biblioteca:detalle_libro', args=[self.libro.pk])
+
+    def test_detalle_servido_desde_cache(self):
+        self.client.get(self.url)
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url)
+        self.assertContains(response, 'Juan Rulfo')
+
+    @override_settings(BIBLIOTECA_CACHE_TTL=0)
+    def test_ttl_configurable(self):
+        # El ajuste se lee al guardar: con 0 la página caduca al momento
+        self.client.get(self.url)
+        with CaptureQueriesContext(connection) as consultas:
+            self.client.get(self.url)
+        self.assertGreater(len(consultas), 1)
+
+    def test_cambio_de_stock_visible(self):
+        self.assertContains(self.client.get(self.url), 'Disponible (1 en stock)')
+        solicitar_prestamo(self.libro.pk, User.objects.create_user('lector', password='clave-segura-123'))
+        self.assertContains(self.client.get(self.url), 'No disponible')
+
+    def test_cambio_de_autor_visible(self):
+        self.client.get(self.url)
+        self.client.get(reverse('biblioteca:lista_libros'))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.autor.nombre = 'J. Rulfo'
+            self.autor.save()
+        self.assertContains(self.client.get(self.url), 'J. Rulfo')
+        self.assertContains(self.client.get(reverse('biblioteca:lista_libros')), 'J. Rulfo')
+
+
+class ListaLibrosCursorTests(TestCase):
+    """Paginación por cursor del catálogo: orden total, ida y vuelta y tokens manipulados."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_user('lector', password='clave-segura-123')
+        titulos = [f'Libro {i:02d}' for i in range(20)] + ['Igual'] * 6
+        Libro.objects.bulk_create([
+            Libro(titulo=titulo, isbn=f'97800000040{i:02d}', cantidad_disponible=1) for i, titulo in enumerate(titulos)
+        ])
+        cls.orden = list(Libro.objects.order_by('titulo', 'id').values_list('id', flat=True))
+
+    def setUp(self):
+        # Sin caché de anónimos: cada respuesta trae su contexto
+        self.client.force_login(self.usuario)
+
+    def pagina(self, **parametros):
+        return self.client.get(reverse('biblioteca:lista_libros'), parametros).context['libros']
+
+    @staticmethod
+    def token(datos):
+        return base64.urlsafe_b64encode(json.dumps(datos).encode()).decode().rstrip('=')
+
+    def test_recorrido_completo_sin_saltos_ni_repeticiones(self):
+        vistos, paginas = [], []
+        pagina = self.pagina()
+        while True:
+            paginas.append([libro.pk for libro in pagina])
+            vistos.extend(paginas[-1])
+            if not pagina.has_next():
+                break
+            pagina = self.pagina(cursor=pagina.cursor_siguiente)
+        # Los seis «Igual» se reparten entre páginas por id, sin perder ninguno
+        self.assertEqual(vistos, self.orden)
+        self.assertEqual(len(paginas), 3)
+
+        # Hacia atrás se recuperan las mismas páginas
+        for esperada in reversed(paginas[:-1]):
+            pagina = self.pagina(cursor=pagina.cursor_anterior)
+            self.assertEqual([libro.pk for libro in pagina], esperada)
+        self.assertFalse(pagina.has_previous())
+
+    def test_cursor_manipulado_vuelve_a_la_primera_pagina(self):
+        primera = [libro.pk for libro in self.pagina()]
+        for cursor in [
+            'no-es-un-cursor',
+            self.token({'v': None, 'i': 1, 'd': 's', 'n': 2}),
+            self.token({'v': {'x': 1}, 'i': 1, 'd': 's', 'n': 2}),
+            self.token({'v': 'Libro 05', 'i': 'uno', 'd': 's', 'n': 2}),
+        ]:
+            with self.subTest(cursor=cursor):
+                self.assertEqual([libro.pk for libro in self.pagina(cursor=cursor)], primera)
+
+    def test_valor_de_otro_tipo_en_orden_numerico(self):
+        cursor = self.token({'v': 'abc', 'i': 1, 'd': 's', 'n': 2})
+        response = self.client.get(reverse('biblioteca:lista_libros'), {'orden': 'populares', 'cursor': cursor})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['libros'].number, 1)
+
+    @override_settings(BIBLIOTECA_CONTEO_TTL=0)
+    def test_ttl_del_conteo_configurable(self):
+        from .paginacion import conteo_en_cache
+        self.assertEqual(conteo_en_cache(Libro.objects.all()), 26)
+        Libro.objects.create(titulo='Nuevo', isbn='9780000004100', cantidad_disponible=1)
+        # El ajuste se lee al contar, no al importar el módulo
+        self.assertEqual(conteo_en_cache(Libro.objects.all()), 27)
+
+
+class ApiTests(TestCase):
+    """API JSON: campos a medida, ETags y paginación por cursor."""
+
+    def setUp(self):
+        autor = Autor.objects.create(nombre='Julio Cortázar')
+        for i in range(3):
+            libro = Libro.objects.create(titulo=f'Cuento {i}', isbn=f'978000000050{i}', cantidad_disponible=1)
+            libro.autores.add(autor)
+
+    def test_campos_pedidos(self):
+        datos = self.client.get(reverse('biblioteca:api_libros'), {'fields': 'titulo,autores'}).json()
+        self.assertEqual(datos['total'], 3)
+        self.assertEqual(datos['resultados'][0], {'titulo': 'Cuento 0', 'autores': [
+            {'id': Autor.objects.get().pk, 'nombre': 'Julio Cortázar'}
+        ]})
+
+    def test_busqueda_solo_con_signos(self):
+        for texto in ('---', '!!'):
+            with self.subTest(q=texto):
+                response = self.client.get(reverse('biblioteca:api_libros'), {'q': texto})
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual((response.json()['total'], response.json()['resultados']), (0, []))
+
+    def test_busqueda_ordenada_por_titulo(self):
+        # Por relevancia «Borges esencial» iría primero (coincide en el título)
+        Libro.objects.create(titulo='Borges esencial', isbn='9780000000510', cantidad_disponible=1)
+        Libro.objects.create(
+            titulo='Antología', isbn='9780000000511', cantidad_disponible=1, descripcion='Prólogo de Borges',
+        )
+        url = reverse('biblioteca:api_libros')
+        primera = self.client.get(url, {'q': 'borges', 'limite': 1, 'fields': 'titulo'}).json()
+        segunda = self.client.get(primera['siguiente']).json()
+        self.assertEqual(primera['total'], 2)
+        self.assertEqual(
+            primera['resultados'] + segunda['resultados'], [{'titulo': 'Antología'}, {'titulo': 'Borges esencial'}]
+        )
+        self.assertIsNone(segunda['siguiente'])
+
+    def test_campo_desconocido(self):
+        response = self.client.get(reverse('biblioteca:api_libros'), {'fields': 'titulo,precio'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_cursor(self):
+        url = reverse('biblioteca:api_libros')
+        primera = self.client.get(url, {'limite': 2, 'fields': 'titulo'}).json()
+        self.assertEqual([l['titulo'] for l in primera['resultados']], ['Cuento 0', 'Cuento 1'])
+        segunda = self.client.get(primera['siguiente']).json()
+        self.assertEqual([l['titulo'] for l in segunda['resultados']], ['Cuento 2'])
+        self.assertIsNone(segunda['siguiente'])
+
+    def test_etag_detalle(self):
+        libro = Libro.objects.first()
+        url = reverse('biblioteca:api_libro', args=[libro.pk])
+        etag = self.client.get(url)['ETag']
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        libro.cantidad_disponible = 0
+        libro.save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_prestamos_requiere_autenticacion(self):
+        self.assertEqual(self.client.get(reverse('biblioteca:api_prestamos')).status_code, 401)
+
+    def test_prestamos_incluye_el_archivo(self):
+        from . import historial
+        usuario = User.objects.create_user('lector', password='clave-segura-123')
+        prestamos = [solicitar_prestamo(libro.pk, usuario) for libro in Libro.objects.order_by('id')]
+        for prestamo in prestamos[:2]:
+            devolver_prestamo(prestamo)
+        Prestamo.objects.filter(pk=prestamos[0].pk).update(fecha_devolucion=timezone.now() - timedelta(days=400))
+        self.assertEqual(list(historial.archivar()), [(1, 1)])
+        self.client.force_login(usuario)
+
+        url = reverse('biblioteca:api_prestamos')
+        primera = self.client.get(url, {'limite': 2, 'fields': 'id,libro_titulo,devuelto'}).json()
+        segunda = self.client.get(primera['siguiente']).json()
+        self.assertEqual(primera['total'], 3)
+        self.assertEqual(primera['resultados'] + segunda['resultados'], [
+            {'id': prestamos[2].pk, 'libro_titulo': 'Cuento 2', 'devuelto': False},
+            {'id': prestamos[1].pk, 'libro_titulo': 'Cuento 1', 'devuelto': True},
+            {'id': prestamos[0].pk, 'libro_titulo': 'Cuento 0', 'devuelto': True},
+        ])
+
+
+class ExportacionTests(TestCase):
+    """Exportación en streaming del catálogo y de los préstamos."""
+
+    def setUp(self):
+        self.admin = User.objects.create_user('bibliotecaria', password='clave-segura-123', is_staff=True)
+        self.client.force_login(self.admin)
+        autor = Autor.objects.create(nombre='Isabel Allende')
+        for i in range(5):
+            libro = Libro.objects.create(titulo=f'Novela {i}', isbn=f'978000000060{i}', cantidad_disponible=2)
+            libro.autores.add(autor)
+        solicitar_prestamo(Libro.objects.first().pk, self.admin)
+
+    def _contenido(self, response):
+        return b''.join(response.streaming_content)
+
+    def test_csv_con_autores(self):
+        response = self.client.get(reverse('biblioteca:exportar_libros'))
+        lineas = self._contenido(response).decode().splitlines()
+        self.assertEqual(len(lineas), 6)
+        self.assertIn('Isabel Allende', lineas[1])
+
+    def test_prefetch_por_bloque(self):
+        from . import exportacion
+        # Una lectura de libros con cursor y, por cada bloque de 2, autores y etiquetas.
+        with self.assertNumQueries(7):
+            filas = list(exportacion.filas_libros(tamano_bloque=2))
+        self.assertEqual(len(filas), 5)
+
+    def test_jsonl_gzip_y_estado(self):
+        import gzip
+        import json
+        response = self.client.get(
+            reverse('biblioteca:exportar_prestamos'), {'formato': 'jsonl', 'gzip': '1', 'estado': 'activos'}
+        )
+        filas = [json.loads(linea) for linea in gzip.decompress(self._contenido(response)).splitlines()]
+        self.assertEqual(len(filas), 1)
+        self.assertFalse(filas[0]['devuelto'])
+
+    def test_fecha_invalida(self):
+        response = self.client.get(reverse('biblioteca:exportar_libros'), {'desde': '31/12/2024'})
+        self.assertEqual(response.status_code, 400)
+
+
+class ImportacionTests(TestCase):
+    """Carga del catálogo desde CSV con cargar_libros."""
+
+    CABECERA = 'CÓDIGO,TÍTULO,AUTOR,TIPO,STOCK\n'
+
+    def setUp(self):
+        self.directorio = self.enterContext(tempfile.TemporaryDirectory())
+
+    def _csv(self, nombre, *filas):
+        ruta = os.path.join(self.directorio, nombre)
+        with open(ruta, 'w', encoding='utf-8') as archivo:
+            archivo.write(self.CABECERA + ''.join(f'{fila}\n' for fila in filas))
+        return ruta
+
+    def _cargar(self, ruta, **opciones):
+        from io import StringIO
+        from django.core.management import call_command
+        salida = StringIO()
+        call_command('cargar_libros', ruta, stdout=salida, **opciones)
+        return salida.getvalue()
+
+    def _encontrados(self, texto):
+        from . import busqueda
+        return set(busqueda.filtrar(Libro.objects.all(), texto).values_list('isbn', flat=True))
+
+    def test_carga_un_archivo(self):
+        ruta = self._csv(
+            'catalogo.csv',
+            '978-0-00-000080-0,Rayuela,Julio Cortázar,Novela,2',
+            '9780000000817,Ficciones,Jorge Luis Borges; Adolfo Bioy Casares,Cuento,0',
+            ',Sin código,Anónimo,Novela,1',
+        )
+        salida = self._cargar(ruta, batch_size=1)
+
+        self.assertIn('Libros creados: 2', salida)
+        self.assertIn('Errores: 1', salida)
+        ficciones = Libro.objects.get(isbn='9780000000817')
+        self.assertEqual(ficciones.categoria.nombre, 'Cuento')
+        self.assertEqual(set(ficciones.autores.values_list('nombre', flat=True)),
+                         {'Jorge Luis Borges', 'Adolfo Bioy Casares'})
+        self.assertEqual(self._encontrados('bioy'), {'9780000000817'})
+        self.assertEqual(self._encontrados('9780000000800'), {'9780000000800'})
+        self.assertEqual(estadisticas.obtener()['libros_agotados'], 1)
+        self.assertEqual(estadisticas.recalcular(), {})
+
+    def test_recarga_actualiza_por_isbn(self):
+        usuario = User.objects.create_user('lector', password='clave-segura-123')
+        ruta = self._csv('catalogo.csv', '9780000000800,Rayuela,Julio Cortázar,Novela,2')
+        self._cargar(ruta)
+        solicitar_prestamo(Libro.objects.get().pk, usuario)
+
+        self._csv('catalogo.csv', '9780000000800,Rayuela (edición crítica),Julia Ortega,Novela,0')
+        salida = self._cargar(ruta)
+
+        self.assertIn('Libros creados: 0', salida)
+        self.assertIn('Libros actualizados: 1', salida)
+        libro = Libro.objects.get()
+        self.assertEqual(libro.titulo, 'Rayuela (edición crítica)')
+        self.assertEqual((libro.cantidad_disponible, libro.total_ejemplares, libro.prestamos_activos), (0, 1, 1))
+        # Los autores del CSV sustituyen a los anteriores, también en el índice
+        self.assertEqual(list(libro.autores.values_list('nombre', flat=True)), ['Julia Ortega'])
+        self.assertEqual(self._encontrados('ortega'), {libro.isbn})
+        self.assertEqual(self._encontrados('cortázar'), set())
+        self.assertEqual(self._encontrados('crítica'), {libro.isbn})
+        self.assertEqual(estadisticas.obtener()['libros'], 1)
+        self.assertEqual(estadisticas.obtener()['libros_agotados'], 1)
+        self.assertEqual(estadisticas.recalcular(), {})
+
+    def test_varios_archivos_en_paralelo_en_orden(self):
+        # El mismo ISBN en los dos archivos: gana el último en orden alfabético
+        self._csv('a.csv', '978-0-00-000080-0,Rayuela,Julio Cortázar,Novela,1', '9780000000817,Ficciones,Borges,Cuento,2')
+        self._csv('b.csv', '9780000000800,Rayuela (2.ª ed.),Julio Cortázar,Novela,3')
+        salida = self._cargar(self.directorio, workers=2)
+
+        self.assertIn('Libros creados: 2', salida)
+        self.assertIn('Libros actualizados: 1', salida)
+        self.assertIn('Archivos: 2', salida)
+        libro = Libro.objects.get(isbn='9780000000800')
+        self.assertEqual((libro.titulo, libro.cantidad_disponible), ('Rayuela (2.ª ed.)', 3))
+        self.assertEqual(Autor.objects.filter(nombre='Julio Cortázar').count(), 1)
+
+    @override_settings(BIBLIOTECA_MAPEO_CATEGORIAS={'cuento': 'Cuentos'})
+    def test_mapeo_de_categorias_configurable(self):
+        self._cargar(self._csv('catalogo.csv', '9780000000817,Ficciones,Borges,  CUENTO ,2'))
+        self.assertEqual(Libro.objects.get().categoria.nombre, 'Cuentos')
+
+
+class PlanesConsultaTests(TestCase):
+    """
+    Las consultas más frecuentes deben resolverse con un índice.
+
+    Con pocas filas PostgreSQL prefiere recorrer la tabla, así que se
+    desactivan los recorridos secuenciales: si aun así aparece uno es que
+    ningún índice sirve para la consulta.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_user('lector', password='clave-segura-123')
+        cls.categoria = Categoria.objects.create(nombre='Poesía')
+
+    def setUp(self):
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('SET enable_seqscan = off')
+
+    def assertUsaIndice(self, queryset, indice=None, sin_ordenar=True):
+        plan = queryset.explain()
+        tabla = queryset.model._meta.db_table
+        if connection.vendor == 'sqlite':
+            self.assertNotRegex(plan, rf'SCAN {tabla}(?! USING)', plan)
+            if sin_ordenar:
+                self.assertNotIn('TEMP B-TREE', plan)
+        elif connection.vendor == 'postgresql':
+            self.assertNotIn(f'Seq Scan on {tabla}', plan)
+            if sin_ordenar:
+                self.assertNotRegex(plan, r'(?m)^\s*(->\s*)?Sort', plan)
+        if indice and connection.vendor in ('sqlite', 'postgresql'):
+            self.assertIn(indice, plan)
+
+    def test_prestamos_activos_del_usuario(self):
+        self.assertUsaIndice(Prestamo.objects.filter(usuario=self.usuario, devuelto=False))
+
+    def test_historial_del_usuario(self):
+        self.assertUsaIndice(
+            Prestamo.objects.filter(usuario=self.usuario).order_by('-fecha_prestamo')[:20],
+            'prestamo_usuario_fecha_idx',
+        )
+
+    def test_libros_disponibles_por_titulo(self):
+        self.assertUsaIndice(
+            Libro.objects.filter(cantidad_disponible__gt=0).order_by('titulo', 'id')[:12],
+            'libro_disponible_titulo_idx',
+        )
+
+    def test_libros_de_categoria_por_titulo(self):
+        self.assertUsaIndice(
+            Libro.objects.filter(categoria=self.categoria).order_by('titulo', 'id')[:12],
+            'libro_categoria_titulo_idx',
+        )
+
+    def test_libros_recientes(self):
+        self.assertUsaIndice(Libro.objects.order_by('-fecha_agregado')[:6], 'libro_agregado_idx')
+
+    def test_listado_por_titulo(self):
+        self.assertUsaIndice(Libro.objects.order_by('titulo', 'id')[:12], 'libro_titulo_id_idx')
+
+    def test_listado_por_popularidad(self):
+        self.assertUsaIndice(Libro.objects.order_by('-prestamos_totales', '-id')[:12], 'libro_populares_idx')
+
+    def test_vencidos_sin_aviso(self):
+        self.assertUsaIndice(
+            vencimientos.vencidos().order_by('fecha_vencimiento', 'id')[:500], 'prestamo_vencido_pendiente_idx'
+        )
+
+
+@override_settings(
+    ROOT_URLCONF='biblioteca_config.urls_async',
+    BIBLIOTECA_PERFILADO_CONSULTAS=True,
+    BIBLIOTECA_PRESUPUESTO_ESTRICTO=True,
+)
+class VistasAsyncTests(TestCase):
+    """Las vistas asíncronas del catálogo devuelven lo mismo que las síncronas."""
+
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.usuario = User.objects.create_user('lector', password='clave-segura-123')
+        self.libro = Libro.objects.create(titulo='Ficciones', isbn='9780000000700', cantidad_disponible=2)
+        self.libro.autores.add(Autor.objects.create(nombre='Jorge Luis Borges'))
+        estadisticas.recalcular()
+
+    async def test_portada_y_catalogo(self):
+        response = await self.async_client.get(reverse('biblioteca:index'))
+        self.assertContains(response, 'Ficciones')
+        response = await self.async_client.get(reverse('biblioteca:lista_libros'), {'q': 'ficciones'})
+        self.assertContains(response, 'Jorge Luis Borges')
+        response = await self.async_client.get(reverse('biblioteca:detalle_libro', args=[self.libro.pk]))
+        self.assertContains(response, 'Disponible (2 en stock)')
+
+    async def test_mis_prestamos(self):
+        from asgiref.sync import sync_to_async
+        await sync_to_async(solicitar_prestamo)(self.libro.pk, self.usuario)
+        await self.async_client.aforce_login(self.usuario)
+        response = await self.async_client.get(reverse('biblioteca:mis_prestamos'))
+        self.assertContains(response, 'Ficciones')
+
+    async def test_mis_prestamos_requiere_login(self):
+        response = await self.async_client.get(reverse('biblioteca:mis_prestamos'))
+        self.assertEqual(response.status_code, 302)
+
+
+class AutocompletadoTests(TestCase):
+    """Sugerencias por prefijo desde el índice en memoria."""
+
+    def setUp(self):
+        from . import autocompletado
+        self.autocompletado = autocompletado
+        autocompletado.invalidar()
+        self.addCleanup(autocompletado.invalidar)
+        self.libro = Libro.objects.create(titulo='Cien años de soledad', isbn='9780307474728')
+        Autor.objects.create(nombre='Gabriel García Márquez')
+
+    def textos(self, consulta):
+        return [sugerencia['texto'] for sugerencia in self.autocompletado.sugerir(consulta)]
+
+    def test_sin_acentos_ni_mayusculas(self):
+        self.assertEqual(self.textos('GARCIA'), ['Gabriel García Márquez'])
+        self.assertEqual(self.textos('anos de'), ['Cien años de soledad'])
+
+    def test_principio_antes_que_palabra(self):
+        Libro.objects.create(titulo='Soledades', isbn='9780000000801')
+        self.assertEqual(self.textos('soled'), ['Soledades', 'Cien años de soledad'])
+
+    def test_isbn(self):
+        self.assertEqual(self.textos('978-0307'), ['Cien años de soledad'])
+
+    def test_actualizacion_incremental(self):
+        self.autocompletado.sugerir('x')  # construye el índice
+        with self.captureOnCommitCallbacks(execute=True):
+            self.libro.titulo = 'El amor en los tiempos del cólera'
+            self.libro.save()
+        self.assertEqual(self.textos('cien'), [])
+        self.assertEqual(self.textos('colera'), ['El amor en los tiempos del cólera'])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.libro.delete()
+        self.assertEqual(self.textos('amor'), [])
+
+    @override_settings(BIBLIOTECA_AUTOCOMPLETADO_TTL=60)
+    def test_caducado_se_renueva_en_segundo_plano(self):
+        anterior = self.autocompletado.obtener_indice()
+        anterior.creado -= 61
+        siguiente = self.autocompletado.IndicePrefijos()
+        siguiente.agregar('libro', self.libro.pk, 'Crónica de una muerte anunciada')
+        puede_terminar = threading.Event()
+
+        def construir():
+            puede_terminar.wait(5)
+            return siguiente
+
+        with mock.patch.object(self.autocompletado, 'construir', side_effect=construir) as construir_mock:
+            # Mientras se construye se sigue sirviendo el índice caducado, sin esperar
+            self.assertIs(self.autocompletado.obtener_indice(), anterior)
+            self.assertEqual(self.textos('cien'), ['Cien años de soledad'])
+            puede_terminar.set()
+            with self.autocompletado._cerrojo_construccion:
+                pass
+        self.assertEqual(construir_mock.call_count, 1)
+        self.assertIs(self.autocompletado.obtener_indice(), siguiente)
+        self.assertEqual(self.textos('cronica'), ['Crónica de una muerte anunciada'])
+
+    @override_settings(BIBLIOTECA_AUTOCOMPLETADO_TTL=60)
+    def test_cambios_durante_la_renovacion(self):
+        anterior = self.autocompletado.obtener_indice()
+        anterior.creado -= 61
+        leido = threading.Event()
+        puede_terminar = threading.Event()
+
+        def construir():
+            # Lo que leyó de la base antes de los cambios
+            siguiente = self.autocompletado.IndicePrefijos()
+            siguiente.agregar('libro', self.libro.pk, self.libro.titulo)
+            leido.set()
+            puede_terminar.wait(5)
+            return siguiente
+
+        with mock.patch.object(self.autocompletado, 'construir', side_effect=construir):
+            self.autocompletado.obtener_indice()
+            leido.wait(5)
+            with self.captureOnCommitCallbacks(execute=True):
+                self.libro.titulo = 'El amor en los tiempos del cólera'
+                self.libro.save()
+                Autor.objects.create(nombre='Juan Rulfo')
+            puede_terminar.set()
+            with self.autocompletado._cerrojo_construccion:
+                pass
+        self.assertIsNot(self.autocompletado.obtener_indice(), anterior)
+        self.assertEqual(self.textos('cien'), [])
+        self.assertEqual(self.textos('colera'), ['El amor en los tiempos del cólera'])
+        self.assertEqual(self.textos('rulfo'), ['Juan Rulfo'])
+
+    def test_endpoint(self):
+        datos = self.client.get(reverse('biblioteca:api_sugerencias'), {'q': 'gab'}).json()
+        self.assertEqual(datos['sugerencias'][0]['tipo'], 'autor')
+
+
+class SelectorRemotoTests(TestCase):
+    """El formulario de libros no carga todos los autores ni etiquetas."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_user('editora', password='clave-segura-123', is_staff=True, is_superuser=True)
+        Autor.objects.bulk_create([Autor(nombre=f'Autor {i:03}') for i in range(100)])
+        cls.libro = Libro.objects.create(titulo='Antología', isbn='9780000000900')
+        cls.libro.autores.add(Autor.objects.get(nombre='Autor 042'))
+
+    def setUp(self):
+        self.client.force_login(self.usuario)
+
+    def test_solo_se_dibujan_los_elegidos(self):
+        response = self.client.get(reverse('biblioteca:editar_libro', args=[self.libro.pk]))
+        self.assertContains(response, 'Autor 042')
+        self.assertNotContains(response, 'Autor 041')
+
+    def test_validacion_con_una_consulta(self):
+        from .forms import LibroForm
+        ids = list(Autor.objects.values_list('pk', flat=True)[:3])
+        form = LibroForm(data={'titulo': 'Nuevo', 'isbn': '9780000000901', 'cantidad_disponible': 1,
+                               'idioma': 'Español', 'autores': ids})
+        with self.assertNumQueries(2):  # autores elegidos (IN) + unicidad del ISBN
+            self.assertTrue(form.is_valid(), form.errors)
+
+    def test_clave_no_numerica_muestra_el_error(self):
+        autor = Autor.objects.get(nombre='Autor 042')
+        response = self.client.post(reverse('biblioteca:crear_libro'), {
+            'titulo': 'Nuevo', 'isbn': '9780000000902', 'cantidad_disponible': 1,
+            'idioma': 'Español', 'autores': [autor.pk, 'abc'], 'etiquetas': ['xyz'],
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context['form'].errors)
+        self.assertContains(response, 'Autor 042')
+
+    def test_endpoint_paginado(self):
+        url = reverse('biblioteca:api_selector', args=['autores'])
+        datos = self.client.get(url, {'q': 'autor'}).json()
+        self.assertEqual(len(datos['resultados']), 20)
+        self.assertTrue(datos['mas'])
+        vistos = [resultado['texto'] for resultado in datos['resultados']]
+        while datos['mas']:
+            datos = self.client.get(url, {'q': 'autor', 'cursor': datos['siguiente']}).json()
+            vistos.extend(resultado['texto'] for resultado in datos['resultados'])
+        self.assertEqual(vistos, [f'Autor {i:03}' for i in range(100)])
+        self.assertIsNone(datos['siguiente'])
+
+    def test_endpoint_por_cursor_sin_offset(self):
+        url = reverse('biblioteca:api_selector', args=['autores'])
+        siguiente = self.client.get(url).json()['siguiente']
+        with CaptureQueriesContext(connection) as consultas:
+            datos = self.client.get(url, {'cursor': siguiente}).json()
+        self.assertEqual(datos['resultados'][0]['texto'], 'Autor 020')
+        self.assertNotIn('OFFSET', consultas.captured_queries[-1]['sql'])
+        # Un cursor manipulado vuelve a la primera página
+        datos = self.client.get(url, {'cursor': 'no-es-un-cursor'}).json()
+        self.assertEqual(datos['resultados'][0]['texto'], 'Autor 000')
+
+    def test_filtro_autor_en_admin(self):
+        autor = Autor.objects.get(nombre='Autor 042')
+        response = self.client.get(reverse('admin:biblioteca_libro_changelist'), {'autor': autor.pk})
+        self.assertContains(response, 'Antología')
+        self.assertNotContains(response, 'Autor 041')
+
+
+class LibroAdminTests(TestCase):
+    """El listado de libros del admin no crece en consultas con el número de filas."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_superuser('admin', password='clave-segura-123')
+        autores = Autor.objects.bulk_create([Autor(nombre=f'Escritora {i}') for i in range(10)])
+        for i in range(30):
+            libro = Libro.objects.create(titulo=f'Libro {i:02}', isbn=f'97800000010{i:02}')
+            libro.autores.add(autores[i % 10], autores[(i + 1) % 10])
+
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.client.force_login(self.usuario)
+
+    def test_autores_sin_n_mas_1(self):
+        url = reverse('admin:biblioteca_libro_changelist')
+        with presupuesto(12):
+            response = self.client.get(url)
+        self.assertContains(response, 'Escritora 0')
+        self.assertEqual(response.context['cl'].full_result_count, None)
+
+    def test_busqueda_por_autor(self):
+        response = self.client.get(reverse('admin:biblioteca_libro_changelist'), {'q': 'escritora 3'})
+        self.assertEqual(response.context['cl'].result_count, 6)
+
+    def test_busqueda_solo_con_signos(self):
+        for texto in ('---', '!!'):
+            with self.subTest(q=texto):
+                response = self.client.get(reverse('admin:biblioteca_libro_changelist'), {'q': texto})
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.context['cl'].result_count, 0)
+
+
+class VencimientosTests(TestCase):
+    """Los préstamos vencidos se avisan una sola vez, en lotes."""
+
+    def setUp(self):
+        self.usuario = User.objects.create_user('lector', password='clave-segura-123')
+        self.prestamos = []
+        for i in range(5):
+            libro = Libro.objects.create(titulo=f'Libro {i}', isbn=f'978000000070{i}', cantidad_disponible=1)
+            self.prestamos.append(solicitar_prestamo(libro.pk, self.usuario))
+
+    def test_vencimiento_por_defecto(self):
+        prestamo = self.prestamos[0]
+        plazo = prestamo.fecha_vencimiento - prestamo.fecha_prestamo
+        self.assertAlmostEqual(plazo.total_seconds(), vencimientos.dias_prestamo() * 86400, delta=5)
+
+    @override_settings(BIBLIOTECA_DIAS_PRESTAMO=7)
+    def test_plazo_configurable(self):
+        fecha = timezone.now()
+        self.assertEqual(vencimientos.calcular_vencimiento(fecha), fecha + timedelta(days=7))
+
+    def test_avisos_por_lotes_una_sola_vez(self):
+        from datetime import timedelta
+        from io import StringIO
+        from django.core.management import call_command
+        from django.utils import timezone
+        Prestamo.objects.update(fecha_vencimiento=timezone.now() - timedelta(days=1))
+        devolver_prestamo(self.prestamos[0])
+
+        lotes = list(vencimientos.procesar_vencidos(tamano=2))
+        self.assertEqual(lotes, [(1, 2), (2, 2)])
+        self.assertEqual(Aviso.objects.filter(tipo='vencimiento').count(), 4)
+        self.assertFalse(Aviso.objects.filter(prestamo=self.prestamos[0]).exists())
+        self.assertFalse(vencimientos.vencidos().exists())
+
+        salida = StringIO()
+        call_command('procesar_vencidos', stdout=salida)
+        self.assertIn('Avisos generados: 0', salida.getvalue())
+        self.assertEqual(Aviso.objects.count(), 4)
+
+    def test_devuelto_antes_del_bloqueo_no_se_avisa(self):
+        Prestamo.objects.update(fecha_vencimiento=timezone.now() - timedelta(days=1))
+        devuelto = self.prestamos[0]
+
+        def devolver_y_bloquear():
+            # El lector devuelve el libro entre la lectura del lote y el bloqueo
+            devolver_prestamo(devuelto)
+            return transaccion_escritura()
+
+        with mock.patch('biblioteca.vencimientos.transaccion_escritura', side_effect=devolver_y_bloquear):
+            creados, _ = vencimientos.procesar_lote(timezone.now())
+        self.assertEqual(creados, 4)
+        devuelto.refresh_from_db()
+        self.assertIsNone(devuelto.aviso_vencido)
+        self.assertFalse(Aviso.objects.filter(prestamo=devuelto).exists())
+
+
+class HistorialTests(TestCase):
+    """Archivado de préstamos devueltos e historial paginado sobre ambos niveles."""
+
+    def setUp(self):
+        from datetime import timedelta
+        from django.core.cache import cache
+        from django.utils import timezone
+        cache.clear()
+        self.usuario = User.objects.create_user('lector', password='clave-segura-123')
+        self.prestamos = []
+        for i in range(5):
+            libro = Libro.objects.create(titulo=f'Libro {i}', isbn=f'978000000080{i}', cantidad_disponible=1)
+            prestamo = solicitar_prestamo(libro.pk, self.usuario)
+            devolver_prestamo(prestamo)
+            self.prestamos.append(prestamo)
+        self.activo = solicitar_prestamo(Libro.objects.get(titulo='Libro 0').pk, self.usuario)
+        antiguos = [prestamo.pk for prestamo in self.prestamos[:3]]
+        Prestamo.objects.filter(pk__in=antiguos).update(fecha_devolucion=timezone.now() - timedelta(days=400))
+        Aviso.objects.create(tipo='vencimiento', usuario=self.usuario, prestamo=self.prestamos[0], mensaje='Vencido')
+
+    def test_archiva_por_lotes(self):
+        from . import historial
+        self.assertEqual(list(historial.archivar(tamano=2)), [(1, 2), (2, 1)])
+        self.assertEqual(
+            set(Prestamo.objects.values_list('id', flat=True)),
+            {self.prestamos[3].pk, self.prestamos[4].pk, self.activo.pk},
+        )
+        self.assertEqual(PrestamoArchivado.objects.count(), 3)
+        self.assertIsNone(Aviso.objects.get().prestamo)
+        # Los contadores de cada libro incluyen los préstamos archivados
+        self.assertEqual(estadisticas.recalcular_libros(), (0, []))
+        self.assertEqual(list(historial.archivar()), [])
+
+    def test_antiguedad_configurable(self):
+        from . import historial
+        with override_settings(BIBLIOTECA_DIAS_ARCHIVO=500):
+            self.assertEqual(list(historial.archivar()), [])
+        with override_settings(BIBLIOTECA_DIAS_ARCHIVO=300):
+            self.assertEqual(list(historial.archivar()), [(1, 3)])
+
+    def test_historial_paginado_sobre_ambas_tablas(self):
+        from . import historial
+        list(historial.archivar())
+        esperados = [prestamo.pk for prestamo in reversed(self.prestamos)]
+
+        vistos = []
+        pagina = historial.pagina_historial(self.usuario, por_pagina=2)
+        while True:
+            vistos.extend(prestamo.pk for prestamo in pagina)
+            if not pagina.has_next():
+                break
+            pagina = historial.pagina_historial(self.usuario, pagina.cursor_siguiente, por_pagina=2)
+        self.assertEqual(vistos, esperados)
+        self.assertEqual(pagina.count, 5)
+
+        anterior = historial.pagina_historial(self.usuario, pagina.cursor_anterior, por_pagina=2)
+        self.assertEqual([prestamo.pk for prestamo in anterior], esperados[2:4])
+
+    def test_mis_prestamos_y_exportacion(self):
+        from . import exportacion, historial
+        list(historial.archivar())
+        self.client.force_login(self.usuario)
+        response = self.client.get(reverse('biblioteca:mis_prestamos'))
+        self.assertEqual([prestamo.pk for prestamo in response.context['prestamos']], [self.activo.pk])
+        self.assertEqual(len(response.context['historial']), 5)
+
+        filas = list(exportacion.filas_prestamos(estado='devueltos'))
+        self.assertEqual(len(filas), 5)
+        self.assertTrue(all(fila['devuelto'] is True for fila in filas))
+
+
+class ConfiguracionBdTests(TestCase):
+    """El perfil de base de datos de settings.py se aplica a cada conexión."""
+
+    def test_sqlite_en_wal(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('Solo aplica a SQLite')
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            self.assertEqual(cursor.fetchone()[0], 'wal')
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)  # NORMAL
+            cursor.execute('PRAGMA mmap_size')
+            self.assertEqual(cursor.fetchone()[0], settings.BIBLIOTECA_SQLITE_PRAGMAS['mmap_size'])
+            cursor.execute('PRAGMA cache_size')
+            self.assertEqual(cursor.fetchone()[0], settings.BIBLIOTECA_SQLITE_PRAGMAS['cache_size'])
+
+    def test_postgresql_reutiliza_conexiones(self):
+        if connection.vendor != 'postgresql':
+            self.skipTest('Solo aplica a PostgreSQL')
+        configuracion = connection.settings_dict
+        self.assertTrue(configuracion['OPTIONS'].get('pool') or configuracion['CONN_MAX_AGE'])
+        self.assertTrue(configuracion['OPTIONS'].get('pool') or configuracion['CONN_HEALTH_CHECKS'])
+
+
+class SesionesTests(TestCase):
+    """Sesiones en caché, usuario y perfil en una consulta y limpieza por lotes."""
+
+    def setUp(self):
+        self.usuario = User.objects.create_user('lector', password='clave-segura-123')
+        PerfilUsuario.objects.create(user=self.usuario, telefono='600000000')
+        self.client.force_login(self.usuario)
+
+    def test_peticion_autenticada_en_una_consulta(self):
+        # Sesión en la base de datos (caché en memoria); usuario y perfil, en la misma consulta
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('biblioteca:perfil_usuario'))
+        self.assertContains(response, '600000000')
+
+    @override_settings(SESSION_ENGINE='django.contrib.sessions.backends.cached_db')
+    def test_sesion_en_cache_compartida(self):
+        self.client.force_login(self.usuario)
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('biblioteca:perfil_usuario'))
+        self.assertContains(response, '600000000')
+
+    def test_sesiones_anteriores_siguen_abiertas(self):
+        # Sesión iniciada cuando ModelBackend era el único backend
+        self.client.force_login(self.usuario, backend='django.contrib.auth.backends.ModelBackend')
+        response = self.client.get(reverse('biblioteca:perfil_usuario'))
+        self.assertContains(response, '600000000')
+
+    def test_sin_cache_compartida_se_usa_la_base_de_datos(self):
+        self.assertEqual(settings.SESSION_ENGINE, 'django.contrib.sessions.backends.db')
+
+    def test_perfil_se_crea_si_falta(self):
+        PerfilUsuario.objects.filter(user=self.usuario).delete()
+        response = self.client.get(reverse('biblioteca:perfil_usuario'))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(PerfilUsuario.objects.filter(user=self.usuario).exists())
+
+    def test_limpiar_expiradas_por_lotes(self):
+        ahora = timezone.now()
+        Session.objects.bulk_create([
+            Session(session_key=f'caducada{i}', session_data='', expire_date=ahora - timedelta(days=1))
+            for i in range(5)
+        ])
+        lotes = list(sesiones.limpiar_expiradas(tamano=2, ahora=ahora))
+        self.assertEqual(lotes, [(1, 2), (2, 2), (3, 1)])
+        # La sesión vigente del cliente sigue ahí
+        self.assertEqual(Session.objects.count(), 1)
+
+
+class RecomendacionesTests(TestCase):
+    """Vecinos por préstamos compartidos y por etiquetas, precalculados y leídos en el detalle."""
+
+    def setUp(self):
+        self.lectores = [User.objects.create_user(f'lector{i}') for i in range(3)]
+        self.a, self.b, self.c, self.d = [
+            Libro.objects.create(titulo=titulo, isbn=f'97800000003{i:02d}', cantidad_disponible=5)
+            for i, titulo in enumerate(['Rayuela', 'Ficciones', 'Pedro Páramo', 'Aura'])
+        ]
+        fantastico = Etiqueta.objects.create(nombre='fantástico')
+        self.a.etiquetas.add(fantastico)
+        self.d.etiquetas.add(fantastico)
+        for lector, libros in zip(self.lectores, [[self.a, self.b], [self.a, self.b, self.c], [self.d]]):
+            for libro in libros:
+                solicitar_prestamo(libro.pk, lector)
+
+    def vecinos(self, libro):
+        return list(Recomendacion.objects.filter(libro=libro).values_list('recomendado_id', flat=True))
+
+    def test_mezcla_prestamos_y_contenido(self):
+        list(recomendaciones.reconstruir())
+        # B: los mismos dos lectores; C: un lector en común; D: solo la etiqueta
+        self.assertEqual(self.vecinos(self.a), [self.b.pk, self.c.pk, self.d.pk])
+        self.assertEqual(self.vecinos(self.d), [self.a.pk])
+
+    @override_settings(BIBLIOTECA_RECOMENDACIONES_VECINOS=1, BIBLIOTECA_RECOMENDACIONES_PESO_CONTENIDO=1)
+    def test_ajustes_configurables(self):
+        list(recomendaciones.reconstruir())
+        # Solo cuenta el contenido: el único vecino de A es D, con la misma etiqueta
+        self.assertEqual(self.vecinos(self.a), [self.d.pk])
+
+    def test_reconstruccion_incremental(self):
+        list(recomendaciones.reconstruir())
+        self.assertEqual(list(recomendaciones.reconstruir()), [])
+
+        solicitar_prestamo(self.c.pk, self.lectores[2])
+        lotes = list(recomendaciones.reconstruir())
+        # Solo los libros del lector con el préstamo nuevo
+        self.assertEqual(sum(libros for _, libros, _ in lotes), 2)
+        self.assertIn(self.c.pk, self.vecinos(self.d))
+
+        # Cargando solo los préstamos de sus lectores, lo mismo que una reconstrucción completa
+        pendientes = Recomendacion.objects.filter(libro__in=[self.c, self.d])
+        incrementales = set(pendientes.values_list('libro', 'recomendado', 'puntuacion'))
+        list(recomendaciones.reconstruir(completo=True))
+        self.assertEqual(set(pendientes.values_list('libro', 'recomendado', 'puntuacion')), incrementales)
+
+    def test_ficha_cacheada_sigue_a_los_recomendados(self):
+        cache.clear()
+        url = reverse('biblioteca:detalle_libro', args=[self.d.pk])
+        self.assertNotContains(self.client.get(url), 'también leyeron')
+        # La reconstrucción cambia la clave de la ficha
+        list(recomendaciones.reconstruir())
+        self.assertContains(self.client.get(url), 'Disponible</span>')
+        # Y también el stock de un libro recomendado
+        libro = Libro.objects.get(pk=self.a.pk)
+        libro.cantidad_disponible = 0
+        libro.save()
+        self.assertContains(self.client.get(url), 'Prestado</span>')
+
+    def test_detalle_muestra_recomendaciones_en_una_consulta(self):
+        list(recomendaciones.reconstruir())
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.get(reverse('biblioteca:detalle_libro', args=[self.a.pk]))
+        self.assertContains(response, 'Quienes leyeron este libro también leyeron')
+        self.assertContains(response, 'Ficciones')
+        tabla = Recomendacion._meta.db_table
+        # Aparte de la clave de la caché, que solo lee el id mayor
+        lecturas = [c['sql'] for c in consultas.captured_queries if tabla in c['sql'] and 'MAX(' not in c['sql']]
+        self.assertEqual(len(lecturas), 1)
+
+
+@override_settings(BIBLIOTECA_BD_REPLICAS=['replica'])
+class ReplicasTests(TransactionTestCase):
+    """Dos archivos SQLite hacen de primaria y de réplica con retraso."""
+
+    def setUp(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('La réplica se simula copiando el archivo SQLite')
+        cache.clear()
+        self.usuario = User.objects.create_user('lector', password='clave-segura-123')
+        self.libro = Libro.objects.create(titulo='Rayuela', isbn='9780000000001', cantidad_disponible=2)
+
+        # La réplica es una copia de la primaria en este momento
+        descriptor, ruta = tempfile.mkstemp(suffix='.sqlite3')
+        os.close(descriptor)
+        connection.ensure_connection()
+        copia = sqlite3.connect(ruta)
+        connection.connection.backup(copia)
+        copia.close()
+        connections.settings['replica'] = {**connection.settings_dict, 'NAME': ruta}
+        self.addCleanup(os.remove, ruta)
+        self.addCleanup(connections.settings.pop, 'replica')
+        self.addCleanup(connections.__delitem__, 'replica')
+        # Se conecta aquí: TransactionTestCase no deja abrir alias fuera de `databases`
+        connections['replica'].connect()
+        self.addCleanup(connections['replica'].close)
+
+        # Cambio que la réplica todavía no ha recibido
+        Libro.objects.filter(pk=self.libro.pk).update(titulo='Rayuela (edición revisada)')
+        self.client.force_login(self.usuario)
+
+    def test_catalogo_se_lee_de_la_replica(self):
+        response = self.client.get(reverse('biblioteca:detalle_libro', args=[self.libro.pk]))
+        self.assertContains(response, 'Rayuela')
+        self.assertNotContains(response, 'edición revisada')
+        self.assertNotIn(enrutador.COOKIE, response.cookies)
+
+    def test_fuera_de_una_peticion_se_lee_de_la_primaria(self):
+        self.assertEqual(Libro.objects.get(pk=self.libro.pk).titulo, 'Rayuela (edición revisada)')
+
+    def test_lee_sus_propias_escrituras(self):
+        response = self.client.get(reverse('biblioteca:solicitar_prestamo', args=[self.libro.pk]), follow=True)
+        self.assertIn(enrutador.COOKIE, response.client.cookies)
+        self.assertContains(response, 'edición revisada')
+        self.assertEqual(Prestamo.objects.filter(libro=self.libro, usuario=self.usuario).count(), 1)
+
+        # Pasado el retardo vuelve a la réplica
+        self.client.cookies[enrutador.COOKIE] = '0'
+        response = self.client.get(reverse('biblioteca:detalle_libro', args=[self.libro.pk]))
+        self.assertNotContains(response, 'edición revisada')
+
+    def test_cache_anonima_se_llena_desde_la_primaria(self):
+        self.client.logout()
+        for url in (reverse('biblioteca:detalle_libro', args=[self.libro.pk]), reverse('biblioteca:lista_libros')):
+            with self.subTest(url=url):
+                # La primera guarda la página en la caché; la segunda la sirve desde ella
+                for _ in range(2):
+                    self.assertContains(self.client.get(url), 'edición revisada')
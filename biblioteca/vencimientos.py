@@ -0,0 +1,100 @@
+"""
+Préstamos vencidos: detección por índice y avisos en lotes.
+
+Los vencidos sin aviso se localizan con el índice parcial
+prestamo_vencido_pendiente_idx y se recorren por cursor sobre
+(fecha_vencimiento, id), sin OFFSET ni cargar la tabla en memoria. Cada lote
+va en su propia transacción corta: marca los préstamos e inserta los avisos
+en la bandeja de salida (Aviso). La restricción única de Aviso impide los
+duplicados aunque dos ejecuciones coincidan.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from .ajustes_sqlite import transaccion_escritura
+from .models import Aviso, Prestamo
+
+DIAS_PRESTAMO = 14
+TAMANO_LOTE = 500
+
+
+def dias_prestamo():
+    """Días que dura un préstamo (BIBLIOTECA_DIAS_PRESTAMO)."""
+    return getattr(settings, 'BIBLIOTECA_DIAS_PRESTAMO', DIAS_PRESTAMO)
+
+
+def calcular_vencimiento(fecha_prestamo=None):
+    """Fecha de vencimiento de un préstamo hecho en `fecha_prestamo` (por defecto, ahora)."""
+    return (fecha_prestamo or timezone.now()) + timedelta(days=dias_prestamo())
+
+
+def vencidos(ahora=None):
+    """Préstamos activos vencidos a los que aún no se ha enviado aviso."""
+    return Prestamo.objects.filter(
+        devuelto=False, aviso_vencido__isnull=True, fecha_vencimiento__lt=ahora or timezone.now()
+    )
+
+
+def _mensaje(titulo, vencimiento):
+    return (
+        f'El préstamo de "{titulo}" venció el {timezone.localtime(vencimiento):%d/%m/%Y}. '
+        'Por favor, devuélvelo cuanto antes.'
+    )
+
+
+def procesar_lote(ahora, desde=None, tamano=TAMANO_LOTE):
+    """
+    Avisa de un lote de vencidos posteriores al cursor `desde` (fecha, id).
+
+    Devuelve (avisos creados, cursor del último préstamo leído o None si no quedan).
+    """
+    queryset = vencidos(ahora).order_by('fecha_vencimiento', 'id')
+    if desde is not None:
+        fecha, pk = desde
+        queryset = queryset.filter(Q(fecha_vencimiento__gt=fecha) | Q(fecha_vencimiento=fecha, id__gt=pk))
+    filas = list(queryset.values_list('id', 'fecha_vencimiento', 'usuario_id', 'libro__titulo')[:tamano])
+    if not filas:
+        return 0, None
+
+    with transaccion_escritura():
+        ids = [pk for pk, _, _, _ in filas]
+        # Otra ejecución simultánea puede haberse llevado parte del lote, y el
+        # lector puede haber devuelto el libro tras la primera lectura: se
+        # bloquean solo las filas libres (skip_locked en PostgreSQL), aún
+        # prestadas y sin aviso.
+        pendientes = set(
+            Prestamo.objects.select_for_update(skip_locked=True)
+            .filter(pk__in=ids, devuelto=False, aviso_vencido__isnull=True).values_list('id', flat=True)
+        )
+        Prestamo.objects.filter(pk__in=pendientes).update(aviso_vencido=ahora)
+        creados = Aviso.objects.bulk_create(
+            [
+                Aviso(tipo='vencimiento', usuario_id=usuario_id, prestamo_id=pk, mensaje=_mensaje(titulo, vencimiento))
+                for pk, vencimiento, usuario_id, titulo in filas
+                if pk in pendientes
+            ],
+            ignore_conflicts=True,
+        )
+    ultimo = filas[-1]
+    return len(creados), (ultimo[1], ultimo[0])
+
+
+def procesar_vencidos(ahora=None, tamano=TAMANO_LOTE, max_lotes=None):
+    """
+    Recorre todos los vencidos sin aviso en lotes de `tamano`.
+
+    Genera (número de lote, avisos creados) tras cada lote para informar del
+    progreso. La memoria no crece con el número de préstamos.
+    """
+    ahora = ahora or timezone.now()
+    cursor = None
+    lote = 0
+    while max_lotes is None or lote < max_lotes:
+        creados, cursor = procesar_lote(ahora, cursor, tamano)
+        if cursor is None:
+            return
+        lote += 1
+        yield lote, creados
@@ -1,10 +1,18 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth import login, logout, authenticate
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.db.models import Q, Count
+from django.db.models import Count
 from django.core.paginator import Paginator
-from .models import Libro, Autor, Categoria, Etiqueta, Prestamo, PerfilUsuario
+from django.http import HttpResponseBadRequest, StreamingHttpResponse
+from django.utils import timezone
+from .models import Libro, Categoria, Etiqueta, Prestamo, PerfilUsuario
+from . import busqueda, estadisticas, exportacion, historial, recomendaciones
+from .cache_catalogo import cache_anonimo, clave_detalle, clave_listado, clave_portada, ttl as cache_ttl
+from .paginacion import PaginadorCursor
+from .consultas import presupuesto_consultas
+from .prestamos import PrestamoError, PrestamoDuplicado, solicitar_prestamo as prestar_libro, devolver_prestamo
 from .forms import (
     RegistroUsuarioForm, LoginForm, LibroForm, CategoriaForm, 
     EtiquetaForm, BusquedaLibroForm, PerfilUsuarioForm
@@ -14,14 +22,21 @@ from .forms import (
 # VISTAS PÚBLICAS
 # ============================================================================
 
+@presupuesto_consultas(8)
+@cache_anonimo(clave_portada)
 def index(request):
     """Vista principal con estadísticas y libros recientes."""
     libros_recientes = Libro.objects.select_related('categoria').prefetch_related('autores').order_by('-fecha_agregado')[:6]
+    # Totales precalculados: una consulta en lugar de varios COUNT(*)
+    totales = estadisticas.obtener()
     context = {
         'libros_recientes': libros_recientes,
-        'total_libros': Libro.objects.count(),
-        'total_autores': Autor.objects.count(),
-        'total_categorias': Categoria.objects.count(),
+        'total_libros': totales['libros'],
+        'total_autores': totales['autores'],
+        'total_categorias': totales['categorias'],
+        'prestamos_activos': totales['prestamos_activos'],
+        'libros_agotados': totales['libros_agotados'],
+        'cache_ttl': cache_ttl(),
     }
     return render(request, 'biblioteca/index.html', context)
 
@@ -78,7 +93,11 @@ def logout_usuario(request):
 @login_required
 def perfil_usuario(request):
     """Vista para ver y editar el perfil del usuario."""
-    perfil, created = PerfilUsuario.objects.get_or_create(user=request.user)
+    # BackendConPerfil ya trajo el perfil con el usuario; solo se crea si falta
+    try:
+        perfil = request.user.perfil
+    except PerfilUsuario.DoesNotExist:
+        perfil, _ = PerfilUsuario.objects.get_or_create(user=request.user)
     if request.method == 'POST':
         form = PerfilUsuarioForm(request.POST, instance=perfil)
         if form.is_valid():
@@ -89,36 +108,44 @@ def perfil_usuario(request):
         form = PerfilUsuarioForm(instance=perfil)
     return render(request, 'biblioteca/perfil_usuario.html', {'form': form})
 
+@presupuesto_consultas(7)
 @login_required
 def mis_prestamos(request):
     """Vista para que el usuario vea sus préstamos."""
-    prestamos = Prestamo.objects.filter(usuario=request.user).select_related('libro').order_by('-fecha_prestamo')
-    return render(request, 'biblioteca/mis_prestamos.html', {'prestamos': prestamos})
+    # Activos desde la tabla caliente; el historial, por páginas desde ambos niveles
+    prestamos = (
+        Prestamo.objects.filter(usuario=request.user, devuelto=False)
+        .select_related('libro').prefetch_related('libro__autores').order_by('-fecha_prestamo')
+    )
+    historial_pagina = historial.pagina_historial(request.user, request.GET.get('cursor'))
+    return render(request, 'biblioteca/mis_prestamos.html', {
+        'prestamos': prestamos, 'historial': historial_pagina, 'ahora': timezone.now(),
+    })
 
 @login_required
 def solicitar_prestamo(request, libro_id):
     """Procesa la solicitud de un préstamo para un libro."""
-    libro = get_object_or_404(Libro, id=libro_id)
-    if libro.cantidad_disponible > 0:
-        # Verificar si el usuario ya tiene un préstamo activo de este libro
-        if not Prestamo.objects.filter(libro=libro, usuario=request.user, devuelto=False).exists():
-            Prestamo.objects.create(libro=libro, usuario=request.user)
-            libro.cantidad_disponible -= 1
-            libro.save()
-            messages.success(request, f'Has solicitado el libro "{libro.titulo}".')
-        else:
-            messages.warning(request, 'Ya tienes un préstamo activo para este libro.')
-    else:
-        messages.error(request, 'Este libro no está disponible actualmente.')
+    libro = get_object_or_404(Libro.objects.only('id', 'titulo'), id=libro_id)
+    # El servicio descuenta el stock y crea el préstamo en una sola transacción
+    try:
+        prestar_libro(libro.id, request.user)
+        messages.success(request, f'Has solicitado el libro "{libro.titulo}".')
+    except PrestamoDuplicado as e:
+        messages.warning(request, str(e))
+    except PrestamoError as e:
+        messages.error(request, str(e))
     return redirect('biblioteca:detalle_libro', pk=libro.id)
 
 @login_required
 def confirmar_devolucion(request, prestamo_id):
     """Confirma y procesa la devolución de un libro."""
-    prestamo = get_object_or_404(Prestamo, id=prestamo_id, usuario=request.user)
+    prestamo = get_object_or_404(Prestamo.objects.select_related('libro'), id=prestamo_id, usuario=request.user)
     if request.method == 'POST':
-        prestamo.devolver()
-        messages.success(request, f'Has devuelto el libro "{prestamo.libro.titulo}".')
+        try:
+            devolver_prestamo(prestamo)
+            messages.success(request, f'Has devuelto el libro "{prestamo.libro.titulo}".')
+        except PrestamoError as e:
+            messages.warning(request, str(e))
         return redirect('biblioteca:mis_prestamos')
     return render(request, 'biblioteca/confirmar_devolucion.html', {'prestamo': prestamo})
 
@@ -126,34 +153,60 @@ def confirmar_devolucion(request, prestamo_id):
 # VISTAS CRUD DE LIBROS
 # ============================================================================
 
+@presupuesto_consultas(8)
+@cache_anonimo(clave_listado)
 def lista_libros(request):
     """Vista para listar, buscar y filtrar libros."""
-    queryset = Libro.objects.select_related('categoria').prefetch_related('autores', 'etiquetas').all()
+    queryset = Libro.objects.select_related('categoria').prefetch_related('autores', 'etiquetas').order_by('titulo')
     form = BusquedaLibroForm(request.GET)
+    q = None
+    campo_orden = 'titulo'
 
     if form.is_valid():
         q = form.cleaned_data.get('q')
         categoria_id = form.cleaned_data.get('categoria')
         disponible = form.cleaned_data.get('disponible')
+        if form.cleaned_data.get('orden') == 'populares':
+            campo_orden = '-prestamos_totales'
 
         if q:
-            queryset = queryset.filter(
-                Q(titulo__icontains=q) | Q(autores__nombre__icontains=q) | Q(isbn__icontains=q)
-            ).distinct()
+            # Búsqueda de texto completo ordenada por relevancia
+            queryset = busqueda.buscar(queryset, q)
         if categoria_id:
             queryset = queryset.filter(categoria=categoria_id)
         if disponible:
             queryset = queryset.filter(cantidad_disponible__gt=0)
-    
-    paginator = Paginator(queryset.order_by('titulo'), 12)
-    page_number = request.GET.get('page')
-    libros = paginator.get_page(page_number)
-    
-    return render(request, 'biblioteca/lista_libros.html', {'libros': libros, 'form': form})
 
+    # Parámetros de filtro para reconstruir los enlaces de paginación
+    parametros = request.GET.copy()
+    parametros.pop('page', None)
+    parametros.pop('cursor', None)
+
+    if q:
+        # Los resultados por relevancia se paginan por número de página
+        if campo_orden != 'titulo':
+            queryset = queryset.order_by(campo_orden, '-id')
+        paginator = Paginator(queryset, 12)
+        libros = paginator.get_page(request.GET.get('page'))
+        modo_cursor = False
+    else:
+        # El catálogo completo se pagina por cursor sobre (titulo, id) o (-prestamos_totales, -id)
+        libros = PaginadorCursor(queryset, 12, campo=campo_orden).get_page(request.GET.get('cursor'))
+        modo_cursor = True
+
+    return render(request, 'biblioteca/lista_libros.html', {
+        'libros': libros, 'form': form, 'modo_cursor': modo_cursor, 'parametros': parametros.urlencode(),
+        'cache_ttl': cache_ttl(),
+    })
+
+@presupuesto_consultas(6)
+@cache_anonimo(clave_detalle)
 def detalle_libro(request, pk):
     """Vista para mostrar los detalles de un libro."""
-    libro = get_object_or_404(Libro.objects.prefetch_related('autores', 'etiquetas'), pk=pk)
+    libro = get_object_or_404(
+        Libro.objects.select_related('categoria').prefetch_related('autores', 'etiquetas', recomendaciones.prefetch()),
+        pk=pk,
+    )
     return render(request, 'biblioteca/detalle_libro.html', {'libro': libro})
 
 @login_required
@@ -275,3 +328,38 @@ def eliminar_etiqueta(request, pk):
         messages.success(request, 'Etiqueta eliminada.')
         return redirect('biblioteca:lista_etiquetas')
     return render(request, 'biblioteca/confirmar_eliminacion.html', {'objeto': etiqueta, 'tipo': 'Etiqueta'})
+
+# ============================================================================
+# EXPORTACIÓN (Solo personal)
+# ============================================================================
+
+@staff_member_required
+def exportar(request, tipo):
+    """
+    Descarga en streaming del catálogo o del historial de préstamos.
+
+    Parámetros: formato (csv o jsonl), gzip=1, desde y hasta (AAAA-MM-DD),
+    categoria (ID) y, para préstamos, estado (activos o devueltos).
+    """
+    formato = request.GET.get('formato', 'csv')
+    comprimir = request.GET.get('gzip') == '1'
+    try:
+        contenido = exportacion.exportar(
+            tipo,
+            formato=formato,
+            comprimir=comprimir,
+            desde=request.GET.get('desde'),
+            hasta=request.GET.get('hasta'),
+            categoria=request.GET.get('categoria'),
+            estado=request.GET.get('estado'),
+        )
+    except exportacion.ErrorExportacion as e:
+        return HttpResponseBadRequest(str(e))
+
+    nombre = f'{tipo}.{formato}' + ('.gz' if comprimir else '')
+    tipo_contenido = 'text/csv' if formato == 'csv' else 'application/x-ndjson'
+    response = StreamingHttpResponse(
+        contenido, content_type='application/gzip' if comprimir else f'{tipo_contenido}; charset=utf-8'
+    )
+    response['Content-Disposition'] = f'attachment; filename="{nombre}"'
+    return response
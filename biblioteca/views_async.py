@@ -0,0 +1,138 @@
+"""
+Versiones asíncronas de las vistas de lectura del catálogo.
+
+Se usan cuando la aplicación se sirve con ASGI (BIBLIOTECA_VISTAS_ASYNC):
+los datos se leen con el ORM asíncrono y las consultas independientes se
+lanzan a la vez con asyncio.gather, sin ocupar un hilo por petición mientras
+se espera a la base de datos.
+
+La plantilla se renderiza con sync_to_async porque los procesadores de
+contexto (usuario, mensajes) leen la sesión de forma síncrona.
+"""
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.decorators import login_required
+from django.core.paginator import Paginator
+from django.shortcuts import aget_object_or_404, render
+from django.utils import timezone
+
+from .cache_catalogo import cache_anonimo, clave_detalle, clave_listado, clave_portada, ttl as cache_ttl
+from .consultas import presupuesto_consultas
+from .forms import BusquedaLibroForm
+from .models import Libro, Prestamo
+from .paginacion import PaginadorCursor
+from . import busqueda, estadisticas, historial, recomendaciones
+
+
+async def _render(request, plantilla, contexto):
+    return await sync_to_async(render)(request, plantilla, contexto)
+
+
+async def _lista(queryset):
+    return [objeto async for objeto in queryset]
+
+
+# ============================================================================
+# VISTAS PÚBLICAS
+# ============================================================================
+
+@presupuesto_consultas(8)
+@cache_anonimo(clave_portada)
+async def index(request):
+    """Vista principal con estadísticas y libros recientes."""
+    libros_recientes, totales = await asyncio.gather(
+        _lista(Libro.objects.select_related('categoria').prefetch_related('autores').order_by('-fecha_agregado')[:6]),
+        estadisticas.aobtener(),
+    )
+    return await _render(request, 'biblioteca/index.html', {
+        'libros_recientes': libros_recientes,
+        'total_libros': totales['libros'],
+        'total_autores': totales['autores'],
+        'total_categorias': totales['categorias'],
+        'prestamos_activos': totales['prestamos_activos'],
+        'libros_agotados': totales['libros_agotados'],
+        'cache_ttl': cache_ttl(),
+    })
+
+
+# ============================================================================
+# LIBROS
+# ============================================================================
+
+@presupuesto_consultas(8)
+@cache_anonimo(clave_listado)
+async def lista_libros(request):
+    """Vista para listar, buscar y filtrar libros."""
+    queryset = Libro.objects.select_related('categoria').prefetch_related('autores', 'etiquetas').order_by('titulo')
+    form = BusquedaLibroForm(request.GET)
+    # Validar el formulario consulta las categorías del desplegable
+    valido = await sync_to_async(form.is_valid)()
+    q = None
+    campo_orden = 'titulo'
+
+    if valido:
+        q = form.cleaned_data.get('q')
+        if form.cleaned_data.get('orden') == 'populares':
+            campo_orden = '-prestamos_totales'
+        if q:
+            queryset = busqueda.buscar(queryset, q)
+        if form.cleaned_data.get('categoria'):
+            queryset = queryset.filter(categoria=form.cleaned_data['categoria'])
+        if form.cleaned_data.get('disponible'):
+            queryset = queryset.filter(cantidad_disponible__gt=0)
+
+    parametros = request.GET.copy()
+    parametros.pop('page', None)
+    parametros.pop('cursor', None)
+
+    if q:
+        if campo_orden != 'titulo':
+            queryset = queryset.order_by(campo_orden, '-id')
+        libros = await sync_to_async(Paginator(queryset, 12).get_page)(request.GET.get('page'))
+        libros.object_list = await _lista(libros.object_list)
+        modo_cursor = False
+    else:
+        libros = await sync_to_async(PaginadorCursor(queryset, 12, campo=campo_orden).get_page)(request.GET.get('cursor'))
+        modo_cursor = True
+
+    return await _render(request, 'biblioteca/lista_libros.html', {
+        'libros': libros, 'form': form, 'modo_cursor': modo_cursor, 'parametros': parametros.urlencode(),
+        'cache_ttl': cache_ttl(),
+    })
+
+
+@presupuesto_consultas(6)
+@cache_anonimo(clave_detalle)
+async def detalle_libro(request, pk):
+    """Vista para mostrar los detalles de un libro."""
+    libro = await aget_object_or_404(
+        Libro.objects.select_related('categoria').prefetch_related('autores', 'etiquetas', recomendaciones.prefetch()),
+        pk=pk,
+    )
+    return await _render(request, 'biblioteca/detalle_libro.html', {'libro': libro})
+
+
+# ============================================================================
+# PRÉSTAMOS
+# ============================================================================
+
+@presupuesto_consultas(7)
+@login_required
+async def mis_prestamos(request):
+    """Vista para que el usuario vea sus préstamos."""
+    usuario = await request.auser()
+    # Los procesadores de contexto leen request.user: se reutiliza el ya cargado
+    request.user = usuario
+    prestamos, historial_pagina = await asyncio.gather(
+        _lista(
+            Prestamo.objects.filter(usuario=usuario, devuelto=False)
+            .select_related('libro')
+            .prefetch_related('libro__autores')
+            .order_by('-fecha_prestamo')
+        ),
+        sync_to_async(historial.pagina_historial)(usuario, request.GET.get('cursor')),
+    )
+    return await _render(request, 'biblioteca/mis_prestamos.html', {
+        'prestamos': prestamos, 'historial': historial_pagina, 'ahora': timezone.now(),
+    })
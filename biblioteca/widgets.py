@@ -0,0 +1,46 @@
+"""
+Widgets de formulario de la biblioteca.
+
+SelectorRemoto sustituye a las listas de casillas con todos los autores o
+etiquetas: solo dibuja las opciones ya elegidas (una consulta IN) y busca el
+resto con AJAX, página a página, en el endpoint api_selector.
+"""
+from django import forms
+from django.core.exceptions import ValidationError
+
+
+class SelectorRemoto(forms.SelectMultiple):
+    """Selección múltiple que carga las opciones bajo demanda desde `url`."""
+    template_name = 'biblioteca/widgets/selector_remoto.html'
+
+    def __init__(self, url, attrs=None):
+        super().__init__(attrs)
+        self.url = url
+
+    def get_context(self, name, value, attrs):
+        context = super().get_context(name, value, attrs)
+        context['widget']['url'] = str(self.url)
+        return context
+
+    def optgroups(self, name, value, attrs=None):
+        """Solo las opciones elegidas, resueltas con una única consulta."""
+        seleccionados = self._claves_validas(value)
+        opciones = []
+        if seleccionados:
+            queryset = self.choices.queryset.filter(pk__in=seleccionados)
+            for indice, objeto in enumerate(queryset):
+                opciones.append(self.create_option(name, objeto.pk, str(objeto), True, indice, attrs=attrs))
+        return [(None, opciones, 0)]
+
+    def _claves_validas(self, value):
+        """Descarta los valores enviados que no son claves válidas: el formulario ya muestra el error."""
+        campo_pk = self.choices.queryset.model._meta.pk
+        claves = []
+        for valor in value:
+            if valor in (None, ''):
+                continue
+            try:
+                claves.append(campo_pk.to_python(valor))
+            except ValidationError:
+                continue
+        return claves
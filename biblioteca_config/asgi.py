@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'biblioteca_config.settings')
+# Con ASGI las vistas de lectura del catálogo usan sus versiones asíncronas
+os.environ.setdefault('BIBLIOTECA_VISTAS_ASYNC', '1')
 
 application = get_asgi_application()
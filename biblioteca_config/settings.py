@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/6.0/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -42,6 +43,8 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'biblioteca.middleware.PerfiladoConsultasMiddleware',
+    'biblioteca.middleware.LecturaReplicasMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -72,28 +75,145 @@ WSGI_APPLICATION = 'biblioteca_config.wsgi.application'
 
 # Database
 # https://docs.djangoproject.com/en/6.0/ref/settings/#databases
-# Configurado para usar SQLite.
-
-# PostgreSQL Configuration (comentada para usar SQLite)
-# DATABASES = {
-#     'default': {
-#         'ENGINE': 'django.db.backends.postgresql',
-#         'NAME': 'gestion_productos',
-#         'USER': 'postgres',
-#         'PASSWORD': 'admin',
-#         'HOST': 'localhost',
-#         'PORT': '5432',
-#     }
-# }
-
-# SQLite Configuration
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'biblioteca.sqlite3',
+# BIBLIOTECA_BD elige el motor: 'sqlite' (por defecto) o 'postgresql'.
+#
+# PostgreSQL se configura con BIBLIOTECA_BD_NOMBRE, _USUARIO, _CLAVE, _HOST y
+# _PUERTO. Por defecto reutiliza las conexiones entre peticiones
+# (BIBLIOTECA_BD_CONN_MAX_AGE, 600 s) y comprueba que siguen vivas antes de
+# usarlas. Con BIBLIOTECA_BD_POOL=1 se usa en su lugar el pool de psycopg 3
+# dentro de cada proceso; con BIBLIOTECA_BD_PGBOUNCER=1, un pgbouncer en modo
+# transacción delante de la base.
+#
+# BIBLIOTECA_BD_REPLICAS añade réplicas de solo lectura para el catálogo,
+# separadas por comas: hosts en PostgreSQL y rutas de archivo en SQLite.
+
+BD_MOTOR = os.environ.get('BIBLIOTECA_BD', 'sqlite')
+
+if BD_MOTOR == 'postgresql':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('BIBLIOTECA_BD_NOMBRE', 'biblioteca'),
+            'USER': os.environ.get('BIBLIOTECA_BD_USUARIO', 'postgres'),
+            'PASSWORD': os.environ.get('BIBLIOTECA_BD_CLAVE', ''),
+            'HOST': os.environ.get('BIBLIOTECA_BD_HOST', 'localhost'),
+            'PORT': os.environ.get('BIBLIOTECA_BD_PUERTO', '5432'),
+            'CONN_MAX_AGE': int(os.environ.get('BIBLIOTECA_BD_CONN_MAX_AGE', 600)),
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {},
+        }
     }
+    if os.environ.get('BIBLIOTECA_BD_POOL') == '1':
+        # El pool ya mantiene las conexiones abiertas: Django no admite ambos a la vez.
+        DATABASES['default']['CONN_MAX_AGE'] = 0
+        DATABASES['default']['OPTIONS']['pool'] = {
+            'min_size': int(os.environ.get('BIBLIOTECA_BD_POOL_MIN', 2)),
+            'max_size': int(os.environ.get('BIBLIOTECA_BD_POOL_MAX', 10)),
+            'timeout': 10,
+        }
+    if os.environ.get('BIBLIOTECA_BD_PGBOUNCER') == '1':
+        # En modo transacción los cursores con nombre no sobreviven entre sentencias.
+        DATABASES['default']['DISABLE_SERVER_SIDE_CURSORS'] = True
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('BIBLIOTECA_BD_NOMBRE', BASE_DIR / 'biblioteca.sqlite3'),
+            'OPTIONS': {
+                # Espera hasta 20 s a que se libere un bloqueo en vez de fallar enseguida.
+                # El resto de ajustes (WAL, caché...) los aplica biblioteca/ajustes_sqlite.py.
+                'timeout': 20,
+            },
+            # Base de pruebas en archivo: la de memoria compartida no espera los
+            # bloqueos entre hilos y las pruebas de concurrencia fallarían.
+            'TEST': {
+                'NAME': BASE_DIR / 'test_biblioteca.sqlite3',
+            },
+        }
+    }
+
+# Réplicas: misma configuración que la primaria salvo el host (o el archivo).
+# En las pruebas son espejos de la primaria.
+BIBLIOTECA_BD_REPLICAS = []
+for numero, valor in enumerate(filter(None, os.environ.get('BIBLIOTECA_BD_REPLICAS', '').split(',')), 1):
+    alias = f'replica_{numero}'
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        'OPTIONS': dict(DATABASES['default']['OPTIONS']),
+        'HOST' if BD_MOTOR == 'postgresql' else 'NAME': valor.strip(),
+        'TEST': {'MIRROR': 'default'},
+    }
+    BIBLIOTECA_BD_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['biblioteca.enrutador.EnrutadorReplicas']
+
+# Segundos que un navegador lee de la primaria después de escribir
+BIBLIOTECA_BD_RETARDO_REPLICA = 5
+
+
+# PRAGMA que se aplican a cada conexión SQLite (ver biblioteca/ajustes_sqlite.py)
+BIBLIOTECA_SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 20000,
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64000,
+    'temp_store': 'MEMORY',
 }
 
+# Las transacciones de escritura empiezan con BEGIN IMMEDIATE en SQLite
+BIBLIOTECA_SQLITE_IMMEDIATE = True
+
+# Cache
+# https://docs.djangoproject.com/en/6.0/topics/cache/
+# BIBLIOTECA_CACHE elige el almacenamiento: 'memoria' (por defecto, también en
+# las pruebas), 'archivo' o 'bd' (requiere `python manage.py createcachetable`).
+# Con varios procesos debe usarse 'archivo' o 'bd' para compartir invalidaciones.
+
+CACHES_DISPONIBLES = {
+    'memoria': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'archivo': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / '.cache',
+    },
+    'bd': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'biblioteca_cache',
+    },
+}
+
+CACHES = {
+    'default': CACHES_DISPONIBLES[os.environ.get('BIBLIOTECA_CACHE', 'memoria')],
+}
+
+# Segundos que se guardan páginas y fragmentos del catálogo para anónimos
+BIBLIOTECA_CACHE_TTL = 600
+
+# Segundos tras los que cada proceso reconstruye su índice de sugerencias
+BIBLIOTECA_AUTOCOMPLETADO_TTL = 300
+
+
+# Sesiones y autenticación (ver biblioteca/sesiones.py)
+# cached_db lee las sesiones de la caché y usa la base de datos como respaldo.
+# Solo se usa con una caché compartida ('archivo' o 'bd'): con 'memoria', cada
+# proceso tendría su copia y un cierre de sesión no llegaría a los demás, así
+# que las sesiones se leen directamente de la base de datos.
+# Las caducadas se borran con `python manage.py limpiar_sesiones`.
+
+SESSION_ENGINE = (
+    'django.contrib.sessions.backends.db'
+    if CACHES['default']['BACKEND'] == CACHES_DISPONIBLES['memoria']['BACKEND']
+    else 'django.contrib.sessions.backends.cached_db'
+)
+
+# ModelBackend se mantiene detrás: las sesiones iniciadas antes guardan su ruta
+# y, sin él, get_user() las descartaría y cerraría la sesión de todos.
+AUTHENTICATION_BACKENDS = [
+    'biblioteca.sesiones.BackendConPerfil',
+    'django.contrib.auth.backends.ModelBackend',
+]
 
 
 # Password validation
@@ -137,7 +257,27 @@ STATIC_URL = 'static/'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Perfilado de consultas SQL por petición (cabecera Server-Timing y aviso de N+1)
+BIBLIOTECA_PERFILADO_CONSULTAS = DEBUG
+BIBLIOTECA_UMBRAL_N_MAS_1 = 5
+BIBLIOTECA_PRESUPUESTO_ESTRICTO = False
+
+# Días de préstamo hasta la fecha de vencimiento
+BIBLIOTECA_DIAS_PRESTAMO = 14
+
+# Días tras la devolución a partir de los que un préstamo pasa al archivo
+BIBLIOTECA_DIAS_ARCHIVO = 180
+
+# Recomendaciones por libro y peso de etiquetas/autores frente a los préstamos
+# (se recalculan con `python manage.py recalcular_recomendaciones`)
+BIBLIOTECA_RECOMENDACIONES_VECINOS = 6
+BIBLIOTECA_RECOMENDACIONES_PESO_CONTENIDO = 0.3
+
+# Vistas asíncronas para la portada, el catálogo y los préstamos del usuario.
+# asgi.py las activa por defecto; con WSGI se usan las síncronas.
+BIBLIOTECA_VISTAS_ASYNC = os.environ.get('BIBLIOTECA_VISTAS_ASYNC') == '1'
+
 # Login y Logout redirects
-LOGIN_URL = 'login'
-LOGOUT_REDIRECT_URL = 'index'
-LOGIN_REDIRECT_URL = 'index'
+LOGIN_URL = 'biblioteca:login'
+LOGOUT_REDIRECT_URL = 'biblioteca:index'
+LOGIN_REDIRECT_URL = 'biblioteca:index'
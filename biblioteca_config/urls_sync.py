@@ -0,0 +1,15 @@
+"""
+URLconf con las vistas síncronas del catálogo, sea cual sea BIBLIOTECA_VISTAS_ASYNC.
+
+Para medir o probar una implementación concreta con
+override_settings(ROOT_URLCONF='biblioteca_config.urls_sync').
+"""
+from django.contrib import admin
+from django.urls import path, include
+
+from biblioteca import urls, views
+
+urlpatterns = [
+    path('admin/', admin.site.urls),
+    path('', include((urls.patrones(views), urls.app_name))),
+]